@@ -23,8 +23,11 @@
 # SOFTWARE.
 
 import time
+import threading
 from ctypes import *
-from smbus2 import SMBus
+from fcntl import ioctl
+from smbus2 import SMBus, i2c_msg
+from smbus2.smbus2 import I2C_M_RD, I2C_RDWR, i2c_rdwr_ioctl_data
 
 VL53L0X_GOOD_ACCURACY_MODE      = 0   # Good Accuracy mode
 VL53L0X_BETTER_ACCURACY_MODE    = 1   # Better Accuracy mode
@@ -32,40 +35,60 @@ VL53L0X_BEST_ACCURACY_MODE      = 2   # Best Accuracy mode
 VL53L0X_LONG_RANGE_MODE         = 3   # Longe Range mode
 VL53L0X_HIGH_SPEED_MODE         = 4   # High Speed mode
 
-i2cbus = SMBus(1)
+I2C_BUS = 1                             # i2c bus number
+TOF_LIBRARY = "./bin/vl53l0x_python.so" # VL53L0X shared lib
+
+i2cbus = None
+tof_lib = None
+
+# Preallocated i2c transfers, reused by every callback
+#   read : [register index write, data read] (combined, repeated start)
+#   write: [register index + data write]
+# ioctl releases the GIL, so _i2c_lock serializes callbacks from different
+# threads (e.g. DistanceRanging and SensorPool) that share these buffers
+_i2c_lock = threading.Lock()
+_read_buf = (c_ubyte * 256)()
+_write_buf = (c_ubyte * 256)()
+_read_msgs = (i2c_msg * 2)()
+_read_msgs[0].len = 1
+_read_msgs[0].buf = cast(_write_buf, POINTER(c_char))
+_read_msgs[1].flags = I2C_M_RD
+_read_msgs[1].buf = cast(_read_buf, POINTER(c_char))
+_read_rdwr = i2c_rdwr_ioctl_data(msgs=_read_msgs, nmsgs=2)
+_write_msgs = (i2c_msg * 1)()
+_write_msgs[0].buf = cast(_write_buf, POINTER(c_char))
+_write_rdwr = i2c_rdwr_ioctl_data(msgs=_write_msgs, nmsgs=1)
 
 # i2c bus read callback
 def i2c_read(address, reg, data_p, length):
-    ret_val = 0;
-    result = []
- 
-    try:
-        result = i2cbus.read_i2c_block_data(address, reg, length)
-    except IOError:
-        ret_val = -1; 
+    with _i2c_lock:
+        _write_buf[0] = reg
+        _read_msgs[0].addr = address
+        _read_msgs[1].addr = address
+        _read_msgs[1].len = length
 
-    if (ret_val == 0):
-        for index in range(length):
-            data_p[index] = result[index]
+        try:
+            ioctl(i2cbus.fd, I2C_RDWR, _read_rdwr)
+        except IOError:
+            return -1
 
-    return ret_val
+        memmove(data_p, _read_buf, length)
+    return 0
 
 # i2c bus write callback
 def i2c_write(address, reg, data_p, length):
-    ret_val = 0;
-    data = []
+    with _i2c_lock:
+        _write_buf[0] = reg
+        memmove(byref(_write_buf, 1), data_p, length)
+        _write_msgs[0].addr = address
+        _write_msgs[0].len = length + 1
 
-    for index in range(length):
-        data.append(data_p[index])
-    try:
-        i2cbus.write_i2c_block_data(address, reg, data)
-    except IOError:
-        ret_val = -1; 
+        try:
+            ioctl(i2cbus.fd, I2C_RDWR, _write_rdwr)
+        except IOError:
+            return -1
 
-    return ret_val
-
-# Load VL53L0X shared lib 
-tof_lib = CDLL("./bin/vl53l0x_python.so")
+    return 0
 
 # Create read function pointer
 READFUNC = CFUNCTYPE(c_int, c_ubyte, c_ubyte, POINTER(c_ubyte), c_ubyte)
@@ -75,8 +98,17 @@ read_func = READFUNC(i2c_read)
 WRITEFUNC = CFUNCTYPE(c_int, c_ubyte, c_ubyte, POINTER(c_ubyte), c_ubyte)
 write_func = WRITEFUNC(i2c_write)
 
-# pass i2c read and write function pointers to VL53L0X library
-tof_lib.VL53L0X_set_i2c(read_func, write_func)
+def init_library(bus=I2C_BUS, library=TOF_LIBRARY):
+    """Open the i2c bus and load the VL53L0X shared lib (once)"""
+    global i2cbus, tof_lib
+    if tof_lib is not None:
+        return
+    if i2cbus is None:
+        i2cbus = SMBus(bus)
+    # Load VL53L0X shared lib
+    tof_lib = CDLL(library)
+    # pass i2c read and write function pointers to VL53L0X library
+    tof_lib.VL53L0X_set_i2c(read_func, write_func)
 
 class VL53L0X(object):
     """VL53L0X ToF."""
@@ -85,6 +117,7 @@ class VL53L0X(object):
 
     def __init__(self, address=0x29, TCA9548A_Num=255, TCA9548A_Addr=0, **kwargs):
         """Initialize the VL53L0X ToF Sensor from ST"""
+        init_library()
         self.device_address = address
         self.TCA9548A_Device = TCA9548A_Num
         self.TCA9548A_Address = TCA9548A_Addr
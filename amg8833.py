@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+import time
+from ctypes import POINTER, c_uint8, cast
+import numpy as np
+from smbus2 import SMBus, i2c_msg
+
+##############################################################################
+# 定数
+##############################################################################
+AMG8833_ADDR = 0x68                 # I2C アドレス
+AMG8833_PIXELS = 64                 # 画素数(8x8)
+
+# レジスタ
+REG_PCTL = 0x00                     # 動作モード
+REG_RST = 0x01                      # リセット
+REG_FPSC = 0x02                     # フレームレート
+REG_INTC = 0x03                     # 割り込み制御
+REG_TTHL = 0x0E                     # サーミスタ温度(下位)
+REG_T01L = 0x80                     # 画素温度(先頭)
+
+PCTL_NORMAL = 0x00                  # 通常モード
+RST_INITIAL = 0x3F                  # イニシャルリセット
+FPSC_10FPS = 0x00                   # 10fps
+FPSC_1FPS = 0x01                    # 1fps
+
+PIXEL_RESOLUTION = 0.25             # 画素温度の分解能[℃]
+THERMISTOR_RESOLUTION = 0.0625      # サーミスタ温度の分解能[℃]
+STARTUP_WAIT = 0.1                  # 初期化後の待ち時間[sec]
+
+##############################################################################
+# クラス：AMG8833
+#   128byteの画素温度を1回のI2Cトランザクションで読み出し、
+#   確保済みの(8, 8) float32配列へ変換する
+##############################################################################
+class AMG8833(object):
+    def __init__(self, bus=1, address=AMG8833_ADDR, fps=10):
+        self.address = address
+        self.bus = SMBus(bus)
+        # フレーム周期[sec]
+        self.frame_period = 1.0 / fps
+        # 画素温度の読み出し(レジスタ指定 + 128byte読み出し)
+        self.pixel_reg = i2c_msg.write(address, [REG_T01L])
+        self.pixel_read = i2c_msg.read(address, AMG8833_PIXELS * 2)
+        # 読み出しバッファをそのまま参照する配列(リトルエンディアン 16bit)
+        raw = np.ctypeslib.as_array(cast(self.pixel_read.buf, POINTER(c_uint8)),
+                                    shape=(AMG8833_PIXELS * 2,))
+        self.raw = raw.view('<u2')
+        # 変換用の作業領域
+        self.work = np.empty(AMG8833_PIXELS, dtype=np.uint16)
+        # 画素温度[℃]
+        self.pixels = np.zeros((8, 8), dtype=np.float32)
+        self.pixels_flat = self.pixels.reshape(AMG8833_PIXELS)
+        # サーミスタ温度の読み出し
+        self.thermistor_reg = i2c_msg.write(address, [REG_TTHL])
+        self.thermistor_read = i2c_msg.read(address, 2)
+        # フレームの取得時刻・通番
+        self.timestamp = 0.0
+        self.frame_count = 0
+
+        # 通常モード・イニシャルリセット・フレームレート・割り込み無効
+        self.bus.write_byte_data(address, REG_PCTL, PCTL_NORMAL)
+        self.bus.write_byte_data(address, REG_RST, RST_INITIAL)
+        self.bus.write_byte_data(address, REG_FPSC, FPSC_10FPS if fps >= 10 else FPSC_1FPS)
+        self.bus.write_byte_data(address, REG_INTC, 0x00)
+        time.sleep(STARTUP_WAIT)
+
+    ##########################################################################
+    # 新しいフレームが出力されているか
+    ##########################################################################
+    def frame_ready(self):
+        return time.monotonic() - self.timestamp >= self.frame_period
+
+    ##########################################################################
+    # 画素温度の読み出し
+    #   force=False の場合、前回から1フレーム周期経っていなければ読み出さない
+    ##########################################################################
+    def read_frame(self, force=True):
+        if not force and not self.frame_ready():
+            return self.pixels
+
+        self.bus.i2c_rdwr(self.pixel_reg, self.pixel_read)
+        self.timestamp = time.monotonic()
+        self.frame_count += 1
+        # 12bit 2の補数 -> 符号付き整数
+        np.bitwise_and(self.raw, 0x0FFF, out=self.work)
+        np.bitwise_xor(self.work, 0x0800, out=self.work)
+        signed = self.work.view(np.int16)
+        np.subtract(signed, 0x0800, out=signed)
+        # 0.25℃/LSB
+        np.multiply(signed, PIXEL_RESOLUTION, out=self.pixels_flat, casting='unsafe')
+
+        return self.pixels
+
+    ##########################################################################
+    # サーミスタ温度の読み出し
+    ##########################################################################
+    def read_thermistor(self):
+        self.bus.i2c_rdwr(self.thermistor_reg, self.thermistor_read)
+        data = bytes(self.thermistor_read)
+        raw = data[0] | (data[1] << 8)
+        # 12bit 符号 + 絶対値
+        value = raw & 0x07FF
+        if raw & 0x0800:
+            value = -value
+
+        return value * THERMISTOR_RESOLUTION
+
+    ##########################################################################
+    # 終了
+    ##########################################################################
+    def close(self):
+        self.bus.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import json
+import random
+import datetime
+import argparse
+import itertools
+import tempfile
+import contextlib
+import numpy as np
+import tuning
+from tuning import Tuning, TUNING_FILE
+from measurement import MeasurementRuntime, DISTANCE_UPPER_LIMIT, CASCADE_NAME
+from cascade_registry import CASCADE_PARAMS
+from sensor_source import ReplaySources
+
+##############################################################################
+# 定数
+##############################################################################
+# 調べるパラメータの候補
+#   pause_cycles(計測結果の表示時間)は掃引しない：一時停止中は処理が軽く、待っている人が
+#   いないセッションでは長いほど良く見えるため(調整済みパラメータのファイルで手動で指定できる)
+SWEEP = {'proc_cycle': (33, 50, 67, 100),
+         'scale_factor': (1.1, 1.2, 1.3),
+         'min_neighbors': (2, 3, 4),
+         'min_size': (120, 150, 180),
+         'detect_interval': (5, 10, 20)}
+MAX_TRIALS = 40                     # 試す組み合わせの上限(超える分は無作為に選ぶ)
+
+# 評価項目(すべて小さいほど良い)
+OBJECTIVES = ('cpu_ms_per_frame',   # カメラ1フレームあたりのCPU時間[msec]
+              'cpu_load',           # 再生時間あたりのCPU時間
+              'detect_s',           # 人が計測範囲に入ってから顔を検出するまで(平均)[sec]
+              'false_per_hour',     # 計測範囲に人がいない時の顔検出数[回/時]
+              'latency_p95_s',      # 人が来てから計測完了まで(95%点)[sec]
+              'arrival_p95_s')      # 距離センサが人を捉えてから計測完了まで(95%点、一時停止中の待ちを含む)[sec]
+
+##############################################################################
+# クラス：TrialProbe
+#   1回の再生の、顔検出までの時間・誤検出・計測までの時間
+##############################################################################
+class TrialProbe(object):
+    def __init__(self, clock, runtime):
+        self.clock = clock
+        self.runtime = runtime
+        # 人が計測範囲に入った時刻(顔を検出するまで)
+        self.arrival = None
+        self.present = False
+        self.detect_times = []
+        self.false_detections = 0
+        self.latencies = []
+        # 距離センサが人を捉えた時刻(計測済みの人はNone)
+        self.present_since = None
+        self.measured = False
+        self.arrival_times = []
+
+    def on_event(self, event):
+        if event['event'] != 'measurement':
+            return
+        if event['latency'] is not None:
+            self.latencies.append(event['latency'])
+        if self.present_since is not None:
+            self.arrival_times.append(self.clock.now() - self.present_since)
+        # 同じ人が立ち去るまでは数えない
+        self.present_since = None
+        self.measured = True
+
+    ##########################################################################
+    # 周期ごとに距離センサを見る(計測の状態によらない)
+    ##########################################################################
+    def poll(self):
+        if self.runtime.distance_ranging.distance > DISTANCE_UPPER_LIMIT:
+            self.present_since = None
+            self.measured = False
+        elif self.present_since is None and not self.measured:
+            self.present_since = self.clock.now()
+
+    def on_frame(self, frame, face_rect):
+        # 距離センサで人がいるか(正解の代わり)
+        present = self.runtime.distance <= DISTANCE_UPPER_LIMIT
+        if present and not self.present:
+            self.arrival = self.clock.now()
+        self.present = present
+        if face_rect is None:
+            return
+        if not present:
+            self.false_detections += 1
+        elif self.arrival is not None:
+            self.detect_times.append(self.clock.now() - self.arrival)
+            self.arrival = None
+
+##############################################################################
+# 1つの組み合わせを全セッションで評価
+##############################################################################
+def evaluate(params, sessions, throughput):
+    cpu = 0.0
+    frames = 0
+    duration = 0.0
+    detect_times = []
+    false_detections = 0
+    latencies = []
+    arrival_times = []
+    for session in sessions:
+        sources = ReplaySources(session, realtime=False)
+        # 計測ログ・途中経過の表示は捨てる
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            runtime = MeasurementRuntime(sources, log_path=tempfile.mkdtemp(prefix='autotune_'),
+                                         metrics_file='', throughput=throughput,
+                                         tuning=Tuning(params))
+            probe = TrialProbe(sources.clock, runtime)
+            runtime.subscribe(probe.on_event)
+            runtime.subscribe_frames(probe.on_frame)
+            start = time.process_time()
+            runtime.start()
+            while not sources.finished:
+                sources.clock.advance(runtime.step() / 1000)
+                probe.poll()
+            cpu += time.process_time() - start
+            frames += runtime.face_tracker.frames
+            runtime.close()
+        duration += float(sources.session.duration)
+        detect_times += probe.detect_times
+        false_detections += probe.false_detections
+        latencies += probe.latencies
+        arrival_times += probe.arrival_times
+
+    return {'cpu_ms_per_frame': round(cpu * 1000 / frames, 3) if frames else float('inf'),
+            'cpu_load': round(cpu / duration, 4) if duration else float('inf'),
+            'detect_s': round(float(np.mean(detect_times)), 3) if detect_times else float('inf'),
+            'false_per_hour': round(false_detections * 3600 / duration, 1) if duration else float('inf'),
+            'latency_p95_s': round(float(np.percentile(latencies, 95)), 3) if latencies else float('inf'),
+            'arrival_p95_s': round(float(np.percentile(arrival_times, 95)), 3) if arrival_times else float('inf'),
+            'persons': len(latencies)}
+
+##############################################################################
+# 試す組み合わせ(多すぎる場合は無作為に選び、既定値は必ず含める)
+##############################################################################
+def candidates(sweep, max_trials, seed):
+    names = sorted(sweep)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(sweep[name] for name in names))]
+    if len(grid) <= max_trials:
+        return grid
+    cascade = CASCADE_PARAMS[CASCADE_NAME]
+    default = dict(tuning.CYCLE_PARAMS, scale_factor=cascade['scale_factor'],
+                   min_neighbors=cascade['min_neighbors'], min_size=cascade['min_size'][0])
+    default = {name: default[name] for name in names}
+    trials = random.Random(seed).sample([p for p in grid if p != default], max_trials - 1)
+
+    return [default] + trials
+
+##############################################################################
+# パレート最適(他のどの結果にも全項目で負けていないもの)
+##############################################################################
+def pareto(results):
+    front = []
+    for params, metrics in results:
+        dominated = False
+        for other_params, other in results:
+            if (all(other[key] <= metrics[key] for key in OBJECTIVES) and
+                any(other[key] < metrics[key] for key in OBJECTIVES)):
+                dominated = True
+                break
+        if not dominated:
+            front.append((params, metrics))
+
+    return front
+
+##############################################################################
+# パレート最適の中から1つ選ぶ(項目ごとに0..1へ正規化した合計が最小)
+#   どの組み合わせでも求まらなかった項目(顔・人がいないセッション等)は比べない
+##############################################################################
+def select(front):
+    keys = [key for key in OBJECTIVES if any(np.isfinite(metrics[key]) for params, metrics in front)]
+    finite = [(params, metrics) for params, metrics in front
+              if all(np.isfinite(metrics[key]) for key in keys)]
+    if not keys or not finite:
+        return None
+    table = np.array([[metrics[key] for key in keys] for params, metrics in finite])
+    span = table.max(axis=0) - table.min(axis=0)
+    span[span == 0] = 1.0
+    score = ((table - table.min(axis=0)) / span).sum(axis=1)
+
+    return finite[int(np.argmin(score))]
+
+##############################################################################
+# 記録したセッションでパラメータを掃引し、調整済みパラメータのファイルを作る
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='記録したセッションで周期・顔検出のパラメータを調整する')
+    parser.add_argument('sessions', nargs='+', help='sensor_sourceで記録したセッションファイル')
+    parser.add_argument('--output', default=TUNING_FILE)
+    parser.add_argument('--max-trials', type=int, default=MAX_TRIALS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--throughput', action='store_true', help='連続計測で評価する')
+    args = parser.parse_args()
+
+    trials = candidates(SWEEP, args.max_trials, args.seed)
+    results = []
+    start = time.perf_counter()
+    for i, params in enumerate(trials):
+        metrics = evaluate(params, args.sessions, args.throughput)
+        results.append((params, metrics))
+        print('[{}/{}] {} -> {}'.format(i + 1, len(trials), params, metrics), flush=True)
+    front = pareto(results)
+    selected = select(front)
+    print('{} trials in {:.1f} s, {} Pareto-optimal'.format(len(trials), time.perf_counter() - start, len(front)))
+    if selected is None:
+        print('[error] autotune: no setting could be evaluated on these sessions')
+        sys.exit(1)
+
+    data = {'params': selected[0],
+            'metrics': selected[1],
+            'objectives': list(OBJECTIVES),
+            'pareto': [{'params': params, 'metrics': metrics} for params, metrics in front],
+            'sessions': [os.path.basename(session) for session in args.sessions],
+            'throughput': args.throughput,
+            'hardware': tuning.hardware(),
+            'created': datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}
+    with open(args.output, 'w') as file:
+        # 無限大(検出・計測できなかった項目)はnullとして書く
+        json.dump(finite_json(data), file, indent=1)
+    print('selected', json.dumps(finite_json(data['params'])), json.dumps(finite_json(data['metrics'])))
+    print('written', args.output)
+
+##############################################################################
+# JSONに書けない値(無限大)をNoneにする
+##############################################################################
+def finite_json(value):
+    if isinstance(value, dict):
+        return {key: finite_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [finite_json(item) for item in value]
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+
+    return value
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+import os
+import glob
+import json
+import datetime
+import argparse
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+# 計測(measurement.py)と共通
+LOG_PATH = './log_file/'            # ログファイル保存パス
+CALIBRATION_FILE = './calibration.json'     # 補正係数ファイル(このスクリプトで生成)
+BODY_TEMP_STANDARD = 36.2           # 体温(基準値)[℃]
+BODY_TEMP_UPPER = 38.0              # 学習に使う体温の上限[℃]
+BODY_TEMP_LOWER = 35.0              # 学習に使う体温の下限[℃]
+MIN_ROWS = 10                       # 学習に必要な計測数
+
+# ログの列(日時, 体温, センサ温度, 距離, サーミスタ, サーミスタ補正)
+COL_BODY_TEMP = 1
+COL_SENSOR = 2
+COL_DISTANCE = 3
+COL_THERMISTOR = 4
+
+##############################################################################
+# クラス：Calibration
+#   体温 = センサ温度 + 補正
+#   補正 = c0 + c1 * サーミスタ温度 + c2 * 距離
+##############################################################################
+class Calibration(object):
+    def __init__(self, coef):
+        self.coef = np.asarray(coef, dtype=np.float64)
+
+    ##########################################################################
+    # 補正値[℃]
+    ##########################################################################
+    def correction(self, thermistor, distance):
+        return float(np.dot(self.coef, (1.0, thermistor, distance)))
+
+    ##########################################################################
+    # 体温[℃]
+    ##########################################################################
+    def body_temp(self, sensor, thermistor, distance):
+        return sensor + self.correction(thermistor, distance)
+
+##############################################################################
+# 補正係数ファイルの読み込み(無ければNone)
+##############################################################################
+def load(path=CALIBRATION_FILE):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        data = json.load(file)
+
+    return Calibration(data['coef'])
+
+##############################################################################
+# ログの読み込み (N, 4) : 体温, センサ温度, 距離, サーミスタ
+##############################################################################
+def load_logs(log_path=LOG_PATH):
+    tables = []
+    for filename in sorted(glob.glob(os.path.join(log_path, '*.csv'))):
+        table = np.genfromtxt(filename, delimiter=',', skip_header=1, encoding='utf-8',
+                              usecols=(COL_BODY_TEMP, COL_SENSOR, COL_DISTANCE, COL_THERMISTOR),
+                              ndmin=2)
+        if table.size > 0:
+            tables.append(table)
+    if not tables:
+        return np.empty((0, 4))
+
+    return np.vstack(tables)
+
+##############################################################################
+# 補正係数の最小二乗推定
+#   平熱の人の体温は基準値とみなし、基準値 - センサ温度 を目的変数とする
+##############################################################################
+def fit(table, body_temp_standard=BODY_TEMP_STANDARD):
+    table = table[np.all(np.isfinite(table), axis=1)]
+    # 発熱・低体温と判定された計測は学習に使わない
+    normal = (table[:, 0] <= BODY_TEMP_UPPER) & (table[:, 0] >= BODY_TEMP_LOWER)
+    table = table[normal]
+    if len(table) < MIN_ROWS:
+        raise ValueError('not enough measurements: {}'.format(len(table)))
+
+    sensor = table[:, 1]
+    distance = table[:, 2]
+    thermistor = table[:, 3]
+    design = np.column_stack((np.ones(len(table)), thermistor, distance))
+    target = body_temp_standard - sensor
+    coef, _, _, _ = np.linalg.lstsq(design, target, rcond=None)
+    rmse = float(np.sqrt(np.mean((design @ coef - target) ** 2)))
+
+    return coef, rmse, len(table)
+
+##############################################################################
+# 補正係数の学習
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='ログから体温の補正係数を求める')
+    parser.add_argument('--log-path', default=LOG_PATH)
+    parser.add_argument('--output', default=CALIBRATION_FILE)
+    args = parser.parse_args()
+
+    coef, rmse, rows = fit(load_logs(args.log_path))
+    data = {'model': 'body_temp = sensor + c0 + c1 * thermistor + c2 * distance',
+            'coef': [round(float(c), 6) for c in coef],
+            'rmse': round(rmse, 4),
+            'rows': rows,
+            'created': datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}
+    with open(args.output, 'w') as file:
+        json.dump(data, file, indent=1)
+    print(json.dumps(data, indent=1))
+
+if __name__ == '__main__':
+    main()
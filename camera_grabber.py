@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import time
+import threading
+import cv2
+
+##############################################################################
+# 定数
+##############################################################################
+CAMERA_BUFFER_SIZE = 1              # ドライバのバッファ数
+CAMERA_FOURCC = 'MJPG'              # 転送フォーマット(圧縮)
+GRAB_RETRY_WAIT = 0.01              # 取得失敗時の待ち時間[sec]
+
+##############################################################################
+# クラス：CameraGrabber
+#   スレッドでカメラ映像を取得し続け、最新のフレームだけを保持する
+#   バッファは 書き込み中 / 最新 / 読み出し中 の3面を入れ替えて使うため、
+#   読み出し側が参照しているフレームが上書きされることは無い
+##############################################################################
+class CameraGrabber(object):
+    def __init__(self, index=0, width=480, height=480,
+                 buffer_size=CAMERA_BUFFER_SIZE, fourcc=CAMERA_FOURCC):
+        self.capture = cv2.VideoCapture(index)
+        # 圧縮フォーマット・バッファ数(対応しているカメラのみ有効)
+        if fourcc:
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        # フレームバッファ(書き込み中 / 最新 / 読み出し中)
+        self.back = None
+        self.ready = None
+        self.front = None
+        # 最新フレームの取得時刻・通番
+        self.ready_timestamp = 0.0
+        self.ready_seq = 0
+        # 読み出したフレームの取得時刻・通番
+        self.timestamp = 0.0
+        self.seq = 0
+        # 取得失敗回数
+        self.errors = 0
+        self.lock = threading.Lock()
+        # 取得中(クリアすると取得を休止する)
+        self.active = threading.Event()
+        self.active.set()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    ##########################################################################
+    # ネゴシエーション結果(フォーマット, バッファ数)
+    ##########################################################################
+    def negotiated(self):
+        code = int(self.capture.get(cv2.CAP_PROP_FOURCC))
+        fourcc = ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+        return fourcc, int(self.capture.get(cv2.CAP_PROP_BUFFERSIZE))
+
+    ##########################################################################
+    # カメラの接続確認
+    ##########################################################################
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    ##########################################################################
+    # 取得開始
+    ##########################################################################
+    def start(self):
+        self.thread.start()
+
+    ##########################################################################
+    # 取得休止
+    ##########################################################################
+    def pause(self):
+        self.active.clear()
+
+    ##########################################################################
+    # 取得再開
+    ##########################################################################
+    def resume(self):
+        self.active.set()
+
+    ##########################################################################
+    # 取得スレッド
+    ##########################################################################
+    def run(self):
+        while not self.stop_event.is_set():
+            if not self.active.wait(timeout=0.1):
+                continue
+            if not self.capture.grab():
+                self.errors += 1
+                time.sleep(GRAB_RETRY_WAIT)
+                continue
+            timestamp = time.monotonic()
+            ret, frame = self.capture.retrieve(self.back)
+            if not ret:
+                self.errors += 1
+                continue
+            with self.lock:
+                # 書き込んだバッファを最新フレームにする
+                self.back = self.ready
+                self.ready = frame
+                self.ready_timestamp = timestamp
+                self.ready_seq += 1
+
+    ##########################################################################
+    # 最新フレームの読み出し(待たない)
+    #   戻り値は cv2.VideoCapture.read() と同じ (ret, frame)
+    ##########################################################################
+    def read(self):
+        with self.lock:
+            if self.ready_seq != self.seq:
+                # 最新フレームと読み出し中のバッファを入れ替える
+                self.front, self.ready = self.ready, self.front
+                self.timestamp = self.ready_timestamp
+                self.seq = self.ready_seq
+
+        return self.front is not None, self.front
+
+    ##########################################################################
+    # 取得終了
+    ##########################################################################
+    def release(self):
+        self.stop_event.set()
+        self.active.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        self.capture.release()
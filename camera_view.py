@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+import time
+import cv2
+import numpy as np
+import PIL.Image, PIL.ImageTk
+
+##############################################################################
+# 定数
+##############################################################################
+GUIDE_TOP_LEFT = (60, 60)           # ガイド枠(左上)[px]
+GUIDE_BOTTOM_RIGHT = (420, 420)     # ガイド枠(右下)[px]
+GUIDE_COLOR = (255, 255, 255, 255)  # ガイド枠の色(RGBA)
+GUIDE_THICKNESS = 5                 # ガイド枠の太さ[px]
+
+##############################################################################
+# クラス：CameraView
+#   カメラ映像をキャンバスへ表示する
+#   バッファ・PhotoImage・キャンバスのアイテムは一度だけ生成し、
+#   以降のフレームはすべて同じ領域を上書きして表示する
+##############################################################################
+class CameraView(object):
+    def __init__(self, canvas):
+        self.canvas = canvas
+        # フレームサイズ(高さ, 幅)
+        self.shape = None
+        # 左右反転後のフレーム(BGR)
+        self.frame_mirror = None
+        # 表示用フレーム(RGBA)
+        self.frame_color = None
+        # 顔検出用フレーム(モノクロ)
+        self.frame_gray = None
+        # ガイド枠のマスク
+        self.guide_mask = None
+        self.guide_color = np.array(GUIDE_COLOR, dtype=np.uint8)
+        # 表示用フレームとメモリを共有するPillowイメージ
+        self.image = None
+        # Pillow Photo
+        self.photo = None
+        # キャンバスのイメージアイテム
+        self.image_item = None
+        # 表示フレーム数
+        self.frame_count = 0
+        # 直近フレームの処理時間[sec]
+        self.frame_time = 0.0
+        # 処理開始時刻
+        self.frame_start = 0.0
+
+    ##########################################################################
+    # バッファの確保
+    ##########################################################################
+    def prepare(self, shape):
+        h, w = shape[0], shape[1]
+        self.shape = (h, w)
+        self.frame_mirror = np.empty((h, w, 3), dtype=np.uint8)
+        self.frame_color = np.empty((h, w, 4), dtype=np.uint8)
+        self.frame_gray = np.empty((h, w), dtype=np.uint8)
+        # ガイド枠のマスク(枠の画素のみTrue)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.rectangle(mask, GUIDE_TOP_LEFT, GUIDE_BOTTOM_RIGHT, 1, thickness=GUIDE_THICKNESS)
+        self.guide_mask = mask.astype(bool).reshape(h, w, 1)
+        # RGBAはPillowとメモリを共有できるため、表示用フレームを直接参照する
+        self.image = PIL.Image.frombuffer('RGBA', (w, h), self.frame_color, 'raw', 'RGBA', 0, 1)
+        self.photo = PIL.ImageTk.PhotoImage(self.image.mode, (w, h))
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(0, 0, image = self.photo, anchor = 'nw')
+        else:
+            self.canvas.itemconfig(self.image_item, image = self.photo)
+
+    ##########################################################################
+    # フレーム更新(左右反転 + 色変換)
+    #   mirror=False は左右反転済みのフレーム
+    ##########################################################################
+    def update(self, frame, mirror=True):
+        self.frame_start = time.perf_counter()
+        if self.shape != frame.shape[0:2]:
+            self.prepare(frame.shape)
+        # 左右反転
+        if mirror:
+            cv2.flip(frame, 1, dst=self.frame_mirror)
+            frame = self.frame_mirror
+        # OpenCV(BGR) -> Pillow(RGBA)変換
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self.frame_color)
+
+        return self.frame_color
+
+    ##########################################################################
+    # モノクロフレーム
+    ##########################################################################
+    def gray(self):
+        cv2.cvtColor(self.frame_color, cv2.COLOR_RGBA2GRAY, dst=self.frame_gray)
+
+        return self.frame_gray
+
+    ##########################################################################
+    # 矩形の描画
+    ##########################################################################
+    def draw_rects(self, rects, color, thickness=5):
+        for rect in rects:
+            cv2.rectangle(self.frame_color,
+                          (int(rect[0]), int(rect[1])),
+                          (int(rect[0] + rect[2]), int(rect[1] + rect[3])),
+                          color,
+                          thickness=thickness)
+
+    ##########################################################################
+    # 表示
+    ##########################################################################
+    def show(self):
+        # ガイド枠の描画
+        np.copyto(self.frame_color, self.guide_color, where=self.guide_mask)
+        # Pillow -> Photo(キャンバスのアイテムは同じPhotoを参照し続ける)
+        self.photo.paste(self.image)
+        self.frame_count += 1
+        self.frame_time = time.perf_counter() - self.frame_start
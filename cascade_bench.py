@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+import os
+import csv
+import time
+import argparse
+import cv2
+import numpy as np
+from cascade_registry import CascadeRegistry
+
+##############################################################################
+# 定数
+##############################################################################
+IOU_THRESHOLD = 0.5                 # 正解とみなす重なり(IoU)の下限
+FRAME_EXT = ('.png', '.jpg', '.jpeg', '.bmp')   # 対象とする画像ファイル
+
+##############################################################################
+# 録画フレームの読み込み(モノクロ)
+##############################################################################
+def load_frames(frame_dir):
+    frames = {}
+    for filename in sorted(os.listdir(frame_dir)):
+        if filename.lower().endswith(FRAME_EXT):
+            frame = cv2.imread(os.path.join(frame_dir, filename), cv2.IMREAD_GRAYSCALE)
+            if frame is not None:
+                frames[filename] = frame
+
+    return frames
+
+##############################################################################
+# 正解矩形の読み込み
+#   CSV：ファイル名, x, y, 横幅, 縦幅 (1行に1矩形、顔の無いフレームは行なし)
+##############################################################################
+def load_labels(label_file):
+    labels = {}
+    with open(label_file, newline='') as csvfile:
+        for row in csv.reader(csvfile):
+            if len(row) < 5 or not row[1].strip().lstrip('-').isdigit():
+                continue
+            labels.setdefault(row[0], []).append(tuple(int(v) for v in row[1:5]))
+
+    return labels
+
+##############################################################################
+# 矩形の重なり(IoU)
+##############################################################################
+def iou(a, b):
+    x1 = max(a[0], b[0])
+    y1 = max(a[1], b[1])
+    x2 = min(a[0] + a[2], b[0] + b[2])
+    y2 = min(a[1] + a[3], b[1] + b[3])
+    inter = max(x2 - x1, 0) * max(y2 - y1, 0)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+
+    return inter / union if union > 0 else 0.0
+
+##############################################################################
+# 1カスケードの評価
+##############################################################################
+def bench_cascade(registry, name, frames, labels):
+    cascade = registry.get(name)
+    params = registry.params(name)
+    hits = 0
+    boxes = 0
+    false_detections = 0
+    elapsed = 0.0
+    for filename, frame in frames.items():
+        start = time.perf_counter()
+        facerect = cascade.detectMultiScale(frame,
+                                            scaleFactor=params['scale_factor'],
+                                            minNeighbors=params['min_neighbors'],
+                                            minSize=params['min_size'])
+        elapsed += time.perf_counter() - start
+        truth = labels.get(filename, [])
+        matched = set()
+        for rect in facerect:
+            scores = [iou(rect, box) for box in truth]
+            best = int(np.argmax(scores)) if scores else -1
+            if best >= 0 and scores[best] >= IOU_THRESHOLD and best not in matched:
+                matched.add(best)
+            else:
+                false_detections += 1
+        hits += len(matched)
+        boxes += len(truth)
+
+    return {'name': name,
+            'load_ms': registry.load_time[name] * 1000,
+            'memory_kb': registry.memory[name] / 1024,
+            'ms_per_frame': elapsed * 1000 / max(len(frames), 1),
+            'hit_rate': hits / boxes if boxes > 0 else 0.0,
+            'false_detections': false_detections}
+
+##############################################################################
+# ベンチマーク
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='haarcascadesの速度・精度比較')
+    parser.add_argument('frame_dir', help='録画フレームのフォルダ')
+    parser.add_argument('--labels', help='正解矩形のCSV(省略時は<frame_dir>/labels.csv)')
+    parser.add_argument('--names', nargs='*', help='評価するカスケード名(省略時は全て)')
+    parser.add_argument('--min-hit-rate', type=float, default=0.9, help='精度の下限')
+    args = parser.parse_args()
+
+    registry = CascadeRegistry()
+    names = args.names or registry.names()
+    frames = load_frames(args.frame_dir)
+    label_file = args.labels or os.path.join(args.frame_dir, 'labels.csv')
+    labels = load_labels(label_file) if os.path.isfile(label_file) else {}
+    print('{} frames, {} labelled boxes'.format(len(frames), sum(len(v) for v in labels.values())))
+
+    results = [bench_cascade(registry, name, frames, labels) for name in names]
+    results.sort(key=lambda result: result['ms_per_frame'])
+    print('{:<22}{:>10}{:>12}{:>12}{:>10}{:>8}'.format('cascade', 'load[ms]', 'memory[kB]', 'ms/frame', 'hit rate', 'false'))
+    for result in results:
+        print('{name:<22}{load_ms:>10.1f}{memory_kb:>12.0f}{ms_per_frame:>12.2f}'
+              '{hit_rate:>10.3f}{false_detections:>8}'.format(**result))
+
+    # 精度の下限を満たす最速のカスケード
+    for result in results:
+        if result['hit_rate'] >= args.min_hit_rate:
+            print('fastest cascade with hit rate >= {}: {}'.format(args.min_hit_rate, result['name']))
+            break
+    else:
+        print('no cascade reaches hit rate {}'.format(args.min_hit_rate))
+
+if __name__ == '__main__':
+    main()
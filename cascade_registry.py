@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+import os
+import time
+import cv2
+
+##############################################################################
+# 定数
+##############################################################################
+CASCADE_DIR = 'haarcascades/'       # カスケードの保存パス
+
+# 顔検出に使うカスケード(正面・横顔)と検出パラメータ
+CASCADE_PARAMS = {
+    'frontalface_default':  {'scale_factor': 1.2, 'min_neighbors': 2, 'min_size': (150, 150)},
+    'frontalface_alt':      {'scale_factor': 1.2, 'min_neighbors': 2, 'min_size': (150, 150)},
+    'frontalface_alt2':     {'scale_factor': 1.2, 'min_neighbors': 2, 'min_size': (150, 150)},
+    'frontalface_alt_tree': {'scale_factor': 1.2, 'min_neighbors': 1, 'min_size': (150, 150)},
+    'profileface':          {'scale_factor': 1.2, 'min_neighbors': 2, 'min_size': (150, 150)},
+}
+
+##############################################################################
+# プロセスの常駐メモリ[byte]
+##############################################################################
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+##############################################################################
+# クラス：CascadeRegistry
+#   カスケードを名前で管理し、それぞれ一度だけ読み込む
+##############################################################################
+class CascadeRegistry(object):
+    def __init__(self, cascade_dir=CASCADE_DIR, params=CASCADE_PARAMS):
+        self.cascade_dir = cascade_dir
+        self.cascade_params = params
+        # 読み込み済みのカスケード
+        self.cascades = {}
+        # 読み込み時間[sec]
+        self.load_time = {}
+        # 読み込みによるメモリ増加量[byte]
+        self.memory = {}
+
+    ##########################################################################
+    # 登録されているカスケード名
+    ##########################################################################
+    def names(self):
+        return list(self.cascade_params.keys())
+
+    ##########################################################################
+    # カスケードのファイルパス
+    ##########################################################################
+    def path(self, name):
+        if name not in self.cascade_params:
+            raise KeyError('unknown cascade: ' + name)
+        return os.path.join(self.cascade_dir, 'haarcascade_' + name + '.xml')
+
+    ##########################################################################
+    # 検出パラメータ
+    ##########################################################################
+    def params(self, name):
+        if name not in self.cascade_params:
+            raise KeyError('unknown cascade: ' + name)
+        return dict(self.cascade_params[name])
+
+    ##########################################################################
+    # カスケードの取得(未読み込みなら読み込む)
+    ##########################################################################
+    def get(self, name):
+        if name not in self.cascades:
+            path = self.path(name)
+            rss = rss_bytes()
+            start = time.perf_counter()
+            cascade = cv2.CascadeClassifier(path)
+            self.load_time[name] = time.perf_counter() - start
+            self.memory[name] = max(rss_bytes() - rss, 0)
+            if cascade.empty():
+                raise IOError('cannot load cascade: ' + path)
+            self.cascades[name] = cascade
+
+        return self.cascades[name]
+
+    ##########################################################################
+    # 全カスケードの読み込み
+    ##########################################################################
+    def load_all(self):
+        for name in self.names():
+            self.get(name)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+import os
+import csv
+import time
+import queue
+import atexit
+import threading
+
+##############################################################################
+# 定数
+##############################################################################
+LOG_QUEUE_SIZE = 256                # 書き込み待ちの上限[件]
+LOG_BATCH_SIZE = 16                 # まとめて書き込む件数[件]
+LOG_FLUSH_INTERVAL = 5.0            # 書き込み待ちを保持する最大時間[sec]
+LOG_RETRIES = 1                     # 書き込みに失敗した時、ファイルを開き直して再試行する回数
+LOG_HEADER = ['日時',
+              '体温',
+              'センサ温度',
+              '距離',
+              'サーミスタ',
+              'サーミスタ補正']
+
+# fsyncの方針
+FSYNC_NONE = 'none'                 # OSに任せる
+FSYNC_BATCH = 'batch'               # まとめて書き込むたびにfsync
+
+##############################################################################
+# クラス：CsvLogger
+#   計測結果をキューで受け取り、スレッドで月ごとのCSVへまとめて書き込む
+##############################################################################
+class CsvLogger(object):
+    def __init__(self, log_path, header=LOG_HEADER,
+                 queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, fsync=FSYNC_BATCH):
+        self.log_path = log_path
+        self.header = header
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.queue = queue.Queue(maxsize=queue_size)
+        # 書き込み中のファイル
+        self.filename = None
+        self.file = None
+        self.writer = None
+        # 件数
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        # 書き込み(fsyncを含む)の合計時間[sec]
+        self.flush_seconds = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        # フォルダの存在チェック
+        if not os.path.isdir(log_path):
+            os.makedirs(log_path)
+
+    ##########################################################################
+    # 書き込み待ちの件数
+    ##########################################################################
+    @property
+    def queued(self):
+        return self.queue.qsize()
+
+    ##########################################################################
+    # 書き込み開始
+    ##########################################################################
+    def start(self):
+        self.thread.start()
+        # 異常終了以外は必ず書き込んでから終了する
+        atexit.register(self.close)
+
+    ##########################################################################
+    # 計測結果の追加(キューが一杯なら破棄)
+    #   now：計測日時(datetime)、row：日時以降の列
+    ##########################################################################
+    def put(self, now, row):
+        try:
+            self.queue.put_nowait((now, row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    ##########################################################################
+    # 書き込みスレッド
+    ##########################################################################
+    def run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if record is not None:
+                batch.append(record)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            stopping = self.stop_event.is_set() and self.queue.empty()
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self.flush(batch)
+                batch = []
+                deadline = None
+            if stopping:
+                break
+        self.close_file()
+
+    ##########################################################################
+    # まとめて書き込み(失敗したらファイルを開き直して再試行し、それでも失敗したら破棄)
+    ##########################################################################
+    def flush(self, batch):
+        start = time.perf_counter()
+        for attempt in range(LOG_RETRIES + 1):
+            try:
+                self.write_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+                break
+            except OSError as e:
+                self.errors += 1
+                print('[error] csv_logger', e)
+                self.close_file()
+        else:
+            self.dropped += len(batch)
+        self.flush_seconds += time.perf_counter() - start
+
+    # 月が変わったらファイルを切り替える
+    def write_batch(self, batch):
+        for now, row in batch:
+            filename = os.path.join(self.log_path, now.strftime('%Y-%m') + '.csv')
+            if filename != self.filename:
+                self.open_file(filename)
+            self.writer.writerow([now.strftime('%Y-%m-%d %H:%M:%S')] + list(row))
+        self.file.flush()
+        if self.fsync == FSYNC_BATCH:
+            os.fsync(self.file.fileno())
+
+    ##########################################################################
+    # ファイルを開く(新規作成時は見出しを書き込む)
+    ##########################################################################
+    def open_file(self, filename):
+        self.close_file()
+        exists = os.path.isfile(filename)
+        self.file = open(filename, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        self.filename = filename
+        if not exists:
+            # 1行目：見出し
+            self.writer.writerow(self.header)
+
+    ##########################################################################
+    # ファイルを閉じる
+    ##########################################################################
+    def close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError as e:
+                # 書き込めなかった分は flush() で再試行・破棄する
+                print('[error] csv_logger', e)
+        self.file = None
+        self.writer = None
+        self.filename = None
+
+    ##########################################################################
+    # 終了(書き込み待ちをすべて書き込む)
+    ##########################################################################
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        # 待機中のスレッドを起こす
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self.thread.is_alive():
+            self.thread.join()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+import time
+import threading
+import numpy as np
+import VL53L0X
+
+##############################################################################
+# 定数
+##############################################################################
+RANGING_BUFFER = 64                 # 保持するサンプル数
+FILTER_SAMPLES = 5                  # 距離の中央値を取るサンプル数
+VELOCITY_WINDOW = 0.5               # 接近速度を求める期間[sec]
+MODE_SWITCH_COUNT = 3               # 計測モードを切り替える連続サンプル数
+RANGING_INTERVAL = 0.005            # 計測間の待ち時間[sec]
+OUT_OF_RANGE = 819.0                # 計測範囲外の距離[cm]
+
+##############################################################################
+# クラス：RangingFilter
+#   時刻付きの距離サンプルのリングバッファと、距離(中央値)・接近速度
+#   センサには触れない(再生・模擬の距離も同じフィルタを使う)
+##############################################################################
+class RangingFilter(object):
+    def __init__(self):
+        # 時刻[sec]・距離[cm]のリングバッファ
+        self.samples = np.zeros((RANGING_BUFFER, 2), dtype=np.float64)
+        self.count = 0
+        # 計測値の不正回数
+        self.errors = 0
+        # サンプルごとの通知先 on_sample(時刻, 距離[cm])(記録用)
+        self.on_sample = None
+        self.lock = threading.Lock()
+
+    ##########################################################################
+    # 計測開始・終了(サンプルを自分で取得する派生クラスで実装)
+    ##########################################################################
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    ##########################################################################
+    # サンプルの追加
+    ##########################################################################
+    def add(self, timestamp, distance):
+        with self.lock:
+            self.samples[self.count % RANGING_BUFFER] = (timestamp, distance)
+            self.count += 1
+        if self.on_sample is not None:
+            self.on_sample(timestamp, distance)
+
+    ##########################################################################
+    # 直近n個のサンプル(古い順)
+    ##########################################################################
+    def recent(self, n):
+        with self.lock:
+            n = min(n, self.count, RANGING_BUFFER)
+            index = (np.arange(self.count - n, self.count)) % RANGING_BUFFER
+            return self.samples[index]
+
+    ##########################################################################
+    # 距離(直近サンプルの中央値)[cm]
+    ##########################################################################
+    @property
+    def distance(self):
+        samples = self.recent(FILTER_SAMPLES)
+        if len(samples) == 0:
+            return OUT_OF_RANGE
+
+        return float(np.median(samples[:, 1]))
+
+    ##########################################################################
+    # 接近速度(負の値で近づいている)[cm/sec]
+    ##########################################################################
+    @property
+    def velocity(self):
+        samples = self.recent(RANGING_BUFFER)
+        if len(samples) == 0:
+            return 0.0
+        samples = samples[samples[:, 0] >= samples[-1, 0] - VELOCITY_WINDOW]
+        if len(samples) < 2 or samples[-1, 0] == samples[0, 0]:
+            return 0.0
+        # 最小二乗の傾き
+        t = samples[:, 0] - samples[:, 0].mean()
+        d = samples[:, 1] - samples[:, 1].mean()
+
+        return float(np.dot(t, d) / np.dot(t, t))
+
+    ##########################################################################
+    # 最新サンプルの時刻
+    ##########################################################################
+    @property
+    def timestamp(self):
+        samples = self.recent(1)
+
+        return float(samples[-1, 0]) if len(samples) > 0 else 0.0
+
+##############################################################################
+# クラス：DistanceRanging
+#   スレッドで距離センサ(VL53L0X)を計測し続け、時刻付きのリングバッファに保持する
+#   近づいてくる間は高速モード、計測範囲(下限..基準)に入ったら高精度モードで計測する
+##############################################################################
+class DistanceRanging(RangingFilter):
+    def __init__(self, sensor, lower_limit, standard,
+                 accuracy_mode=VL53L0X.VL53L0X_BETTER_ACCURACY_MODE,
+                 speed_mode=VL53L0X.VL53L0X_HIGH_SPEED_MODE):
+        RangingFilter.__init__(self)
+        self.sensor = sensor
+        self.lower_limit = lower_limit
+        self.standard = standard
+        self.accuracy_mode = accuracy_mode
+        self.speed_mode = speed_mode
+        # 現在の計測モード
+        self.mode = speed_mode
+        # 計測モードと異なる範囲にいる連続サンプル数
+        self.switch_count = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    ##########################################################################
+    # 計測開始
+    ##########################################################################
+    def start(self):
+        self.sensor.start_ranging(self.mode)
+        self.thread.start()
+
+    ##########################################################################
+    # 計測スレッド
+    ##########################################################################
+    def run(self):
+        while not self.stop_event.is_set():
+            value = self.sensor.get_distance()
+            timestamp = time.monotonic()
+            if value <= 0:
+                self.errors += 1
+            else:
+                self.add(timestamp, value / float(10))
+                self.update_mode()
+            time.sleep(RANGING_INTERVAL)
+        self.sensor.stop_ranging()
+
+    ##########################################################################
+    # 計測モードの切り替え
+    ##########################################################################
+    def update_mode(self):
+        distance = self.distance
+        in_range = self.lower_limit <= distance <= self.standard
+        wanted = self.accuracy_mode if in_range else self.speed_mode
+        if wanted == self.mode:
+            self.switch_count = 0
+            return
+        self.switch_count += 1
+        if self.switch_count >= MODE_SWITCH_COUNT:
+            self.sensor.stop_ranging()
+            self.sensor.start_ranging(wanted)
+            self.mode = wanted
+            self.switch_count = 0
+
+    ##########################################################################
+    # 計測終了
+    ##########################################################################
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
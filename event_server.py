@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+import os
+import json
+import socket
+import selectors
+import threading
+
+##############################################################################
+# 定数
+##############################################################################
+EVENT_BUFFER_MAX = 256 * 1024       # 購読者ごとの送信待ちの上限[byte](超えたら切断)
+SNAPSHOT_EVENTS = ('state', 'status')   # 接続直後に送る最新イベントの種類
+SELECT_TIMEOUT = 0.5                # 待ち時間の上限[sec]
+
+##############################################################################
+# 'host:port' -> (host, port)
+##############################################################################
+def parse_tcp(text):
+    host, _, port = text.rpartition(':')
+
+    return host or '127.0.0.1', int(port)
+
+##############################################################################
+# クラス：EventServer
+#   イベント(dict)を1行1JSONでUnixソケット・TCPの購読者全員へ配信する
+#   送信はスレッドでノンブロッキングに行い、受け取らない購読者は切断する
+##############################################################################
+class EventServer(object):
+    def __init__(self, unix_path=None, tcp_address=None, buffer_max=EVENT_BUFFER_MAX):
+        self.unix_path = unix_path
+        self.buffer_max = buffer_max
+        self.selector = selectors.DefaultSelector()
+        self.servers = []
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            self.listen(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), unix_path)
+        if tcp_address:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listen(server, tcp_address)
+        # publish()からスレッドを起こすためのソケット
+        self.wake_recv, self.wake_send = socket.socketpair()
+        self.wake_recv.setblocking(False)
+        self.wake_send.setblocking(False)
+        self.selector.register(self.wake_recv, selectors.EVENT_READ, 'wake')
+        # 購読者ごとの送信待ち
+        self.clients = {}
+        # 配信待ちの行と、種類ごとの最新イベント
+        self.pending = []
+        self.snapshot = {}
+        # 統計
+        self.published = 0
+        self.disconnected = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    ##########################################################################
+    # 待ち受け
+    ##########################################################################
+    def listen(self, server, address):
+        server.bind(address)
+        server.listen()
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ, 'accept')
+        self.servers.append(server)
+
+    ##########################################################################
+    # 配信開始
+    ##########################################################################
+    def start(self):
+        self.thread.start()
+
+    ##########################################################################
+    # イベントの配信(呼び出し側は待たない)
+    ##########################################################################
+    def publish(self, event):
+        try:
+            # 厳密なJSON(Infinity・NaNは書かない)
+            line = (json.dumps(event, ensure_ascii=False, allow_nan=False) + '\n').encode('utf-8')
+        except ValueError as e:
+            print('[error] event_server', event.get('event'), e)
+            return
+        with self.lock:
+            self.pending.append(line)
+            if event.get('event') in SNAPSHOT_EVENTS:
+                self.snapshot[event['event']] = line
+            self.published += 1
+        try:
+            self.wake_send.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    ##########################################################################
+    # 配信スレッド
+    ##########################################################################
+    def run(self):
+        while not self.stop_event.is_set():
+            for key, mask in self.selector.select(timeout=SELECT_TIMEOUT):
+                if key.data == 'accept':
+                    self.accept(key.fileobj)
+                elif key.data == 'wake':
+                    try:
+                        while self.wake_recv.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    if mask & selectors.EVENT_READ:
+                        self.receive(key.fileobj)
+                    if mask & selectors.EVENT_WRITE and key.fileobj in self.clients:
+                        self.send(key.fileobj)
+            with self.lock:
+                lines, self.pending = self.pending, []
+            if lines:
+                data = b''.join(lines)
+                for client in list(self.clients):
+                    self.clients[client] += data
+                    self.send(client)
+        for client in list(self.clients):
+            self.drop(client)
+
+    ##########################################################################
+    # 購読者の接続(最新の状態を先に送る)
+    ##########################################################################
+    def accept(self, server):
+        try:
+            client, address = server.accept()
+        except BlockingIOError:
+            return
+        client.setblocking(False)
+        with self.lock:
+            self.clients[client] = bytearray(b''.join(self.snapshot.values()))
+        self.selector.register(client, selectors.EVENT_READ, 'client')
+        self.send(client)
+
+    ##########################################################################
+    # 購読者からの受信(内容は使わず、切断だけを検知する)
+    ##########################################################################
+    def receive(self, client):
+        try:
+            data = client.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.drop(client)
+
+    ##########################################################################
+    # 送信待ちの送信(送りきれない分は書き込み可能になるまで待つ)
+    ##########################################################################
+    def send(self, client):
+        buffer = self.clients[client]
+        if len(buffer) > self.buffer_max:
+            # 受け取りが追いつかない購読者
+            self.drop(client)
+            return
+        try:
+            sent = client.send(buffer) if buffer else 0
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(client)
+            return
+        del buffer[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if buffer else 0)
+        self.selector.modify(client, events, 'client')
+
+    ##########################################################################
+    # 購読者の切断
+    ##########################################################################
+    def drop(self, client):
+        if client in self.clients:
+            del self.clients[client]
+            self.selector.unregister(client)
+            client.close()
+            self.disconnected += 1
+
+    ##########################################################################
+    # 購読者数
+    ##########################################################################
+    @property
+    def subscribers(self):
+        return len(self.clients)
+
+    ##########################################################################
+    # 終了
+    ##########################################################################
+    def close(self):
+        self.stop_event.set()
+        self.publish({'event': 'closed'})
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        for server in self.servers:
+            self.selector.unregister(server)
+            server.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
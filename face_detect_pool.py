@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+import time
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+POOL_WORKERS = 3                    # ワーカプロセス数(GUI用に1コア残す)
+RING_SLOTS = POOL_WORKERS * 2       # 共有メモリのフレームスロット数
+RESULT_MAX_AGE = 0.3                # 検出結果の有効期間[sec]
+LATENCY_FILTER = 0.1                # レイテンシ平滑化係数
+
+# Tk・OpenCVのスレッドを引き継がないようspawnでワーカを起動する
+mp_context = multiprocessing.get_context('spawn')
+
+##############################################################################
+# ワーカプロセス
+#   カスケードはプロセスごとに一度だけ読み込み、フレームは共有メモリの
+#   スロットから直接参照する(フレーム自体はpickleしない)
+##############################################################################
+def detect_worker(worker_id, cascade_path, slot_names, shape, params, task_queue, result_queue):
+    face_cascade = cv2.CascadeClassifier(cascade_path)
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    frames = [np.ndarray(shape, dtype=np.uint8, buffer=slot.buf) for slot in slots]
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            seq, slot, submit_time = task
+            start = time.monotonic()
+            facerect = face_cascade.detectMultiScale(frames[slot], **params)
+            end = time.monotonic()
+            rects = [tuple(int(v) for v in rect) for rect in facerect]
+            result_queue.put((seq, slot, worker_id, rects, submit_time, end - start, end - submit_time))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del frames
+        for slot in slots:
+            slot.close()
+
+##############################################################################
+# クラス：DetectPool
+#   顔検出をワーカプロセスに振り分け、結果を非同期に受け取る
+##############################################################################
+class DetectPool(object):
+    def __init__(self, cascade_path, shape,
+                 workers=POOL_WORKERS, slots=RING_SLOTS,
+                 scale_factor=1.2, min_neighbors=2, min_size=(150, 150)):
+        self.shape = (shape[0], shape[1])
+        self.params = {'scaleFactor': scale_factor,
+                       'minNeighbors': min_neighbors,
+                       'minSize': min_size}
+        size = self.shape[0] * self.shape[1]
+        # 共有メモリのリングスロット
+        self.slots = [shared_memory.SharedMemory(create=True, size=size) for i in range(slots)]
+        self.frames = [np.ndarray(self.shape, dtype=np.uint8, buffer=slot.buf) for slot in self.slots]
+        self.free_slots = list(range(slots))
+        # キュー
+        self.task_queue = mp_context.Queue()
+        self.result_queue = mp_context.Queue()
+        # 送信したフレームの通番
+        self.seq = 0
+        # 最新の検出結果
+        self.latest_seq = -1
+        self.latest_rects = []
+        self.latest_time = 0.0
+        # 統計
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.stale = 0
+        self.worker_latency = [0.0] * workers
+        self.worker_detect_time = [0.0] * workers
+        self.worker_count = [0] * workers
+        # ワーカプロセス起動
+        names = [slot.name for slot in self.slots]
+        self.workers = []
+        for worker_id in range(workers):
+            process = mp_context.Process(target=detect_worker,
+                                        args=(worker_id, cascade_path, names, self.shape,
+                                              self.params, self.task_queue, self.result_queue),
+                                        daemon=True)
+            process.start()
+            self.workers.append(process)
+
+    ##########################################################################
+    # 処理待ちのフレーム数
+    ##########################################################################
+    @property
+    def queue_depth(self):
+        return self.submitted - self.completed
+
+    ##########################################################################
+    # フレームの送信(空きスロットが無ければ破棄)
+    ##########################################################################
+    def submit(self, frame_gray):
+        if frame_gray.shape[0:2] != self.shape or not self.free_slots:
+            self.dropped += 1
+            return False
+
+        slot = self.free_slots.pop(0)
+        np.copyto(self.frames[slot], frame_gray)
+        self.task_queue.put((self.seq, slot, time.monotonic()))
+        self.seq += 1
+        self.submitted += 1
+
+        return True
+
+    ##########################################################################
+    # 検出結果の受信(古い結果は破棄)
+    ##########################################################################
+    def poll(self):
+        while True:
+            try:
+                seq, slot, worker_id, rects, submit_time, detect_time, latency = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.free_slots.append(slot)
+            self.completed += 1
+            self.worker_count[worker_id] += 1
+            if self.worker_count[worker_id] == 1:
+                self.worker_latency[worker_id] = latency
+                self.worker_detect_time[worker_id] = detect_time
+            else:
+                self.worker_latency[worker_id] += (latency - self.worker_latency[worker_id]) * LATENCY_FILTER
+                self.worker_detect_time[worker_id] += (detect_time - self.worker_detect_time[worker_id]) * LATENCY_FILTER
+            if seq < self.latest_seq:
+                # 後から送ったフレームの結果が先に届いている
+                self.stale += 1
+                continue
+            self.latest_seq = seq
+            self.latest_rects = rects
+            self.latest_time = submit_time
+
+        if time.monotonic() - self.latest_time > RESULT_MAX_AGE:
+            return []
+
+        return self.latest_rects
+
+    ##########################################################################
+    # 統計
+    ##########################################################################
+    def report(self):
+        return {'queue_depth': self.queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'dropped': self.dropped,
+                'stale': self.stale,
+                'worker_latency_ms': [round(v * 1000, 1) for v in self.worker_latency],
+                'worker_detect_ms': [round(v * 1000, 1) for v in self.worker_detect_time],
+                'worker_count': list(self.worker_count)}
+
+    ##########################################################################
+    # 終了
+    ##########################################################################
+    def close(self):
+        for process in self.workers:
+            self.task_queue.put(None)
+        for process in self.workers:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        del self.frames
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.slots = []
@@ -7,14 +7,21 @@ import time
 import datetime
 import os
 import csv
-import cv2
-import numpy as np
-import PIL.Image, PIL.ImageTk
+import argparse
+from camera_view import CameraView
+from view_model import ViewModel
+from camera_grabber import CameraGrabber
+import face_tracker
+import face_detect_pool
+from cascade_registry import CascadeRegistry
+import tuning
 
 ##############################################################################
 # 定数
 ##############################################################################
-PROC_CYCLE = 50                     # 処理周期[msec]
+FACE_TRACKING_MODE = face_tracker.MODE_TRACK    # 顔検出モード(MODE_DETECT:毎フレーム検出)
+DETECT_BACKEND = 'local'            # 顔検出処理('local':GUIスレッド, 'pool':ワーカプロセス)
+CASCADE_NAME = 'frontalface_default'    # 顔検出の学習元データ(cascade_registry.CASCADE_PARAMSの名前)
 
 # 周期処理状態
 class CycleProcState(Enum):
@@ -25,12 +32,16 @@ class CycleProcState(Enum):
 # クラス：Application
 ##############################################################################
 class Application(ttk.Frame):
-    def __init__(self, master=None):
+    def __init__(self, master=None, debug=False):
         ttk.Frame.__init__(self, master)
+        # 終了時に顔検出処理の統計を表示する
+        self.debug = debug
 
         self.pack()
         # ウィンドウをスクリーンの中央に配置
         self.setting_window(master)
+        # ウィンドウを閉じる時の終了処理
+        master.protocol('WM_DELETE_WINDOW', self.close)
 
         # 周期処理状態
         self.cycle_proc_state = CycleProcState.FACE_DETECTION
@@ -42,7 +53,7 @@ class Application(ttk.Frame):
         # カメラ
         self.camera_init()
         
-        if not self.camera.isOpened:
+        if not self.camera.isOpened():
             messagebox.showerror('カメラ認識エラー', 'カメラの接続を確認してください')
         else:
             # 周期処理
@@ -79,6 +90,8 @@ class Application(ttk.Frame):
         # カメラの映像を表示するキャンバスを用意する
         self.canvas_camera = Canvas(frame_middle, width=480, height=480)
         self.canvas_camera.pack()
+        # カメラ映像の表示
+        self.camera_view = CameraView(self.canvas_camera)
 
         # フレーム(下部)
         frame_lower = ttk.Frame(self)
@@ -105,45 +118,58 @@ class Application(ttk.Frame):
         self.label_thermistor_corr = ttk.Label(frame_lower)
         self.label_thermistor_corr.grid(row=9, sticky='NW')
 
+        # 表示する値(書式, 未計測の表示)
+        self.view = ViewModel()
+        self.view.bind('msg', self.label_msg)
+        self.view.bind('body_temp', self.label_body_tmp, '体温：{}℃', '体温：--.-- ℃')
+        for i in range(5):
+            self.view.bind('temperature_' + str(i), getattr(self, 'label_temperature_' + str(i)),
+                           'センサ温度(' + str(i + 1) + '回目)：{}℃',
+                           'センサ温度(' + str(i + 1) + '回目)：--.-- ℃')
+        self.view.bind('temperature_med', self.label_temperature_med,
+                       'センサ温度(中央値)：{}℃', 'センサ温度(中央値)：--.-- ℃')
+        self.view.bind('distance', self.label_distance, '距離：{} cm', '距離：--- cm')
+        self.view.bind('distance_corr', self.label_distance_corr, '距離補正：{} ℃', '距離補正：--.-- ℃')
+        self.view.bind('thermistor', self.label_thermistor, 'サーミスタ温度：{} ℃', 'サーミスタ温度：--.-- ℃')
+        self.view.bind('thermistor_corr', self.label_thermistor_corr,
+                       'サーミスタ温度補正：{} ℃', 'サーミスタ温度補正：--.-- ℃')
+
         self.init_param_widgets()
 
     ##########################################################################
     # 計測データ ウィジット 初期化
     ##########################################################################
-    def init_param_widgets(self):        
-        # フレーム(上部)
-        self.label_msg.config(text='顔が白枠に合うよう近づいてください')
-        self.label_body_tmp.config(text='体温：--.-- ℃')
-        # フレーム(下部)
-        self.label_temperature_0.config(text='センサ温度(1回目)：--.-- ℃')
-        self.label_temperature_1.config(text='センサ温度(2回目)：--.-- ℃')
-        self.label_temperature_2.config(text='センサ温度(3回目)：--.-- ℃')
-        self.label_temperature_3.config(text='センサ温度(4回目)：--.-- ℃')
-        self.label_temperature_4.config(text='センサ温度(5回目)：--.-- ℃')
-        self.label_temperature_med.config(text='センサ温度(中央値)：--.-- ℃')
-        self.label_distance.config(text='距離：--- cm')
-        self.label_distance_corr.config(text='距離補正：--.-- ℃')
-        self.label_thermistor.config(text='サーミスタ温度：--.-- ℃')
-        self.label_thermistor_corr.config(text='サーミスタ温度補正：--.-- ℃')
+    def init_param_widgets(self):
+        self.view.reset(msg='顔が白枠に合うよう近づいてください')
+        self.view.render()
 
     ##########################################################################
     # カメラ初期化
     ##########################################################################
     def camera_init(self):   
-        self.camera = cv2.VideoCapture(0)
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 480)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        # カメラ映像はスレッドで取得し続け、最新のフレームだけを読み出す
+        self.camera = CameraGrabber(0, width=480, height=480)
+        # 表示済みフレームの通番
+        self.frame_seq = 0
+        # 検出した顔の数
+        self.face_count = 0
 
-        # print(self.camera.get(cv2.CAP_PROP_FPS))
+        self.camera.start()
 
         # 顔検出のための学習元データを読み込む
-        self.face_cascade = cv2.CascadeClassifier('haarcascades/haarcascade_frontalface_default.xml')
-
-    ##########################################################################
-    # カメラ映像の空読み
-    ##########################################################################
-    def camera_clear_frame(self):
-        ret, frame = self.camera.read()
+        self.cascade_registry = CascadeRegistry()
+        self.face_cascade = self.cascade_registry.get(CASCADE_NAME)
+        # 周期・検出パラメータ(調整済みパラメータのファイルがあれば、その値)
+        self.tuning = tuning.load()
+        # 検出パラメータ(scale_factor, min_neighbors, min_size)
+        self.face_params = self.tuning.cascade_params(self.cascade_registry.params(CASCADE_NAME))
+        # 顔検出・追跡
+        self.face_tracker = face_tracker.FaceTracker(self.face_cascade,
+                                                     mode=FACE_TRACKING_MODE,
+                                                     detect_interval=self.tuning.detect_interval,
+                                                     **self.face_params)
+        # ワーカプロセスによる顔検出(最初のフレームでサイズが決まってから起動)
+        self.detect_pool = None
 
     ##########################################################################
     # 顔認識処理
@@ -151,33 +177,46 @@ class Application(ttk.Frame):
     def face_recognition(self):
         # カメラ映像を取得
         ret, frame = self.camera.read()
-        # 左右反転
-        frame_mirror = cv2.flip(frame, 1)
-        # OpenCV(BGR) -> Pillow(RGB)変換
-        frame_color = cv2.cvtColor(frame_mirror, cv2.COLOR_BGR2RGB)
+        if not ret:
+            return 0
+        # 新しいフレームが届いていなければ前回の結果を使う
+        if self.camera.seq == self.frame_seq:
+            return self.face_count
+        self.frame_seq = self.camera.seq
+        # 左右反転 + OpenCV(BGR) -> Pillow(RGBA)変換
+        self.camera_view.update(frame)
         # 顔検出の処理効率化のために、写真の情報量を落とす（モノクロにする）
-        frame_gray = cv2.cvtColor(frame_color, cv2.COLOR_BGR2GRAY)
-        # 顔検出を行う(detectMultiScaleの戻り値は(x座標, y座標, 横幅, 縦幅)のリスト)
-        facerect = self.face_cascade.detectMultiScale(frame_gray,
-                                                      scaleFactor=1.2,
-                                                      minNeighbors=2,
-                                                      minSize=(150, 150))
-        # 検出した場所すべてに緑色で枠を描画する
-        for rect in facerect:
-            cv2.rectangle(frame_color,
-                            tuple(rect[0:2]),
-                            tuple(rect[0:2]+rect[2:4]),
-                            (0, 0, 255),
-                            thickness=5)
-
-        # ガイド枠の描画
-        cv2.rectangle(frame_color, (60,60), (420,420), (255,255,255), thickness=5)
-        # OpenCV frame -> Pillow Photo
-        self.photo = PIL.ImageTk.PhotoImage(image = PIL.Image.fromarray(frame_color))
-        # Pillow Photo -> Canvas
-        self.canvas_camera.create_image(0, 0, image = self.photo, anchor = 'nw')
-
-        return len(facerect)
+        frame_gray = self.camera_view.gray()
+        if DETECT_BACKEND == 'pool':
+            # ワーカプロセスへフレームを送り、届いている最新の検出結果を使う
+            if self.detect_pool is None:
+                self.detect_pool = face_detect_pool.DetectPool(self.cascade_registry.path(CASCADE_NAME),
+                                                               frame_gray.shape,
+                                                               **self.face_params)
+            self.detect_pool.submit(frame_gray)
+            facerect = self.detect_pool.poll()
+        else:
+            # 顔検出・追跡を行う(戻り値は(x座標, y座標, 横幅, 縦幅)のリスト)
+            facerect = self.face_tracker.process(frame_gray)
+        # 検出した場所すべてに枠を描画する
+        self.camera_view.draw_rects(facerect, (0, 0, 255, 255))
+        # ガイド枠の描画 + キャンバスへの表示
+        self.camera_view.show()
+        self.face_count = len(facerect)
+
+        return self.face_count
+
+    ##########################################################################
+    # 終了処理
+    ##########################################################################
+    def close(self):
+        if self.detect_pool is not None:
+            if self.debug:
+                print(self.detect_pool.report())
+            self.detect_pool.close()
+            self.detect_pool = None
+        self.camera.release()
+        self.master.destroy()
 
     ##########################################################################
     # 周期処理
@@ -193,11 +232,11 @@ class Application(ttk.Frame):
 
         # 一時停止
         elif self.cycle_proc_state == CycleProcState.PAUSE:
-            # カメラ映像の空読み
-            self.camera_clear_frame()
             self.pause_timer += 1
-            if self.pause_timer > 50:
+            if self.pause_timer > self.tuning.face_pause_cycles:
                 self.pause_timer = 0
+                # 追跡状態の初期化
+                self.face_tracker.reset()
                 # 計測データ ウィジット 初期化
                 self.init_param_widgets()
                 self.cycle_proc_state = CycleProcState.FACE_DETECTION
@@ -208,9 +247,12 @@ class Application(ttk.Frame):
             self.cycle_proc_state = CycleProcState.FACE_DETECTION
 
         # 周期処理
-        self.after(PROC_CYCLE, self.cycle_proc)
+        self.after(self.tuning.proc_cycle, self.cycle_proc)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='顔検出')
+    parser.add_argument('--debug', action='store_true', help='終了時に顔検出処理の統計を表示する')
+    args = parser.parse_args()
     root = Tk()
-    app = Application(master=root)
+    app = Application(master=root, debug=args.debug)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+import time
+import argparse
+import cv2
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+DETECT_INTERVAL = 10                # 全面検出の周期[frame]
+TRACK_CONFIDENCE_MIN = 0.6          # 追跡を継続する一致度の下限
+TRACK_MARGIN = 24                   # 追跡時の探索範囲(前回位置からの余白)[px]
+PYRAMID_LEVEL = 1                   # 検出・追跡に使う縮小段数(1段で1/2)
+GUIDE_ROI = (60, 60, 420, 420)      # ガイド枠(x1, y1, x2, y2)[px]
+IDENTITY_OVERLAP_MIN = 0.3          # 同じ人とみなす前回の顔との重なり(IoU)の下限
+IDENTITY_GAP = 5                    # 顔を見失っても同じ人とみなすフレーム数
+
+# 検出モード
+MODE_DETECT = 'detect'              # 毎フレーム全面検出(従来動作)
+MODE_TRACK = 'track'                # 検出 + 追跡
+
+##############################################################################
+# クラス：FaceTracker
+#   一定フレームごと、または追跡の一致度が下がった時だけ全面検出を行い、
+#   その間はガイド枠内のテンプレートマッチングで顔を追跡する
+#   戻り値の矩形は常に入力フレーム(フル解像度)の座標
+##############################################################################
+class FaceTracker(object):
+    def __init__(self, cascade, mode=MODE_TRACK,
+                 scale_factor=1.2, min_neighbors=2, min_size=(150, 150),
+                 detect_interval=DETECT_INTERVAL,
+                 confidence_min=TRACK_CONFIDENCE_MIN,
+                 pyramid_level=PYRAMID_LEVEL):
+        self.cascade = cascade
+        self.mode = mode
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.detect_interval = detect_interval
+        self.confidence_min = confidence_min
+        self.pyramid_level = pyramid_level if mode == MODE_TRACK else 0
+        # 縮小率
+        self.scale = 1 << self.pyramid_level
+        # ピラミッド用バッファ
+        self.pyramid = []
+        # 追跡中の矩形(縮小後の座標)とテンプレート
+        self.rect = None
+        self.template = None
+        # 追跡の一致度
+        self.confidence = 0.0
+        # 前回の全面検出からのフレーム数
+        self.frames_since_detect = 0
+        # 人の識別番号(顔が続けて見えている間は同じ番号。見えていなければNone)
+        self.track_id = None
+        self.next_id = 1
+        # 識別に使う最後の顔(フル解像度の座標)と、見失ってからのフレーム数
+        self.identity_rect = None
+        self.lost_frames = 0
+        # 統計
+        self.frames = 0
+        self.detect_count = 0
+        self.track_count = 0
+        self.face_frames = 0
+        self.detect_time = 0.0
+        self.track_time = 0.0
+
+    ##########################################################################
+    # 追跡状態の初期化
+    ##########################################################################
+    def reset(self):
+        self.rect = None
+        self.template = None
+        self.confidence = 0.0
+        self.frames_since_detect = 0
+
+    ##########################################################################
+    # 人の識別の初期化(人がいなくなった時)
+    ##########################################################################
+    def reset_identity(self):
+        self.track_id = None
+        self.identity_rect = None
+        self.lost_frames = 0
+
+    ##########################################################################
+    # 顔検出・追跡
+    ##########################################################################
+    def process(self, frame_gray):
+        start = time.perf_counter()
+        image = self.downscale(frame_gray)
+
+        if (self.mode == MODE_DETECT or
+            self.rect is None or
+            self.frames_since_detect >= self.detect_interval):
+            rects = self.detect(image)
+            self.detect_time += time.perf_counter() - start
+        else:
+            rects = self.track(image)
+            if len(rects) == 0:
+                # 一致度が下がったので同じフレームで全面検出をやり直す
+                rects = self.detect(image)
+            self.track_time += time.perf_counter() - start
+
+        self.frames += 1
+        if len(rects) > 0:
+            self.face_frames += 1
+
+        # フル解像度の座標に戻す
+        rects = rects * self.scale
+        self.identify(rects)
+
+        return rects
+
+    ##########################################################################
+    # 人の識別(最も大きい顔が前回の顔と重なっていれば同じ番号)
+    ##########################################################################
+    def identify(self, rects):
+        if len(rects) == 0:
+            self.lost_frames += 1
+            if self.lost_frames > IDENTITY_GAP:
+                self.track_id = None
+                self.identity_rect = None
+            return
+        rect = tuple(int(v) for v in rects[np.argmax(rects[:, 2] * rects[:, 3])])
+        if self.identity_rect is None or overlap(rect, self.identity_rect) < IDENTITY_OVERLAP_MIN:
+            self.track_id = self.next_id
+            self.next_id += 1
+        self.identity_rect = rect
+        self.lost_frames = 0
+
+    ##########################################################################
+    # 縮小(ピラミッド)
+    ##########################################################################
+    def downscale(self, frame_gray):
+        image = frame_gray
+        for level in range(self.pyramid_level):
+            h, w = image.shape[0:2]
+            size = ((h + 1) // 2, (w + 1) // 2)
+            if len(self.pyramid) <= level or self.pyramid[level].shape != size:
+                del self.pyramid[level:]
+                self.pyramid.append(np.empty(size, dtype=np.uint8))
+            cv2.pyrDown(image, dst=self.pyramid[level])
+            image = self.pyramid[level]
+
+        return image
+
+    ##########################################################################
+    # 全面検出
+    ##########################################################################
+    def detect(self, image):
+        min_size = (self.min_size[0] // self.scale, self.min_size[1] // self.scale)
+        facerect = self.cascade.detectMultiScale(image,
+                                                 scaleFactor=self.scale_factor,
+                                                 minNeighbors=self.min_neighbors,
+                                                 minSize=min_size)
+        self.detect_count += 1
+        self.frames_since_detect = 0
+        if len(facerect) == 0:
+            self.reset()
+            return np.empty((0, 4), dtype=np.int32)
+
+        facerect = np.asarray(facerect, dtype=np.int32)
+        if self.mode == MODE_TRACK:
+            # 最も大きい顔を追跡対象にする
+            x, y, w, h = facerect[np.argmax(facerect[:, 2] * facerect[:, 3])]
+            self.rect = (int(x), int(y), int(w), int(h))
+            self.template = image[y:y + h, x:x + w].copy()
+            self.confidence = 1.0
+
+        return facerect
+
+    ##########################################################################
+    # 追跡(ガイド枠内のテンプレートマッチング)
+    ##########################################################################
+    def track(self, image):
+        self.track_count += 1
+        self.frames_since_detect += 1
+        x, y, w, h = self.rect
+        # 探索範囲：前回位置の周辺をガイド枠で制限
+        margin = TRACK_MARGIN // self.scale
+        gx1, gy1, gx2, gy2 = [v // self.scale for v in GUIDE_ROI]
+        sx1 = max(x - margin, gx1, 0)
+        sy1 = max(y - margin, gy1, 0)
+        sx2 = min(x + w + margin, gx2, image.shape[1])
+        sy2 = min(y + h + margin, gy2, image.shape[0])
+        if sx2 - sx1 < w or sy2 - sy1 < h:
+            self.reset()
+            return np.empty((0, 4), dtype=np.int32)
+
+        result = cv2.matchTemplate(image[sy1:sy2, sx1:sx2], self.template, cv2.TM_CCOEFF_NORMED)
+        _, self.confidence, _, loc = cv2.minMaxLoc(result)
+        if self.confidence < self.confidence_min:
+            self.reset()
+            return np.empty((0, 4), dtype=np.int32)
+
+        self.rect = (sx1 + loc[0], sy1 + loc[1], w, h)
+
+        return np.array([self.rect], dtype=np.int32)
+
+    ##########################################################################
+    # 統計
+    ##########################################################################
+    def report(self, elapsed):
+        frames = max(self.frames, 1)
+        return {'mode': self.mode,
+                'frames': self.frames,
+                'fps': self.frames / elapsed if elapsed > 0 else 0.0,
+                'detections_per_sec': self.face_frames / elapsed if elapsed > 0 else 0.0,
+                'cascade_runs': self.detect_count,
+                'track_runs': self.track_count,
+                'ms_per_frame': (self.detect_time + self.track_time) * 1000 / frames}
+
+##############################################################################
+# 矩形(x, y, 横幅, 縦幅)の重なり(IoU)
+##############################################################################
+def overlap(a, b):
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+
+    return inter / float(a[2] * a[3] + b[2] * b[3] - inter)
+
+##############################################################################
+# ベンチマーク：従来の毎フレーム検出と検出 + 追跡の比較
+##############################################################################
+def benchmark(source, frames, cascade_path):
+    cascade = cv2.CascadeClassifier(cascade_path)
+    results = []
+    for mode in (MODE_DETECT, MODE_TRACK):
+        capture = cv2.VideoCapture(source)
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, 480)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        tracker = FaceTracker(cascade, mode=mode)
+        start = time.perf_counter()
+        for i in range(frames):
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frame_gray = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2GRAY)
+            tracker.process(frame_gray)
+        results.append(tracker.report(time.perf_counter() - start))
+        capture.release()
+
+    for report in results:
+        print('{mode:>6}: {frames} frames, {fps:.1f} fps, '
+              '{detections_per_sec:.1f} detections/sec, '
+              'cascade {cascade_runs} / track {track_runs}, '
+              '{ms_per_frame:.2f} ms/frame'.format(**report))
+    if results[1]['ms_per_frame'] > 0:
+        print('speedup: x{:.2f}'.format(results[0]['ms_per_frame'] / results[1]['ms_per_frame']))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='顔検出(毎フレーム) と 検出 + 追跡 の比較')
+    parser.add_argument('source', nargs='?', default='0', help='カメラ番号 または 動画ファイル')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--cascade', default='haarcascades/haarcascade_frontalface_default.xml')
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+    benchmark(source, args.frames, args.cascade)
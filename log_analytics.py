@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+import os
+import io
+import csv
+import glob
+import json
+import time
+import argparse
+import numpy as np
+from calibration import LOG_PATH
+
+##############################################################################
+# 定数
+##############################################################################
+CACHE_PATH = './log_cache/'         # 列キャッシュの保存パス
+FEVER_THRESHOLD = 38.0              # 発熱と判定する体温[℃]
+
+# 列(名前, 型, ログの列番号) ※日時(列0)はts列
+COLUMNS = [('ts', np.int64, 0),             # 日時(ローカル時刻のエポック秒)
+           ('body_temp', np.float32, 1),    # 体温
+           ('sensor', np.float32, 2),       # センサ温度
+           ('distance', np.float32, 3),     # 距離
+           ('thermistor', np.float32, 4),   # サーミスタ
+           ('thermistor_corr', np.float32, 5),  # サーミスタ補正
+           ('kiosk', np.int16, None)]       # ログフォルダ(端末)の番号
+INDEX_COLUMNS = [('order', np.int64),       # ts順の行番号
+                 ('ts_sorted', np.int64)]   # ts順に並べたts
+STATE_FILE = 'state.json'
+
+##############################################################################
+# クラス：LogCache
+#   月ごとのCSVを列ごとのバイナリへ追記し、memmapで参照する
+#   各CSVの読み込み済み位置を記録し、追記された行だけを取り込む
+#   読み込み状態はCSVファイルごとに保存し、途中で止まっても同じ行を二重に取り込まない
+##############################################################################
+class LogCache(object):
+    def __init__(self, cache_path=CACHE_PATH):
+        self.cache_path = cache_path
+        if not os.path.isdir(cache_path):
+            os.makedirs(cache_path)
+        self.state = {'kiosks': [], 'files': {}, 'rows': 0, 'skipped': 0}
+        state_file = os.path.join(cache_path, STATE_FILE)
+        if os.path.isfile(state_file):
+            with open(state_file) as file:
+                self.state.update(json.load(file))
+        self.columns = {}
+        # 前回の取り込みが途中で止まった場合、保存済みの行数まで戻す
+        self.truncate()
+
+    ##########################################################################
+    # 列ファイルを読み込み状態の行数に揃える
+    ##########################################################################
+    def truncate(self):
+        for name, dtype, col in COLUMNS:
+            path = self.column_path(name)
+            size = self.state['rows'] * np.dtype(dtype).itemsize
+            actual = os.path.getsize(path) if os.path.isfile(path) else 0
+            if actual < size:
+                raise RuntimeError(path + ' is shorter than the saved state; run with --rebuild')
+            if actual > size:
+                with open(path, 'r+b') as file:
+                    file.truncate(size)
+
+    ##########################################################################
+    # 列ファイルのパス
+    ##########################################################################
+    def column_path(self, name):
+        return os.path.join(self.cache_path, name + '.bin')
+
+    ##########################################################################
+    # キャッシュの削除
+    ##########################################################################
+    def clear(self):
+        for name, dtype, col in COLUMNS:
+            if os.path.isfile(self.column_path(name)):
+                os.remove(self.column_path(name))
+        for name, dtype in INDEX_COLUMNS:
+            if os.path.isfile(self.column_path(name)):
+                os.remove(self.column_path(name))
+        self.state = {'kiosks': [], 'files': {}, 'rows': 0, 'skipped': 0}
+        self.columns = {}
+        self.save_state()
+
+    ##########################################################################
+    # 追記された行の取り込み
+    #   戻り値：(取り込んだ行数, 読めずに飛ばした行数)
+    ##########################################################################
+    def ingest(self, log_paths):
+        added = 0
+        skipped = 0
+        for log_path in log_paths:
+            log_path = os.path.abspath(log_path)
+            if log_path not in self.state['kiosks']:
+                self.state['kiosks'].append(log_path)
+            kiosk = self.state['kiosks'].index(log_path)
+            for filename in sorted(glob.glob(os.path.join(log_path, '*.csv'))):
+                info = self.state['files'].get(filename, {'offset': 0})
+                if os.path.getsize(filename) < info['offset']:
+                    # 書き換えられたファイルは追記分だけを判別できない
+                    raise RuntimeError(filename + ' was truncated; run with --rebuild')
+                rows, offset = self.read_new_rows(filename, info['offset'])
+                if offset == info['offset']:
+                    continue
+                values, bad = self.convert(rows, kiosk)
+                self.append(values)
+                added += len(values['ts'])
+                skipped += bad
+                self.state['skipped'] += bad
+                # 列ファイルへ書き終えてから読み込み位置を保存する
+                self.state['files'][filename] = {'offset': offset}
+                self.save_state()
+        if added > 0 or len(self.column('order')) != self.state['rows']:
+            self.build_index()
+        self.save_state()
+
+        return added, skipped
+
+    ##########################################################################
+    # CSVの読み込み済み位置以降の完全な行
+    ##########################################################################
+    def read_new_rows(self, filename, offset):
+        with open(filename, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+        # 書き込み途中の行は次回に回す
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return [], offset
+        text = data[:end].decode('utf-8')
+        rows = []
+        for row in csv.reader(io.StringIO(text)):
+            if len(row) < 6:
+                continue
+            if offset == 0 and not rows and not row[0][:1].isdigit():
+                # 1行目：見出し
+                continue
+            rows.append(row)
+
+        return rows, offset + end
+
+    ##########################################################################
+    # 行 -> 列ごとの値
+    #   空欄・数値でない値を含む行は飛ばす(まとめて変換できない時だけ1行ずつ調べる)
+    #   戻り値：(列名 -> 値, 飛ばした行数)
+    ##########################################################################
+    def convert(self, rows, kiosk):
+        try:
+            return self.convert_rows(rows, kiosk), 0
+        except ValueError:
+            pass
+        valid = []
+        for row in rows:
+            try:
+                self.convert_rows([row], kiosk)
+            except ValueError:
+                continue
+            valid.append(row)
+
+        return self.convert_rows(valid, kiosk), len(rows) - len(valid)
+
+    def convert_rows(self, rows, kiosk):
+        values = {}
+        table = list(zip(*rows)) if rows else [()] * 6
+        for name, dtype, col in COLUMNS:
+            if name == 'ts':
+                stamps = np.array([v.replace(' ', 'T') for v in table[col]], dtype='datetime64[s]')
+                if np.isnat(stamps).any():
+                    # 空欄の日時はNaTになるため、変換できない値として扱う
+                    raise ValueError('empty timestamp')
+                values[name] = stamps.astype(np.int64)
+            elif col is None:
+                values[name] = np.full(len(rows), kiosk, dtype=dtype)
+            else:
+                values[name] = np.array(table[col], dtype=np.float64).astype(dtype)
+
+        return values
+
+    ##########################################################################
+    # 列ファイルへ追記
+    ##########################################################################
+    def append(self, values):
+        for name, dtype, col in COLUMNS:
+            with open(self.column_path(name), 'ab') as file:
+                file.write(values[name].astype(dtype).tobytes())
+        self.state['rows'] += len(values['ts'])
+        self.columns = {}
+
+    ##########################################################################
+    # 日時の索引を作り直す
+    ##########################################################################
+    def build_index(self):
+        ts = self.column('ts')
+        order = np.argsort(ts, kind='stable')
+        order.astype(np.int64).tofile(self.column_path('order'))
+        ts[order].astype(np.int64).tofile(self.column_path('ts_sorted'))
+        self.columns = {}
+
+    ##########################################################################
+    # 読み込み状態の保存
+    ##########################################################################
+    def save_state(self):
+        state_file = os.path.join(self.cache_path, STATE_FILE)
+        with open(state_file + '.tmp', 'w') as file:
+            json.dump(self.state, file, indent=1)
+        os.replace(state_file + '.tmp', state_file)
+
+    ##########################################################################
+    # 列(memmap)
+    ##########################################################################
+    def column(self, name):
+        if name not in self.columns:
+            dtype = dict([(n, d) for n, d, c in COLUMNS] + INDEX_COLUMNS)[name]
+            path = self.column_path(name)
+            if not os.path.isfile(path) or os.path.getsize(path) == 0:
+                self.columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(path, dtype=dtype, mode='r')
+
+        return self.columns[name]
+
+    ##########################################################################
+    # 期間内の行番号(日時順)
+    ##########################################################################
+    def select(self, since=None, until=None, kiosk=None):
+        ts_sorted = self.column('ts_sorted')
+        lo = 0 if since is None else np.searchsorted(ts_sorted, to_epoch(since), side='left')
+        hi = len(ts_sorted) if until is None else np.searchsorted(ts_sorted, to_epoch(until), side='left')
+        rows = self.column('order')[lo:hi]
+        if kiosk is not None:
+            rows = rows[self.column('kiosk')[rows] == kiosk]
+
+        return rows
+
+##############################################################################
+# 'YYYY-MM-DD[ HH:MM:SS]' -> エポック秒
+##############################################################################
+def to_epoch(text):
+    return int(np.datetime64(text.replace(' ', 'T'), 's').astype(np.int64))
+
+##############################################################################
+# エポック秒 -> 文字列
+##############################################################################
+def to_text(seconds, unit):
+    return str(np.datetime64(int(seconds), 's').astype('datetime64[' + unit + ']'))
+
+##############################################################################
+# 集計：日ごと・時間帯ごと・閾値ごと・期間
+##############################################################################
+def daily(cache, rows, threshold):
+    day = cache.column('ts')[rows] // 86400
+    fever = cache.column('body_temp')[rows] >= threshold
+    days, inverse = np.unique(day, return_inverse=True)
+    count = np.bincount(inverse, minlength=len(days))
+    fevers = np.bincount(inverse, weights=fever, minlength=len(days)).astype(int)
+    print('{:<12}{:>8}{:>8}'.format('date', 'count', 'fever'))
+    for d, c, f in zip(days, count, fevers):
+        print('{:<12}{:>8}{:>8}'.format(to_text(d * 86400, 'D'), c, f))
+
+def hourly(cache, rows, threshold):
+    hour = (cache.column('ts')[rows] // 3600) % 24
+    fever = cache.column('body_temp')[rows] >= threshold
+    count = np.bincount(hour, minlength=24)
+    fevers = np.bincount(hour, weights=fever, minlength=24).astype(int)
+    print('{:<6}{:>8}{:>8}'.format('hour', 'count', 'fever'))
+    for h in range(24):
+        print('{:<6}{:>8}{:>8}'.format('{:02d}'.format(h), count[h], fevers[h]))
+
+def thresholds(cache, rows, values):
+    body_temp = np.sort(cache.column('body_temp')[rows])
+    above = len(body_temp) - np.searchsorted(body_temp, np.asarray(values, dtype=np.float32), side='left')
+    print('{:<10}{:>8}{:>10}'.format('>= [℃]', 'count', 'ratio'))
+    for value, count in zip(values, above):
+        ratio = count / len(body_temp) if len(body_temp) > 0 else 0.0
+        print('{:<10}{:>8}{:>10.4f}'.format(value, count, ratio))
+
+def summary(cache, rows, threshold):
+    body_temp = cache.column('body_temp')[rows]
+    print('count', len(rows))
+    if len(rows) > 0:
+        ts = cache.column('ts')[rows]
+        print('from ', to_text(ts.min(), 's'))
+        print('to   ', to_text(ts.max(), 's'))
+        print('mean ', round(float(body_temp.mean()), 2))
+        print('max  ', round(float(body_temp.max()), 2))
+        print('fever', int(np.count_nonzero(body_temp >= threshold)))
+
+##############################################################################
+# コマンド
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='計測ログの集計')
+    parser.add_argument('command', choices=['ingest', 'daily', 'hourly', 'thresholds', 'range'])
+    parser.add_argument('--log-path', action='append', help='ログフォルダ(端末ごとに複数指定可)')
+    parser.add_argument('--cache', default=CACHE_PATH)
+    parser.add_argument('--rebuild', action='store_true', help='キャッシュを作り直す')
+    parser.add_argument('--since', help='開始日時 YYYY-MM-DD[ HH:MM:SS]')
+    parser.add_argument('--until', help='終了日時(含まない)')
+    parser.add_argument('--kiosk', type=int, help='端末番号(ingest時の--log-pathの順)')
+    parser.add_argument('--threshold', type=float, default=FEVER_THRESHOLD)
+    parser.add_argument('--thresholds', type=float, nargs='*', default=[37.0, 37.5, 38.0, 38.5])
+    args = parser.parse_args()
+
+    cache = LogCache(args.cache)
+    # 端末番号が変わらないよう、作り直す前の端末の並びで取り込む
+    log_paths = args.log_path or list(cache.state['kiosks']) or [LOG_PATH]
+    if args.rebuild:
+        cache.clear()
+    # 集計の前に追記分を取り込む
+    start = time.perf_counter()
+    added, skipped = cache.ingest(log_paths)
+    ingest_time = time.perf_counter() - start
+    if skipped > 0:
+        print('[error] log_analytics: skipped {} unreadable rows'.format(skipped))
+    if args.command == 'ingest':
+        print('ingested {} rows ({} total) in {:.1f} ms'.format(added, cache.state['rows'], ingest_time * 1000))
+        return
+
+    start = time.perf_counter()
+    rows = cache.select(args.since, args.until, args.kiosk)
+    if args.command == 'daily':
+        daily(cache, rows, args.threshold)
+    elif args.command == 'hourly':
+        hourly(cache, rows, args.threshold)
+    elif args.command == 'thresholds':
+        thresholds(cache, rows, args.thresholds)
+    else:
+        summary(cache, rows, args.threshold)
+    print('({} new rows, query {:.1f} ms)'.format(added, (time.perf_counter() - start) * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+from log_analytics import LogCache, STATE_FILE
+
+##############################################################################
+# 定数
+##############################################################################
+HEADER = '日時,体温,センサ温度,距離,サーミスタ,サーミスタ補正\n'
+ROWS_PER_FILE = 100                 # 1回に追記する行数
+
+##############################################################################
+# ログの追記(ts：エポック秒の開始、kiosk：体温の値で端末を見分ける)
+##############################################################################
+def write_rows(path, start, count, kiosk, extra=''):
+    new = not os.path.isfile(path)
+    with open(path, 'a', encoding='utf-8') as file:
+        if new:
+            file.write(HEADER)
+        for i in range(count):
+            stamp = str(np.datetime64(start + i * 60, 's')).replace('T', ' ')
+            file.write('{},{},36.0,45.0,25.0,0.5\n'.format(stamp, 36.0 + kiosk))
+        file.write(extra)
+
+##############################################################################
+# 確認
+##############################################################################
+class Check(object):
+    def __init__(self):
+        self.failures = []
+
+    def equal(self, name, actual, expected):
+        result = 'ok' if actual == expected else 'NG'
+        print('{:<40}{:>10} (expected {}) {}'.format(name, str(actual), expected, result))
+        if actual != expected:
+            self.failures.append(name)
+
+##############################################################################
+# 列キャッシュの差分取り込み・中断からの復帰・不正な行・作り直しを確認する
+##############################################################################
+def main():
+    work = tempfile.mkdtemp(prefix='log_analytics_check_')
+    check = Check()
+    try:
+        kiosks = [os.path.join(work, 'kiosk0'), os.path.join(work, 'kiosk1')]
+        for kiosk, path in enumerate(kiosks):
+            os.makedirs(path)
+            write_rows(os.path.join(path, '2021-01.csv'), 1609459200, ROWS_PER_FILE, kiosk)
+        cache_path = os.path.join(work, 'cache')
+
+        # 最初の取り込み
+        cache = LogCache(cache_path)
+        check.equal('first ingest', cache.ingest(kiosks), (2 * ROWS_PER_FILE, 0))
+
+        # 追記分だけを取り込む(空欄・数値でない行は飛ばす)
+        write_rows(os.path.join(kiosks[1], '2021-01.csv'), 1610000000, ROWS_PER_FILE, 1,
+                   extra='2021-01-20 10:00:00,,36.0,45.0,25.0,0.5\n,36.5,36.0,45.0,25.0,0.5\n')
+        write_rows(os.path.join(kiosks[0], '2021-02.csv'), 1612137600, ROWS_PER_FILE, 0,
+                   extra='2021-02-20 10:00:00,abc,36.0,45.0,25.0,0.5\n')
+        cache = LogCache(cache_path)
+        check.equal('incremental ingest', cache.ingest(kiosks), (2 * ROWS_PER_FILE, 3))
+        check.equal('nothing new', cache.ingest(kiosks), (0, 0))
+        check.equal('rows', cache.state['rows'], 4 * ROWS_PER_FILE)
+        check.equal('kiosk 1 rows', len(cache.select(kiosk=1)), 2 * ROWS_PER_FILE)
+        check.equal('kiosk 1 body_temp', float(cache.column('body_temp')[cache.select(kiosk=1)].min()), 37.0)
+
+        # 列ファイルへ書いた後、読み込み状態を保存する前に止まった場合
+        with open(os.path.join(cache_path, 'ts.bin'), 'ab') as file:
+            file.write(np.arange(7, dtype=np.int64).tobytes())
+        cache = LogCache(cache_path)
+        check.equal('ts length after interruption', len(cache.column('ts')), 4 * ROWS_PER_FILE)
+        check.equal('ingest after interruption', cache.ingest(kiosks), (0, 0))
+
+        # 作り直し(--log-pathを指定しない：前回の端末の並びで取り込む)
+        result = subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'log_analytics.py'), 'ingest',
+                                 '--rebuild', '--cache', cache_path],
+                                cwd=work, stdout=subprocess.PIPE, universal_newlines=True)
+        print(result.stdout.strip())
+        cache = LogCache(cache_path)
+        check.equal('rebuild rows', cache.state['rows'], 4 * ROWS_PER_FILE)
+        check.equal('rebuild kiosks', cache.state['kiosks'], kiosks)
+        check.equal('rebuild kiosk 1 rows', len(cache.select(kiosk=1)), 2 * ROWS_PER_FILE)
+        check.equal('state file', os.path.isfile(os.path.join(cache_path, STATE_FILE)), True)
+    finally:
+        shutil.rmtree(work)
+
+    for failure in check.failures:
+        print('[error] log_analytics', failure)
+    if check.failures:
+        sys.exit(1)
+    print('check passed')
+
+if __name__ == '__main__':
+    main()
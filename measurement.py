@@ -0,0 +1,746 @@
+#!/usr/bin/env python
+from enum import Enum
+import time
+import datetime
+import argparse
+import threading
+import cv2
+import numpy as np
+import presence
+import face_tracker
+from cascade_registry import CascadeRegistry
+from thermal_roi import ThermalRoi
+from temp_filter import TemperatureEstimator
+import calibration
+from calibration import LOG_PATH, CALIBRATION_FILE, BODY_TEMP_STANDARD
+from csv_logger import CsvLogger
+from sensor_source import LiveSources, RecordSources, ReplaySources
+from event_server import EventServer, parse_tcp
+from scheduler import DeadlineScheduler
+from metrics import Metrics, METRICS_FILE
+from tuning import load as load_tuning, TUNING_FILE
+from startup import StartupTimeline
+
+##############################################################################
+# 定数
+##############################################################################
+PAUSE_MIN_CYCLES = 4                # 計測結果を表示しておく最短の周期数(連続計測)
+DISTANCE_STANDARD = 50.0            # 距離(基準値)[cm]
+DISTANCE_UPPER_LIMIT = 100.0        # 距離(上限値)[cm]
+DISTANCE_LOWER_LIMIT = 30.0         # 距離(下限値)[cm]
+DISTANCE_DEPART = 70.0              # 計測した人が立ち去ったとみなす距離(連続計測)[cm]
+THERMISTOR_CORR_STANDARD = 10.0     # サーミスタ温度補正(基準値)[℃]
+BODY_TEMP_HIGH = 38.0               # 発熱と判定する体温[℃]
+BODY_TEMP_LOW = 35.0                # 低体温と判定する体温[℃]
+CASCADE_NAME = 'frontalface_default'    # 顔検出の学習元データ(cascade_registry.CASCADE_PARAMSの名前)
+EVENT_SOCKET = '/tmp/rthm.sock'     # イベント配信のUnixソケット
+
+TICK_BUDGET = 40                    # 1周期で処理に使う時間の上限[msec]
+
+# 段階ごとの処理時間の予算[msec]
+STAGE_BUDGET = {'FACE_DETECTION': 30,
+                'THERMISTOR': 2,
+                'TEMPERATURE': 5,
+                'MAKE_BODY_TEMP': 2,
+                'UPDATE_CSV': 1,
+                'PAUSE': 1,
+                'IDLE': 5}
+# 連続計測(計測中・一時停止中もカメラを処理する)
+THROUGHPUT_STAGE_BUDGET = dict(STAGE_BUDGET, TEMPERATURE=30, PAUSE=30)
+
+# 案内メッセージ
+MSG_APPROACH = '顔が白枠に合うよう近づいてください'
+MSG_TOO_CLOSE = 'もう少し離れてください'
+MSG_CLOSER = 'もう少し近づいてください'
+MSG_HIGH = '体温が高いです！検温してください'
+MSG_LOW = '体温が低いです！検温してください'
+MSG_NORMAL = '体温は正常です！問題ありません'
+MSG_MEASURED = '計測済みです。次の方どうぞ'
+
+# 周期処理状態
+class CycleProcState(Enum):
+    FACE_DETECTION = 0              # 顔検出
+    THERMISTOR = 1                  # サーミスタ温度
+    TEMPERATURE = 2                 # 赤外線センサ温度
+    MAKE_BODY_TEMP = 4              # 体温演算
+    UPDATE_CSV = 5                  # CSV更新
+    PAUSE = 6                       # 一時停止
+    IDLE = 7                        # 待機(人がいない)
+
+# 予算が残っていれば、前の段階と同じ周期で続けて実行する状態
+CHAIN_STATES = (CycleProcState.FACE_DETECTION,
+                CycleProcState.THERMISTOR,
+                CycleProcState.TEMPERATURE,
+                CycleProcState.MAKE_BODY_TEMP,
+                CycleProcState.UPDATE_CSV)
+
+##############################################################################
+# クラス：MeasurementRuntime
+#   カメラ・センサから体温を求める周期処理(画面なし)
+#   結果・状態はイベント(dict)として購読者へ通知し、描画は購読者に任せる
+#   連続計測(throughput)では、計測後の一時停止を固定時間ではなく、
+#   計測した人が立ち去る(距離・顔の識別番号)まで、として次の人の計測を早める
+#
+#   イベント(共通のキー：event, time)
+#     state       : state                    状態遷移
+#     status      : state, message, distance 案内メッセージ・距離の変化
+#     reset       : message                  計測値の表示を初期化
+#     thermistor  : thermistor
+#     temperature : temperature, variance(2フレーム未満はnull), frames
+#     measurement : body_temp, sensor, distance, thermistor, thermistor_corr,
+#                   frames, variance, verdict, message, person, latency
+#     abort       : person                   計測中に人が替わった・立ち去った(記録しない)
+#     startup     : phases, ready, uptime, camera  起動の段階ごとの時間・起動完了までの時間・カメラの形式
+#     log         : queued, dropped
+##############################################################################
+class MeasurementRuntime(object):
+    def __init__(self, sources=None, log_path=LOG_PATH,
+                 calibration_file=CALIBRATION_FILE, cascade_name=CASCADE_NAME,
+                 metrics_file=METRICS_FILE, throughput=False,
+                 tuning_file=TUNING_FILE, tuning=None, timeline=None):
+        # カメラ・センサの取得元(実機 / 記録 / 再生)
+        self.sources = sources if sources is not None else LiveSources()
+        # 起動の経過
+        self.timeline = timeline if timeline is not None else StartupTimeline()
+        # 時刻(再生時は再生時刻)
+        clock = getattr(self.sources, 'clock', None)
+        self.now = clock.now if clock is not None else time.monotonic
+        # 周期・顔検出のパラメータ(指定が無ければ調整済みパラメータのファイル)
+        self.tuning = tuning if tuning is not None else load_tuning(tuning_file)
+        # 連続計測
+        self.throughput = throughput
+        self.stage_budget = THROUGHPUT_STAGE_BUDGET if throughput else STAGE_BUDGET
+        # イベントの購読者 listener(event)
+        self.listeners = []
+        # カメラ映像の購読者 listener(左右反転後のフレーム(BGR), 顔の矩形)
+        self.frame_listeners = []
+        # 温度分布の購読者 listener(温度分布(8x8), 距離)
+        self.thermal_listeners = []
+
+        # 周期処理状態
+        self.cycle_proc_state = CycleProcState.FACE_DETECTION
+        # 一時停止タイマ
+        self.pause_timer = 0
+        # 次の人を計測できるか(連続計測では計測した人が立ち去るまでFalse)
+        self.armed = True
+        # 計測中の人・最後に計測した人の識別番号
+        self.measuring_id = None
+        self.measured_id = None
+        # 人が来た時刻(1人あたりの所要時間)
+        self.person_start = None
+        # 案内メッセージ・距離(通知済みの値)
+        self.status = None
+        # 距離
+        self.distance = DISTANCE_STANDARD
+        # サーミスタ温度
+        self.thermistor_temp = 0.0
+        # サーミスタ温度補正
+        self.thermistor_corr = THERMISTOR_CORR_STANDARD
+        # 補正係数(ファイルが無ければ計測ごとに補正値を学習する)
+        self.calibration = calibration.load(calibration_file)
+        # 赤外線センサ温度(最新値)
+        self.temperature = 0.0
+        # 赤外線センサ温度(推定値)
+        self.temperature_med = 0.0
+        # 赤外線センサ温度の推定
+        self.temperature_filter = TemperatureEstimator()
+        # 計測の最初のフレーム(温度分布を表示する)
+        self.temperature_first = True
+        # 体温
+        self.body_temp = BODY_TEMP_STANDARD
+        # 顔の矩形(x, y, 横幅, 縦幅)
+        self.face_rect = None
+        # 在席判定
+        self.presence = presence.PresenceDetector()
+        # 待機/動作中のCPU使用率
+        self.cpu_meter = presence.CpuMeter()
+        # 周期の期限・段階ごとの処理時間
+        self.scheduler = DeadlineScheduler(clock=self.now)
+        # 状態・処理ごとの処理時間、エラー数、計測数
+        self.metrics = Metrics(metrics_file, clock=self.now)
+        self.stop_event = threading.Event()
+
+        # カメラ・センサ等の初期化(待ち時間の多い初期化は並行に行う)
+        self.cascade_registry = CascadeRegistry()
+        try:
+            devices = self.timeline.parallel((
+                # カメラ
+                ('camera', self.camera_open),
+                # 顔検出のための学習元データ
+                ('cascade', lambda: self.cascade_registry.get(cascade_name)),
+                # 距離センサ(VL530X)
+                ('tof', self.ranging_open),
+                # サーマルセンサ(AMG8833)
+                ('thermal', self.sources.thermal),
+                # カメラ座標 -> 温度分布の対応付け
+                ('thermal_roi', ThermalRoi),
+                # CSV出力(書き込みはスレッドで行い、月が変わればファイルを切り替える)
+                ('csv_logger', lambda: CsvLogger(log_path))), cleanup=self.close_device)
+        except Exception:
+            # 初期化済みのカメラ・センサは閉じてある
+            self.sources.close()
+            raise
+        self.camera_init(devices['camera'], devices['cascade'], cascade_name)
+        self.distance_ranging = devices['tof']
+        self.thermal_sensor = devices['thermal']
+        self.thermal_roi = devices['thermal_roi']
+        self.csv_logger = devices['csv_logger']
+        self.csv_logger.start()
+
+    ##########################################################################
+    # 初期化に失敗した時、初期化済みのカメラ・センサを閉じる
+    ##########################################################################
+    def close_device(self, name, device):
+        if name == 'camera':
+            device.release()
+        elif name == 'tof':
+            device.stop()
+        elif name in ('thermal', 'csv_logger'):
+            device.close()
+
+    ##########################################################################
+    # 購読者の登録
+    ##########################################################################
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def subscribe_frames(self, listener):
+        self.frame_listeners.append(listener)
+
+    def subscribe_thermal(self, listener):
+        self.thermal_listeners.append(listener)
+
+    ##########################################################################
+    # イベントの通知
+    ##########################################################################
+    def emit(self, event, **fields):
+        if not self.listeners:
+            return
+        fields['event'] = event
+        fields['time'] = round(time.time(), 3)
+        for listener in self.listeners:
+            listener(fields)
+
+    ##########################################################################
+    # 状態遷移
+    ##########################################################################
+    def set_state(self, state):
+        if state != self.cycle_proc_state:
+            self.cycle_proc_state = state
+            self.emit('state', state=state.name)
+
+    ##########################################################################
+    # 案内メッセージ・距離(変化した時だけ通知する)
+    ##########################################################################
+    def set_status(self, message, distance):
+        status = (self.cycle_proc_state, message, distance)
+        if status != self.status:
+            self.status = status
+            self.emit('status', state=self.cycle_proc_state.name, message=message, distance=distance)
+
+    ##########################################################################
+    # 計測値の初期化
+    ##########################################################################
+    def reset_status(self):
+        self.status = None
+        self.emit('reset', message=MSG_APPROACH)
+
+    ##########################################################################
+    # カメラ初期化
+    ##########################################################################
+    def camera_init(self, camera, cascade, cascade_name):
+        self.camera = camera
+        # 処理済みフレームの通番
+        self.frame_seq = 0
+        # 左右反転後のフレーム(BGR)・顔検出用フレーム(モノクロ)
+        self.frame_mirror = None
+        self.frame_gray = None
+
+        # 顔検出・追跡
+        self.face_tracker = face_tracker.FaceTracker(
+            cascade,
+            detect_interval=self.tuning.detect_interval,
+            **self.tuning.cascade_params(self.cascade_registry.params(cascade_name)))
+
+    ##########################################################################
+    # カメラを開く(映像はスレッドで取得し続け、最新のフレームだけを読み出す)
+    ##########################################################################
+    def camera_open(self):
+        camera = self.sources.camera()
+        # 実際に決まった形式(起動の経過と一緒に報告する)
+        self.camera_format = camera.negotiated()
+        camera.start()
+
+        return camera
+
+    ##########################################################################
+    # 距離センサを開く(計測はスレッドで行う)
+    ##########################################################################
+    def ranging_open(self):
+        ranging = self.sources.ranging(DISTANCE_LOWER_LIMIT, DISTANCE_STANDARD)
+        ranging.start()
+
+        return ranging
+
+    ##########################################################################
+    # カメラ制御
+    ##########################################################################
+    def camera_ctrl(self):
+        start = time.perf_counter()
+        ret, frame = self.camera.read()
+        self.metrics.observe('step', 'camera_read', time.perf_counter() - start)
+        # 新しいフレームが届いていなければ処理済みのまま
+        if not ret or self.camera.seq == self.frame_seq:
+            return
+        self.frame_seq = self.camera.seq
+        if self.frame_mirror is None or self.frame_mirror.shape != frame.shape:
+            self.frame_mirror = np.empty(frame.shape, dtype=np.uint8)
+            self.frame_gray = np.empty(frame.shape[0:2], dtype=np.uint8)
+        # 左右反転 + モノクロ変換(表示用の色変換は購読者が行う)
+        start = time.perf_counter()
+        cv2.flip(frame, 1, dst=self.frame_mirror)
+        cv2.cvtColor(self.frame_mirror, cv2.COLOR_BGR2GRAY, dst=self.frame_gray)
+        self.metrics.observe('step', 'frame_convert', time.perf_counter() - start)
+        # 顔検出・追跡(温度を測る領域に使う)
+        start = time.perf_counter()
+        facerect = self.face_tracker.process(self.frame_gray)
+        self.metrics.observe('step', 'face_detect', time.perf_counter() - start)
+        if len(facerect) > 0:
+            # 最も大きい顔
+            self.face_rect = tuple(facerect[np.argmax(facerect[:, 2] * facerect[:, 3])])
+        else:
+            self.face_rect = None
+        if self.frame_listeners:
+            # 表示(画面ありの場合のみ)
+            start = time.perf_counter()
+            for listener in self.frame_listeners:
+                listener(self.frame_mirror, self.face_rect)
+            self.metrics.observe('step', 'render', time.perf_counter() - start)
+
+    ##########################################################################
+    # CSV出力
+    ##########################################################################
+    def csv_ctrl(self):
+        # csvファイルへの書き込みデータ
+        now = datetime.datetime.today()
+        data = [self.body_temp,
+                self.temperature_med,
+                self.distance,
+                self.thermistor_temp,
+                self.thermistor_corr]
+        # 書き込み待ちへ追加
+        start = time.perf_counter()
+        self.csv_logger.put(now, data)
+        self.metrics.observe('step', 'csv_enqueue', time.perf_counter() - start)
+        self.emit('log', queued=self.csv_logger.queued, dropped=self.csv_logger.dropped)
+
+    ##########################################################################
+    # 在席判定(距離センサ + サーマルセンサ)
+    ##########################################################################
+    def presence_check(self):
+        # 計測スレッドの最新値(待たない)
+        self.distance = round(self.distance_ranging.distance, 1)
+        # 距離で検知できない時だけ温度分布を確認する
+        detected = self.distance <= DISTANCE_UPPER_LIMIT
+        if not detected:
+            start = time.perf_counter()
+            try:
+                detected = presence.warm_blob(self.thermal_sensor.read_frame(force=False))
+            except OSError:
+                self.metrics.inc('i2c_errors_total', sensor='thermal')
+            self.metrics.observe('step', 'presence_thermal', time.perf_counter() - start)
+
+        return self.presence.update(detected)
+
+    ##########################################################################
+    # サーマルセンサの読み出し(I2Cエラーは数えてNoneを返す)
+    ##########################################################################
+    def thermal_read(self, step, read):
+        start = time.perf_counter()
+        try:
+            return read()
+        except OSError:
+            self.metrics.inc('i2c_errors_total', sensor='thermal')
+            return None
+        finally:
+            self.metrics.observe('step', step, time.perf_counter() - start)
+
+    ##########################################################################
+    # 温度分布の読み出し(新しいフレームが届いた時のみ。届いていなければNone)
+    ##########################################################################
+    def thermal_poll(self):
+        if not self.thermal_sensor.frame_ready():
+            return None
+        pixels = self.thermal_read('i2c_thermal_frame', self.thermal_sensor.read_frame)
+        if pixels is not None and self.thermal_listeners:
+            for listener in self.thermal_listeners:
+                listener(pixels, self.distance)
+
+        return pixels
+
+    ##########################################################################
+    # 計測した人が立ち去ったか(離れた、または別の人の顔が見えている)を確認し、
+    # 立ち去っていれば次の人の計測を許可する
+    # 顔を追跡せずに計測した場合は、同じ人か分からないため離れるまで待つ
+    ##########################################################################
+    def rearm(self):
+        if self.armed:
+            return
+        track_id = self.face_tracker.track_id
+        if (self.distance > DISTANCE_DEPART or
+            (self.measured_id is not None and track_id is not None and track_id != self.measured_id)):
+            self.armed = True
+
+    ##########################################################################
+    # 計測中に人が替わった・立ち去ったか
+    ##########################################################################
+    def abandoned(self):
+        self.distance = round(self.distance_ranging.distance, 1)
+        track_id = self.face_tracker.track_id
+        if self.distance > DISTANCE_DEPART:
+            return True
+
+        return self.measuring_id is not None and track_id is not None and track_id != self.measuring_id
+
+    ##########################################################################
+    # 計測の中止(途中の計測値は記録しない)
+    ##########################################################################
+    def abort(self):
+        self.metrics.inc('measurements_aborted_total')
+        self.emit('abort', person=self.measuring_id)
+        self.measuring_id = None
+        self.person_start = None
+        self.reset_status()
+        self.set_state(CycleProcState.FACE_DETECTION)
+
+    ##########################################################################
+    # 待機状態へ移行(カメラ処理・顔検出を止める)
+    ##########################################################################
+    def enter_idle(self):
+        self.camera.pause()
+        self.face_tracker.reset()
+        self.face_tracker.reset_identity()
+        self.armed = True
+        self.person_start = None
+        self.face_rect = None
+        self.presence.reset(False)
+        self.reset_status()
+        self.set_state(CycleProcState.IDLE)
+
+    ##########################################################################
+    # 動作状態へ移行
+    ##########################################################################
+    def enter_active(self):
+        self.camera.resume()
+        self.set_state(CycleProcState.FACE_DETECTION)
+
+    ##########################################################################
+    # 開始(人が来るまで待機)
+    ##########################################################################
+    def start(self):
+        self.enter_idle()
+
+    ##########################################################################
+    # 周期処理(期限に合わせて呼ぶ)
+    #   戻り値：次の期限までの待ち時間[sec]
+    ##########################################################################
+    def tick(self):
+        self.scheduler.begin()
+        period = self.step()
+        if self.timeline.ready_time is None:
+            # 最初の周期処理の終了 = 起動完了
+            self.timeline.ready()
+            self.report_startup()
+        stats = self.scheduler.report()
+        if stats is not None:
+            print('周期処理', stats)
+        if self.metrics.due():
+            self.update_metrics()
+            self.metrics.write()
+
+        return self.scheduler.end(period / 1000)
+
+    ##########################################################################
+    # 周期処理(1周期分)
+    #   状態が変わった時、次の段階が予算内に収まれば同じ周期で続けて実行する
+    #   戻り値：周期[msec]
+    ##########################################################################
+    def step(self):
+        # 待機/動作中のCPU使用率
+        self.cpu_meter.update('idle' if self.cycle_proc_state == CycleProcState.IDLE else 'active')
+        usage = self.cpu_meter.report()
+        if usage is not None:
+            print('CPU使用率[%]', usage)
+
+        tick_start = time.monotonic()
+        while True:
+            state = self.cycle_proc_state
+            start = time.monotonic()
+            self.stage()
+            now = time.monotonic()
+            self.scheduler.stage(state.name, now - start, self.stage_budget[state.name] / 1000)
+            self.metrics.observe('state', state.name, now - start)
+            if self.cycle_proc_state == state or self.cycle_proc_state not in CHAIN_STATES:
+                break
+            if (now - tick_start) * 1000 + self.stage_budget[self.cycle_proc_state.name] > TICK_BUDGET:
+                break
+
+        if self.cycle_proc_state == CycleProcState.IDLE:
+            return self.tuning.idle_cycle
+
+        return self.tuning.proc_cycle
+
+    ##########################################################################
+    # 現在の状態の処理
+    ##########################################################################
+    def stage(self):
+        # 待機
+        if self.cycle_proc_state == CycleProcState.IDLE:
+            if self.presence_check():
+                self.enter_active()
+
+        # 顔検出
+        elif self.cycle_proc_state == CycleProcState.FACE_DETECTION:
+            # カメラ制御
+            self.camera_ctrl()
+            if self.thermal_listeners:
+                # 温度分布の表示(画面ありで表示する場合のみ)
+                self.thermal_poll()
+            # 距離計測(毎周期、計測スレッドの最新値を使う)
+            present = self.presence_check()
+            self.rearm()
+            if not present:
+                self.enter_idle()
+            elif self.distance > DISTANCE_UPPER_LIMIT:
+                self.set_status(MSG_APPROACH, None)
+            elif not self.armed:
+                # 計測した人がまだいる
+                self.set_status(MSG_MEASURED, self.distance)
+            else:
+                if self.person_start is None:
+                    self.person_start = self.now()
+                if self.distance < DISTANCE_LOWER_LIMIT:
+                    self.set_status(MSG_TOO_CLOSE, self.distance)
+                elif self.distance > DISTANCE_STANDARD:
+                    self.set_status(MSG_CLOSER, self.distance)
+                else:
+                    self.set_status('', self.distance)
+                    self.measuring_id = self.face_tracker.track_id
+                    self.set_state(CycleProcState.THERMISTOR)
+
+        # サーミスタ温度
+        elif self.cycle_proc_state == CycleProcState.THERMISTOR:
+            thermistor = self.thermal_read('i2c_thermistor', self.thermal_sensor.read_thermistor)
+            if thermistor is None:
+                # 次の周期で読み直す
+                return
+            self.thermistor_temp = round(thermistor, 2)
+            self.emit('thermistor', thermistor=self.thermistor_temp)
+            # 赤外線センサ温度の推定を開始
+            self.temperature_filter.reset()
+            self.temperature_first = True
+            self.set_state(CycleProcState.TEMPERATURE)
+
+        # 赤外線センサ温度(新しいフレームが届くたびに推定値を更新)
+        elif self.cycle_proc_state == CycleProcState.TEMPERATURE:
+            if self.throughput:
+                # 計測中も顔を追い、人が替わった・立ち去った場合は記録しない
+                self.camera_ctrl()
+                if self.abandoned():
+                    self.abort()
+                    return
+            pixels = self.thermal_poll()
+            if pixels is not None:
+                if self.temperature_first:
+                    self.temperature_first = False
+                    print('センサ温度')
+                    print(*pixels, sep='\n')
+                temperature = None
+                start = time.perf_counter()
+                if self.face_rect is not None:
+                    # 顔の領域だけの温度
+                    temperature = self.thermal_roi.temperature(pixels, self.face_rect, self.distance)
+                if temperature is None:
+                    # 顔が見つからない場合は全体の最大値
+                    temperature = np.amax(pixels)
+                self.metrics.observe('step', 'roi_temperature', time.perf_counter() - start)
+                self.temperature = round(float(temperature), 2)
+                estimate, variance = self.temperature_filter.update(self.temperature)
+                self.emit('temperature', temperature=self.temperature,
+                          variance=finite_round(variance, 4), frames=self.temperature_filter.frames)
+                # 分散が十分小さくなった時点で計測完了
+                if self.temperature_filter.converged():
+                    self.set_state(CycleProcState.MAKE_BODY_TEMP)
+
+        # 体温演算
+        elif self.cycle_proc_state == CycleProcState.MAKE_BODY_TEMP:
+            # 赤外線センサ温度(推定値)
+            self.temperature_med = round(self.temperature_filter.estimate, 2)
+            print('計測フレーム数', self.temperature_filter.frames,
+                  '分散', round(self.temperature_filter.variance, 4))
+            # サーミスタ温度補正
+            if self.calibration is not None:
+                # 補正係数ファイルのモデル(サーミスタ温度・距離)
+                self.thermistor_corr = round(self.calibration.correction(self.thermistor_temp, self.distance), 2)
+            else:
+                diff = BODY_TEMP_STANDARD - self.temperature_med
+                corr = diff - self.thermistor_corr
+                print(corr)
+                self.thermistor_corr = round((self.thermistor_corr + (corr / 10)), 2)
+            # 体温
+            self.body_temp = round((self.temperature_med + self.thermistor_corr), 1)
+            if self.body_temp > BODY_TEMP_HIGH:
+                verdict, message = 'high', MSG_HIGH
+            elif self.body_temp < BODY_TEMP_LOW:
+                verdict, message = 'low', MSG_LOW
+            else:
+                verdict, message = 'normal', MSG_NORMAL
+            # 人が来てから計測完了までの時間
+            latency = None
+            if self.person_start is not None:
+                latency = round(self.now() - self.person_start, 3)
+                self.person_start = None
+            self.emit('measurement', body_temp=self.body_temp, sensor=self.temperature_med,
+                      distance=self.distance, thermistor=self.thermistor_temp,
+                      thermistor_corr=self.thermistor_corr,
+                      frames=self.temperature_filter.frames,
+                      variance=finite_round(self.temperature_filter.variance, 4),
+                      verdict=verdict, message=message,
+                      person=self.measuring_id, latency=latency)
+            self.metrics.measurement(verdict, latency)
+            # 同じ人を続けて計測しない
+            self.measured_id = self.measuring_id
+            if self.throughput:
+                self.armed = False
+
+            self.set_state(CycleProcState.UPDATE_CSV)
+
+        # CSV更新
+        elif self.cycle_proc_state == CycleProcState.UPDATE_CSV:
+            self.csv_ctrl()
+            self.set_state(CycleProcState.PAUSE)
+
+        # 一時停止
+        elif self.cycle_proc_state == CycleProcState.PAUSE:
+            self.pause_timer += 1
+            done = False
+            if self.throughput:
+                # 計測した人が立ち去れば、最短の表示時間で次の人の計測へ
+                self.camera_ctrl()
+                present = self.presence_check()
+                self.rearm()
+                done = not present or (self.armed and self.pause_timer >= PAUSE_MIN_CYCLES)
+            if done or self.pause_timer > self.tuning.pause_cycles:
+                self.pause_timer = 0
+                # 計測データの初期化
+                self.reset_status()
+                self.set_state(CycleProcState.FACE_DETECTION)
+
+        # 設計上ありえないがロバスト性に配慮
+        else:
+            print('[error] cycle_proc')
+            self.set_state(CycleProcState.FACE_DETECTION)
+
+    ##########################################################################
+    # 起動の経過(表示・メトリクス・イベント)
+    ##########################################################################
+    def report_startup(self):
+        fourcc, buffer = self.camera_format
+        print(*self.timeline.report(), sep='\n')
+        print('  camera {} buffer {}'.format(fourcc, buffer))
+        fields = self.timeline.fields()
+        for name, seconds in fields['phases'].items():
+            self.metrics.set('startup_phase_seconds', seconds, phase=name)
+        if fields['ready'] is not None:
+            self.metrics.set('startup_ready_seconds', fields['ready'])
+        self.metrics.set('camera_info', 1, fourcc=fourcc, buffer=str(buffer))
+        self.emit('startup', camera={'fourcc': fourcc, 'buffer': buffer}, **fields)
+
+    ##########################################################################
+    # 他のスレッド・モジュールの集計値をメトリクスへ反映
+    ##########################################################################
+    def update_metrics(self):
+        self.metrics.count('i2c_errors_total', self.distance_ranging.errors, sensor='tof')
+        self.metrics.count('csv_rows_written_total', self.csv_logger.written)
+        self.metrics.count('csv_rows_dropped_total', self.csv_logger.dropped)
+        self.metrics.count('csv_errors_total', self.csv_logger.errors)
+        self.metrics.count('csv_flush_seconds_total', round(self.csv_logger.flush_seconds, 6))
+        self.metrics.set('csv_queued', self.csv_logger.queued)
+        self.metrics.count('schedule_overruns_total', self.scheduler.overruns)
+        self.metrics.count('schedule_skipped_total', self.scheduler.skipped)
+
+    ##########################################################################
+    # 周期処理(画面なし、stop()まで戻らない)
+    ##########################################################################
+    def run(self):
+        self.start()
+        while not self.stop_event.is_set():
+            self.stop_event.wait(self.tick())
+
+    ##########################################################################
+    # 周期処理の停止
+    ##########################################################################
+    def stop(self):
+        self.stop_event.set()
+
+    ##########################################################################
+    # 終了処理
+    ##########################################################################
+    def close(self):
+        self.camera.release()
+        self.distance_ranging.stop()
+        self.thermal_sensor.close()
+        self.sources.close()
+        # 書き込み待ちの計測結果を書き込んでから終了
+        self.csv_logger.close()
+
+##############################################################################
+# イベント用の数値(無限大・非数はJSONに書けないためNone)
+##############################################################################
+def finite_round(value, digits):
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+
+    return round(value, digits)
+
+##############################################################################
+# 画面なしで計測し、イベントをソケットへ配信する
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='非接触体温計(画面なし)')
+    parser.add_argument('--unix', default=EVENT_SOCKET, help='イベント配信のUnixソケット(空文字で無効)')
+    parser.add_argument('--tcp', metavar='HOST:PORT', help='イベント配信のTCPアドレス')
+    parser.add_argument('--record', metavar='SESSION', help='カメラ・センサのデータを記録する')
+    parser.add_argument('--replay', metavar='SESSION', help='記録したデータを実時間で再生する')
+    parser.add_argument('--metrics-file', default=METRICS_FILE, help='Prometheus テキスト形式の出力先(空文字で無効)')
+    parser.add_argument('--throughput', action='store_true', help='計測した人が立ち去ればすぐ次の人を計測する')
+    parser.add_argument('--tuning-file', default=TUNING_FILE, help='調整済みパラメータのファイル(autotune.pyで生成)')
+    args = parser.parse_args()
+    if args.replay:
+        sources = ReplaySources(args.replay)
+    elif args.record:
+        sources = RecordSources(args.record)
+    else:
+        sources = LiveSources()
+
+    runtime = MeasurementRuntime(sources, metrics_file=args.metrics_file, throughput=args.throughput,
+                                 tuning_file=args.tuning_file)
+    if not runtime.camera.isOpened():
+        runtime.close()
+        raise SystemExit('camera not opened')
+    server = EventServer(args.unix or None, parse_tcp(args.tcp) if args.tcp else None)
+    server.start()
+    runtime.subscribe(server.publish)
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runtime.close()
+        runtime.update_metrics()
+        runtime.metrics.write()
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+import os
+import time
+import bisect
+import collections
+
+##############################################################################
+# 定数
+##############################################################################
+METRICS_FILE = './metrics/rthm.prom'    # Prometheus テキスト形式の出力先(node exporterのtextfile)
+METRICS_INTERVAL = 15.0             # 出力周期[sec]
+METRICS_PREFIX = 'rthm_'            # メトリクス名の接頭辞
+# 処理時間のヒストグラムの境界[sec]
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# 1人あたりの所要時間のヒストグラムの境界[sec]
+LATENCY_BUCKETS = (0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+HOUR = 3600.0
+
+##############################################################################
+# クラス：Histogram
+#   固定境界のヒストグラム(記録は二分探索 + 加算のみ)
+##############################################################################
+class Histogram(object):
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        # 境界ごとの件数(最後は上限超え)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    ##########################################################################
+    # 分位点(該当する区間の上限で近似)
+    ##########################################################################
+    def quantile(self, q):
+        target = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+
+        return float('inf')
+
+##############################################################################
+# クラス：Metrics
+#   処理時間のヒストグラム・カウンタ・ゲージを集計し、
+#   一定周期でPrometheusのテキスト形式ファイルへ書き出す
+#   clock：計測の時計(再生時は再生時刻)
+##############################################################################
+class Metrics(object):
+    def __init__(self, path=METRICS_FILE, interval=METRICS_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        # (名前, ラベル名, ラベル値) -> Histogram
+        self.histograms = {}
+        # (名前, ((ラベル名, ラベル値), ...)) -> 値
+        self.counters = {}
+        self.gauges = {}
+        # 計測完了時刻(直近1時間)
+        self.measurements = collections.deque()
+        self.last_write = clock()
+        self.writes = 0
+
+    ##########################################################################
+    # 処理時間の記録
+    #   kind：'state' または 'step'、name：状態名・処理名、seconds：処理時間
+    ##########################################################################
+    def observe(self, kind, name, seconds):
+        key = (kind + '_duration_seconds', kind, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    ##########################################################################
+    # カウンタの加算・ゲージの設定
+    ##########################################################################
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    # 他で集計済みのカウンタ値
+    def count(self, name, value, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] = value
+
+    ##########################################################################
+    # 計測完了
+    #   latency：人が来てから計測完了までの時間[sec](不明ならNone)
+    ##########################################################################
+    def measurement(self, verdict, latency=None):
+        self.inc('measurements_total', verdict=verdict)
+        self.measurements.append(self.clock())
+        self.prune()
+        if latency is not None:
+            key = ('person_latency_seconds', None, None)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(latency)
+
+    ##########################################################################
+    # 直近1時間の計測数
+    ##########################################################################
+    def measurements_per_hour(self):
+        self.prune()
+
+        return len(self.measurements)
+
+    # 1時間より前の計測完了時刻を捨てる(出力しない場合も増え続けないよう、記録のたびに行う)
+    def prune(self):
+        limit = self.clock() - HOUR
+        while self.measurements and self.measurements[0] < limit:
+            self.measurements.popleft()
+
+    ##########################################################################
+    # Prometheus テキスト形式
+    ##########################################################################
+    def render(self):
+        lines = []
+        self.set('measurements_last_hour', self.measurements_per_hour())
+        for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+            names = sorted(set(name for name, labels in values))
+            for name in names:
+                lines.append('# TYPE {}{} {}'.format(METRICS_PREFIX, name, kind))
+                for (key_name, labels), value in sorted(values.items()):
+                    if key_name == name:
+                        lines.append('{}{}{} {}'.format(METRICS_PREFIX, name, format_labels(labels), value))
+        names = sorted(set(key[0] for key in self.histograms))
+        for name in names:
+            lines.append('# TYPE {}{} histogram'.format(METRICS_PREFIX, name))
+            for (key_name, label, value), histogram in sorted(self.histograms.items(), key=histogram_key):
+                if key_name != name:
+                    continue
+                labels = ((label, value),) if label else ()
+                total = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    total += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('{}{}_bucket{} {}'.format(
+                        METRICS_PREFIX, name, format_labels(labels + (('le', le),)), total))
+                lines.append('{}{}_sum{} {}'.format(METRICS_PREFIX, name, format_labels(labels), histogram.sum))
+                lines.append('{}{}_count{} {}'.format(METRICS_PREFIX, name, format_labels(labels), histogram.count))
+
+        return '\n'.join(lines) + '\n'
+
+    ##########################################################################
+    # 書き出し周期になったか
+    ##########################################################################
+    def due(self):
+        now = self.clock()
+        if now - self.last_write < self.interval:
+            return False
+        self.last_write = now
+
+        return True
+
+    ##########################################################################
+    # ファイルへ書き出す(書き出し途中のファイルを読まれないよう置き換える)
+    ##########################################################################
+    def write(self):
+        if not self.path:
+            return
+        try:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(self.path + '.tmp', 'w') as file:
+                file.write(self.render())
+            os.replace(self.path + '.tmp', self.path)
+            self.writes += 1
+        except OSError as e:
+            print('[error] metrics', e)
+
+    ##########################################################################
+    # 画面表示用の要約(1行1項目：名前 平均/95%点[ms] 件数)
+    ##########################################################################
+    def overlay(self):
+        lines = []
+        for (name, label, value), histogram in sorted(self.histograms.items(), key=histogram_key):
+            if histogram.count == 0 or label is None:
+                continue
+            lines.append('{:<18}{:7.2f}/{:<7.2f}{:>7}'.format(
+                value, histogram.sum * 1000 / histogram.count,
+                histogram.quantile(0.95) * 1000, histogram.count))
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append('{}{} {}'.format(name, format_labels(labels), value))
+        lines.append('measurements/h {}'.format(self.measurements_per_hour()))
+        latency = self.histograms.get(('person_latency_seconds', None, None))
+        if latency is not None and latency.count:
+            lines.append('latency[s] p50 {} p95 {}'.format(latency.quantile(0.5), latency.quantile(0.95)))
+
+        return lines
+
+##############################################################################
+# ヒストグラムの並び順(ラベル無しはNoneのため空文字として並べる)
+##############################################################################
+def histogram_key(item):
+    name, label, value = item[0]
+
+    return (name, label or '', value or '')
+
+##############################################################################
+# ラベルの書式 {name="value",...}
+##############################################################################
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(name, value) for name, value in labels) + '}'
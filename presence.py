@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import time
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+PRESENCE_ON_COUNT = 2               # 在席と判定する連続検知回数
+PRESENCE_OFF_COUNT = 40             # 不在と判定する連続非検知回数(毎周期判定)
+WARM_BLOB_DELTA = 2.0               # 周囲温度(中央値)との差[℃]
+WARM_BLOB_PIXELS = 3                # 温かい画素数の下限
+CPU_REPORT_INTERVAL = 60.0          # CPU使用率の出力周期[sec]
+
+##############################################################################
+# 8x8温度分布に周囲より温かい領域があるか
+##############################################################################
+def warm_blob(pixels, delta=WARM_BLOB_DELTA, min_pixels=WARM_BLOB_PIXELS):
+    pixels = np.asarray(pixels)
+    ambient = np.median(pixels)
+
+    return np.count_nonzero(pixels > ambient + delta) >= min_pixels
+
+##############################################################################
+# クラス：PresenceDetector
+#   検知結果にヒステリシスをかけて在席/不在を判定する
+##############################################################################
+class PresenceDetector(object):
+    def __init__(self, on_count=PRESENCE_ON_COUNT, off_count=PRESENCE_OFF_COUNT):
+        self.on_count = on_count
+        self.off_count = off_count
+        # 在席状態
+        self.present = False
+        # 現在の状態と異なる検知結果の連続回数
+        self.count = 0
+
+    ##########################################################################
+    # 判定
+    ##########################################################################
+    def update(self, detected):
+        detected = bool(detected)
+        if detected == self.present:
+            self.count = 0
+        else:
+            self.count += 1
+            if self.count >= (self.on_count if detected else self.off_count):
+                self.present = detected
+                self.count = 0
+
+        return self.present
+
+    ##########################################################################
+    # 状態の設定
+    ##########################################################################
+    def reset(self, present=False):
+        self.present = present
+        self.count = 0
+
+##############################################################################
+# クラス：CpuMeter
+#   動作モード(待機/動作)ごとのCPU使用率を集計する
+##############################################################################
+class CpuMeter(object):
+    def __init__(self, report_interval=CPU_REPORT_INTERVAL):
+        self.report_interval = report_interval
+        # モードごとの CPU時間, 経過時間[sec]
+        self.cpu_time = {}
+        self.wall_time = {}
+        self.last_cpu = time.process_time()
+        self.last_wall = time.monotonic()
+        self.last_report = self.last_wall
+
+    ##########################################################################
+    # 前回からの時間を指定モードに加算
+    ##########################################################################
+    def update(self, mode):
+        cpu = time.process_time()
+        wall = time.monotonic()
+        self.cpu_time[mode] = self.cpu_time.get(mode, 0.0) + cpu - self.last_cpu
+        self.wall_time[mode] = self.wall_time.get(mode, 0.0) + wall - self.last_wall
+        self.last_cpu = cpu
+        self.last_wall = wall
+
+    ##########################################################################
+    # モードごとのCPU使用率[%]
+    ##########################################################################
+    def usage(self):
+        return {mode: round(self.cpu_time[mode] * 100 / self.wall_time[mode], 1)
+                for mode in self.cpu_time if self.wall_time[mode] > 0}
+
+    ##########################################################################
+    # 一定周期でCPU使用率を返す(周期外はNone)
+    ##########################################################################
+    def report(self):
+        if self.last_wall - self.last_report < self.report_interval:
+            return None
+        self.last_report = self.last_wall
+
+        return self.usage()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import time
+import argparse
+import tempfile
+import numpy as np
+from measurement import MeasurementRuntime
+from sensor_source import ReplaySources
+
+##############################################################################
+# クラス：PersonTimer
+#   計測した人数と、人が来てから計測結果までの再生時間(measurementイベントのlatency)
+#   人と人の間の待機時間・中止した計測は含めない
+##############################################################################
+class PersonTimer(object):
+    def __init__(self):
+        self.persons = 0
+        self.times = []
+
+    def __call__(self, event):
+        if event['event'] != 'measurement':
+            return
+        self.persons += 1
+        if event['latency'] is not None:
+            self.times.append(event['latency'])
+
+##############################################################################
+# ベンチマーク
+#   周期処理をタイマではなく再生時刻で回し、画面なしで処理時間を測る
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='記録したセッションを最速で再生し、周期処理を計測する')
+    parser.add_argument('session')
+    parser.add_argument('--throughput', action='store_true', help='連続計測(計測した人が立ち去ればすぐ次の人)')
+    args = parser.parse_args()
+
+    sources = ReplaySources(args.session, realtime=False)
+    # 計測ログは一時フォルダへ書き込む
+    runtime = MeasurementRuntime(sources, log_path=tempfile.mkdtemp(prefix='replay_bench_'), metrics_file='',
+                                 throughput=args.throughput)
+    person_timer = PersonTimer()
+    runtime.subscribe(person_timer)
+    cycle_times = []
+    runtime.start()
+    start = time.perf_counter()
+    while not sources.finished:
+        cycle_start = time.perf_counter()
+        delay = runtime.step()
+        cycle_times.append(time.perf_counter() - cycle_start)
+        sources.clock.advance(delay / 1000)
+    elapsed = time.perf_counter() - start
+    runtime.close()
+
+    cycle_times = np.array(cycle_times) * 1000
+    print('session {:.1f} s replayed in {:.2f} s (x{:.1f})'.format(
+        sources.session.duration, elapsed, sources.session.duration / max(elapsed, 1e-9)))
+    if len(cycle_times) > 0:
+        print('cycles {}  {:.1f} cycles/s  mean {:.2f} ms  p95 {:.2f} ms  max {:.2f} ms'.format(
+            len(cycle_times), len(cycle_times) / elapsed, cycle_times.mean(),
+            np.percentile(cycle_times, 95), cycle_times.max()))
+    if person_timer.times:
+        person_times = np.array(person_timer.times)
+        print('persons {}  {:.0f} persons/h  latency mean {:.2f} s  p50 {:.2f} s  p95 {:.2f} s  max {:.2f} s'.format(
+            person_timer.persons, person_timer.persons * 3600 / max(sources.session.duration, 1e-9),
+            person_times.mean(), np.percentile(person_times, 50),
+            np.percentile(person_times, 95), person_times.max()))
+    for name, stage in runtime.scheduler.stats()['stages'].items():
+        print('  {:<16}{}'.format(name, stage))
+    # 処理ごとの 平均/95%点[ms] 件数
+    print(*runtime.metrics.overlay(), sep='\n')
+
+if __name__ == '__main__':
+    main()
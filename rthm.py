@@ -2,90 +2,154 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from enum import Enum
 import time
-import datetime
-import os
-import csv
-import cv2
-import numpy as np
-import PIL.Image, PIL.ImageTk
-import busio
-import board
-import adafruit_amg88xx
-import VL53L0X 
+import argparse
+import threading
+from startup import StartupTimeline
+from view_model import ViewModel
+from event_server import EventServer, parse_tcp
+# cv2・PIL・センサを使うモジュールは、画面を表示してからスレッドで読み込む
 
 ##############################################################################
 # 定数
 ##############################################################################
-PROC_CYCLE = 50                     # 処理周期[msec]
-DISTANCE_STANDARD = 50.0            # 距離(基準値)[cm]
-DISTANCE_UPPER_LIMIT = 100.0        # 距離(上限値)[cm]
-DISTANCE_LOWER_LIMIT = 30.0         # 距離(下限値)[cm]
-THERMISTOR_CORR_STANDARD = 10.0     # サーミスタ温度補正(基準値)[℃]
-BODY_TEMP_STANDARD = 36.2           # 体温(基準値)[℃]
-TARGET_DIFF = 0.5                   # 学習目標との差分[℃]
-LOG_PATH = './log_file/'            # ログファイル保存パス
-
-# 周期処理状態
-class CycleProcState(Enum):
-    FACE_DETECTION = 0              # 顔検出
-    THERMISTOR = 1                  # サーミスタ温度
-    TEMPERATURE = 2                 # 赤外線センサ温度
-    DUMMY = 3                       # ダミー
-    MAKE_BODY_TEMP = 4              # 体温演算
-    UPDATE_CSV = 5                  # CSV更新
-    PAUSE = 6                       # 一時停止
+FACE_RECT_COLOR = (0, 0, 255, 255)  # 顔の矩形の色(RGBA)
+OVERLAY_INTERVAL = 1.0              # デバッグ表示の更新周期[sec]
+OVERLAY_COLOR = '#00ff00'           # デバッグ表示の文字色
+STARTUP_POLL = 50                   # 起動処理の完了を確認する周期[msec]
+MSG_STARTING = '起動中です。しばらくお待ちください'
 
 ##############################################################################
 # クラス：Application
+#   計測(MeasurementRuntime)の購読者の1つとして、イベントとカメラ映像を表示する
+#   起動時は画面を先に表示し、重いimport・カメラ/センサの初期化はスレッドで行う
 ##############################################################################
 class Application(ttk.Frame):
-    def __init__(self, master=None):
+    def __init__(self, master=None, sources=None, server=None, debug=False, metrics_file=None,
+                 thermal_overlay=False, throughput=False, log_path=None,
+                 open_sources=None, timeline=None):
         ttk.Frame.__init__(self, master)
+        # 起動の経過
+        self.timeline = timeline if timeline is not None else StartupTimeline()
 
-        self.pack()
-        # ウィンドウをスクリーンの中央に配置
-        self.setting_window(master)
+        with self.timeline.phase('window'):
+            self.pack()
+            # ウィンドウをスクリーンの中央に配置
+            self.setting_window(master)
+            # ウィンドウを閉じる時の終了処理
+            master.protocol('WM_DELETE_WINDOW', self.close)
+            # ウィジットを生成
+            self.create_widgets()
+            # 起動中の表示
+            self.view.set('msg', MSG_STARTING)
+            self.view.render()
+            master.update()
+
+        # 計測(起動処理の完了後に生成。周期処理はTkのタイマで回す)
+        self.runtime = None
+        self.camera_view = None
+        options = {'throughput': throughput, 'timeline': self.timeline}
+        if metrics_file is not None:
+            options['metrics_file'] = metrics_file
+        if log_path is not None:
+            options['log_path'] = log_path
+        # 温度分布の重ね合わせ表示
+        self.thermal_overlay = None
+        self.thermal_overlay_enabled = thermal_overlay
+        # 他の購読者へのイベント配信
+        self.server = server
+        # 処理時間のデバッグ表示(カメラ映像に重ねる)
+        self.overlay_item = None
+        self.overlay_time = 0.0
+        # 次の周期処理の予約
+        self.after_id = None
+        # 周期処理を開始したか
+        self.started = False
+        if debug:
+            self.overlay_item = self.canvas_camera.create_text(8, 8, anchor='nw', fill=OVERLAY_COLOR,
+                                                               font=('TkFixedFont', 8))
+
+        # 起動処理(import・カメラ/センサの初期化)
+        self.startup_args = (sources, open_sources, options)
+        self.start_bring_up()
+
+    ##########################################################################
+    # 起動処理の開始(失敗して再試行する時も)
+    ##########################################################################
+    def start_bring_up(self):
+        self.startup_error = None
+        self.startup_thread = threading.Thread(target=self.bring_up, args=self.startup_args,
+                                               name='startup', daemon=True)
+        self.startup_thread.start()
+        self.after(STARTUP_POLL, self.startup_poll)
+
+    ##########################################################################
+    # 起動処理(スレッド、Tkは操作しない)
+    ##########################################################################
+    def bring_up(self, sources, open_sources, options):
+        try:
+            with self.timeline.phase('import'):
+                from measurement import MeasurementRuntime
+                import camera_view
+            if sources is None and open_sources is not None:
+                with self.timeline.phase('sources'):
+                    sources = open_sources()
+            self.runtime = MeasurementRuntime(sources, **options)
+        except Exception as e:
+            self.startup_error = e
 
-        # 周期処理状態
-        self.cycle_proc_state = CycleProcState.FACE_DETECTION
-        # 距離計測タイマ
-        self.distance_timer = 0
-        # 一時停止タイマ
-        self.pause_timer = 0
-        # 距離
-        self.distance = DISTANCE_STANDARD
-        # サーミスタ温度
-        self.thermistor_temp = 0.0
-        # サーミスタ温度補正
-        self.thermistor_corr = THERMISTOR_CORR_STANDARD
-        # 赤外線センサ温度(インデックス)
-        self.temperature_index = 0
-        # 赤外線センサ温度
-        self.temperature = [0.0, 0.0, 0.0]
-        # 赤外線センサ温度(中央値)
-        self.temperature_med = 0.0
-        # 体温
-        self.body_temp = BODY_TEMP_STANDARD
+    ##########################################################################
+    # 起動処理の完了を待ち、計測の購読者として登録して周期処理を始める
+    ##########################################################################
+    def startup_poll(self):
+        if self.startup_thread.is_alive():
+            self.after(STARTUP_POLL, self.startup_poll)
+            return
+        if self.startup_error is not None:
+            self.startup_failed()
+            return
+
+        with self.timeline.phase('attach'):
+            from camera_view import CameraView
+            # カメラ映像の表示
+            self.camera_view = CameraView(self.canvas_camera)
+            self.runtime.subscribe(self.on_event)
+            self.runtime.subscribe_frames(self.on_frame)
+            if self.thermal_overlay_enabled:
+                # 顔の温度と同じ対応付けを使う
+                from thermal_overlay import ThermalOverlay
+                self.thermal_overlay = ThermalOverlay(self.runtime.thermal_roi)
+                self.runtime.subscribe_thermal(self.on_thermal)
+            if self.server is not None:
+                self.runtime.subscribe(self.server.publish)
+                self.server.start()
 
-        # ウィジットを生成
-        self.create_widgets()
-        # カメラ
-        self.camera_init()
-        # 距離センサ(VL530X)
-        self.distance_sensor_init()
-        # サーマルセンサ(AMG8833)
-        self.thermal_sensor_init()
-        # CSV出力の初期設定
-        self.csv_init()
-        
-        if not self.camera.isOpened:
+        if not self.runtime.camera.isOpened():
             messagebox.showerror('カメラ認識エラー', 'カメラの接続を確認してください')
         else:
+            # 人が来るまで待機
+            self.runtime.start()
             # 周期処理
+            self.started = True
             self.cycle_proc()
 
+    ##########################################################################
+    # 起動に失敗した時(初期化済みのカメラ・センサは閉じてある)
+    #   取得元を開き直せる場合は再試行できる。再試行しなければ終了する
+    ##########################################################################
+    def startup_failed(self):
+        message = str(self.startup_error)
+        sources, open_sources, options = self.startup_args
+        if open_sources is not None:
+            if messagebox.askretrycancel('起動エラー', message + '\n\nカメラ・センサの接続を確認してください'):
+                self.view.set('msg', MSG_STARTING)
+                self.view.render()
+                self.start_bring_up()
+                return
+        else:
+            messagebox.showerror('起動エラー', message)
+        self.close()
+
     ##########################################################################
     # ウィンドウをスクリーンの中央に配置
     ##########################################################################
@@ -128,231 +192,148 @@ class Application(ttk.Frame):
         self.label_thermistor.grid(row=1, sticky='NW')
         self.label_thermistor_corr = ttk.Label(frame_lower)
         self.label_thermistor_corr.grid(row=2, sticky='NW')
-        self.label_temperature_0 = ttk.Label(frame_lower)
-        self.label_temperature_0.grid(row=3, sticky='NW')
-        self.label_temperature_1 = ttk.Label(frame_lower)
-        self.label_temperature_1.grid(row=4, sticky='NW')
-        self.label_temperature_2 = ttk.Label(frame_lower)
-        self.label_temperature_2.grid(row=5, sticky='NW')
+        self.label_temperature = ttk.Label(frame_lower)
+        self.label_temperature.grid(row=3, sticky='NW')
+        self.label_temperature_var = ttk.Label(frame_lower)
+        self.label_temperature_var.grid(row=4, sticky='NW')
+        self.label_temperature_frames = ttk.Label(frame_lower)
+        self.label_temperature_frames.grid(row=5, sticky='NW')
         self.label_temperature_med = ttk.Label(frame_lower)
         self.label_temperature_med.grid(row=6, sticky='NW')
+        self.label_log = ttk.Label(frame_lower)
+        self.label_log.grid(row=7, sticky='NW')
 
-        self.init_param_widgets()
+        # 表示する値(書式, 未計測の表示)
+        self.view = ViewModel()
+        self.view.bind('msg', self.label_msg)
+        self.view.bind('body_temp', self.label_body_tmp, '体温：{}℃', '体温：--.-- ℃')
+        self.view.bind('distance', self.label_distance, '距離：{} cm ', '距離：--- cm')
+        self.view.bind('thermistor', self.label_thermistor, 'サーミスタ温度：{} ℃', 'サーミスタ温度：--.-- ℃')
+        self.view.bind('thermistor_corr', self.label_thermistor_corr,
+                       'サーミスタ温度補正：{} ℃', 'サーミスタ温度補正：--.-- ℃')
+        self.view.bind('temperature', self.label_temperature,
+                       'センサ温度(最新値)：{}℃', 'センサ温度(最新値)：--.-- ℃')
+        self.view.bind('temperature_var', self.label_temperature_var,
+                       'センサ温度(分散)：{} ℃²', 'センサ温度(分散)：--.---- ℃²')
+        self.view.bind('temperature_frames', self.label_temperature_frames,
+                       '計測フレーム数：{}', '計測フレーム数：--')
+        self.view.bind('temperature_med', self.label_temperature_med,
+                       'センサ温度(推定値)：{}℃', 'センサ温度(推定値)：--.-- ℃')
+        self.view.bind('log', self.label_log, 'ログ：書き込み待ち {} 件 / 破棄 {} 件', resettable=False)
+        self.view.set('log', (0, 0))
 
-    ##########################################################################
-    # 計測データ ウィジット 初期化
-    ##########################################################################
-    def init_param_widgets(self):        
-        # フレーム(上部)
-        self.label_msg.config(text='顔が白枠に合うよう近づいてください')
-        self.label_body_tmp.config(text='体温：--.-- ℃')
-        # フレーム(下部)
-        self.label_distance.config(text='距離：--- cm')
-        self.label_thermistor.config(text='サーミスタ温度：--.-- ℃')
-        self.label_thermistor_corr.config(text='サーミスタ温度補正：--.-- ℃')
-        self.label_temperature_0.config(text='センサ温度(1回目)：--.-- ℃')
-        self.label_temperature_1.config(text='センサ温度(2回目)：--.-- ℃')
-        self.label_temperature_2.config(text='センサ温度(3回目)：--.-- ℃')
-        self.label_temperature_med.config(text='センサ温度(中央値)：--.-- ℃')
-
-    ##########################################################################
-    # カメラ初期化
-    ##########################################################################
-    def camera_init(self):   
-        self.camera = cv2.VideoCapture(0)
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 480)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-        # print(self.camera.get(cv2.CAP_PROP_FPS))
+        self.init_param_widgets('顔が白枠に合うよう近づいてください')
+        self.view.render()
 
     ##########################################################################
-    # カメラ制御
+    # 計測データ ウィジット 初期化
     ##########################################################################
-    def camera_ctrl(self):
-        ret, frame = self.camera.read()
-        # 左右反転
-        frame_mirror = cv2.flip(frame, 1)
-        # OpenCV(BGR) -> Pillow(RGB)変換
-        frame_color = cv2.cvtColor(frame_mirror, cv2.COLOR_BGR2RGB)
-        # ガイド枠の描画
-        cv2.rectangle(frame_color, (60,60), (420,420), (255,255,255), thickness=5)
-        # OpenCV frame -> Pillow Photo
-        self.photo = PIL.ImageTk.PhotoImage(image = PIL.Image.fromarray(frame_color))
-        # Pillow Photo -> Canvas
-        self.canvas_camera.create_image(0, 0, image = self.photo, anchor = 'nw')
+    def init_param_widgets(self, message):
+        self.view.reset(msg=message)
 
     ##########################################################################
-    # カメラ映像の空読み
+    # イベントの反映(表示は周期処理の最後にまとめて行う)
     ##########################################################################
-    def camera_clear_frame(self):
-        ret, frame = self.camera.read()
+    def on_event(self, event):
+        kind = event['event']
+        if kind == 'reset':
+            self.init_param_widgets(event['message'])
+        elif kind == 'status':
+            self.view.set('msg', event['message'])
+            self.view.set('distance', event['distance'])
+        elif kind == 'thermistor':
+            self.view.set('thermistor', event['thermistor'])
+        elif kind == 'temperature':
+            self.view.set('temperature', event['temperature'])
+            self.view.set('temperature_var', event['variance'])
+            self.view.set('temperature_frames', event['frames'])
+        elif kind == 'measurement':
+            self.view.set('temperature_med', event['sensor'])
+            self.view.set('thermistor_corr', event['thermistor_corr'])
+            self.view.set('body_temp', event['body_temp'])
+            self.view.set('msg', event['message'])
+        elif kind == 'log':
+            self.view.set('log', (event['queued'], event['dropped']))
 
     ##########################################################################
-    # 距離センサ(VL530X) 初期化
+    # カメラ映像の表示
     ##########################################################################
-    def distance_sensor_init(self):
-        self.distance_sensor = VL53L0X.VL53L0X(address=0x29)
-        self.distance_sensor.start_ranging(VL53L0X.VL53L0X_BETTER_ACCURACY_MODE)
+    def on_frame(self, frame_mirror, face_rect):
+        # 左右反転済み OpenCV(BGR) -> Pillow(RGBA)変換
+        frame_color = self.camera_view.update(frame_mirror, mirror=False)
+        if self.thermal_overlay is not None:
+            self.thermal_overlay.blend(frame_color)
+        if face_rect is not None:
+            self.camera_view.draw_rects([face_rect], FACE_RECT_COLOR)
+        # ガイド枠の描画 + キャンバスへの表示
+        self.camera_view.show()
 
     ##########################################################################
-    # サーマルセンサ(AMG8833) 初期化
-    ##########################################################################
-    def thermal_sensor_init(self):   
-        # I2Cバスの初期化
-        i2c_bus = busio.I2C(board.SCL, board.SDA)
-        # センサの初期化
-        self.thermal_sensor = adafruit_amg88xx.AMG88XX(i2c_bus, addr=0x68)
- 
+    # 温度分布の更新(温度フレームごと)
     ##########################################################################
-    # CSV出力の初期設定
-    ##########################################################################
-    def csv_init(self):
-        # フォルダの存在チェック
-        if not os.path.isdir(LOG_PATH):
-            os.makedirs(LOG_PATH)
-        # 日付取得
-        now = datetime.datetime.today()
-        # csvファイルの生成
-        self.filename = LOG_PATH + now.strftime('%Y-%m') + '.csv'
-        # ファイルの存在チェック
-        if not os.path.isfile(self.filename):
-            with open(self.filename, 'w', newline='') as csvfile:
-                file = csv.writer(csvfile)
-                # 1行目：見出し
-                file.writerow(['日時',
-                               '体温',
-                               'センサ温度',
-                               '距離',
-                               'サーミスタ',
-                               'サーミスタ補正'])
+    def on_thermal(self, pixels, distance):
+        start = time.perf_counter()
+        self.thermal_overlay.update(pixels, distance)
+        self.runtime.metrics.observe('step', 'thermal_overlay', time.perf_counter() - start)
 
     ##########################################################################
-    # CSV出力
+    # 終了処理
     ##########################################################################
-    def csv_ctrl(self):
-        with open(self.filename, 'a', newline='') as csvfile:
-            # csvファイルへの書き込みデータ
-            now = datetime.datetime.today()
-            data = [now.strftime('%Y-%m-%d %H:%M:%S'),
-                    self.body_temp,
-                    self.temperature_med,
-                    self.distance,
-                    self.thermistor_temp,
-                    self.thermistor_corr]
-            # データの書き込み
-            file = csv.writer(csvfile)
-            file.writerow(data)
+    def close(self):
+        # 起動処理の途中なら終わるのを待つ
+        self.startup_thread.join()
+        if self.runtime is not None:
+            self.runtime.close()
+        if self.server is not None:
+            self.server.close()
+        self.master.destroy()
 
     ##########################################################################
     # 周期処理
     ##########################################################################
     def cycle_proc(self):
-        # 顔検出
-        if self.cycle_proc_state == CycleProcState.FACE_DETECTION:
-            # カメラ制御
-            self.camera_ctrl()
-            # 距離計測
-            self.distance_timer += 1
-            if self.distance_timer >= 5:
-                self.distance_timer = 0
-                self.distance = self.distance_sensor.get_distance() / float(10)
-
-                if self.distance > DISTANCE_UPPER_LIMIT:
-                    self.label_msg.config(text='顔が白枠に合うよう近づいてください')
-                    self.label_distance.config(text='距離：--- cm')
-                else:
-                    if self.distance < DISTANCE_LOWER_LIMIT:
-                        self.label_msg.config(text='もう少し離れてください')
-                    elif self.distance > DISTANCE_STANDARD:
-                        self.label_msg.config(text='もう少し近づいてください')
-                    else:
-                        self.label_msg.config(text='')
-                        self.cycle_proc_state = CycleProcState.THERMISTOR
+        # 次の期限までの待ち時間(処理時間で周期が伸びない)
+        delay = self.runtime.tick()
+        # 変わった値だけを表示
+        self.view.render()
+        if self.overlay_item is not None and time.monotonic() - self.overlay_time >= OVERLAY_INTERVAL:
+            self.overlay_time = time.monotonic()
+            self.canvas_camera.itemconfig(self.overlay_item, text='\n'.join(self.runtime.metrics.overlay()))
+            # カメラ映像より手前に表示
+            self.canvas_camera.tag_raise(self.overlay_item)
+        self.after_id = self.after(int(round(delay * 1000)), self.cycle_proc)
 
-                    self.label_distance.config(text='距離：' + str(self.distance) + ' cm ')
-
-        # サーミスタ温度
-        elif self.cycle_proc_state == CycleProcState.THERMISTOR:
-            self.thermistor_temp = round(self.thermal_sensor.temperature, 2)
-            self.label_thermistor.config(text='サーミスタ温度：' + str(self.thermistor_temp) + ' ℃')
-            self.cycle_proc_state = CycleProcState.TEMPERATURE
-
-        # 赤外線センサ温度
-        elif self.cycle_proc_state == CycleProcState.TEMPERATURE:
-            self.temperature[self.temperature_index] = round(np.amax(np.array(self.thermal_sensor.pixels)), 2)
-            self.cycle_proc_state = CycleProcState.DUMMY
-        
-        # ダミー
-        elif self.cycle_proc_state == CycleProcState.DUMMY:
-            if self.temperature_index == 0:
-                print('センサ温度')
-                print(*self.thermal_sensor.pixels, sep='\n')
-                self.label_temperature_0.config(text='センサ温度(1回目)：' + str(self.temperature[0]) + '℃')
-                self.temperature_index = 1
-                self.cycle_proc_state = CycleProcState.TEMPERATURE
-            elif self.temperature_index == 1:
-                self.label_temperature_1.config(text='センサ温度(2回目)：' + str(self.temperature[1]) + '℃')
-                self.temperature_index = 2
-                self.cycle_proc_state = CycleProcState.TEMPERATURE
-            elif self.temperature_index == 2:
-                self.label_temperature_2.config(text='センサ温度(3回目)：' + str(self.temperature[2]) + '℃')
-                self.temperature_index = 0
-                self.cycle_proc_state = CycleProcState.MAKE_BODY_TEMP
-            else:
-                # 設計上ありえないがロバスト性に配慮
-                print('[error] index')
-                self.temperature_index = 0
-                self.cycle_proc_state = CycleProcState.FACE_DETECTION               
-
-       # 体温演算
-        elif self.cycle_proc_state == CycleProcState.MAKE_BODY_TEMP:
-            # 赤外線センサ温度(中央値)
-            self.temperature.sort()
-            self.temperature_med = round(self.temperature[1], 2)
-            self.label_temperature_med.config(text='センサ温度(中央値)：' + str(self.temperature_med) + '℃')
-            # サーミスタ温度補正
-            diff = BODY_TEMP_STANDARD - self.temperature_med
-            corr = diff - self.thermistor_corr
-            print(corr)
-            self.thermistor_corr = round((self.thermistor_corr + (corr / 10)), 2)
-            self.label_thermistor_corr.config(text='サーミスタ温度補正：' + str(self.thermistor_corr) + ' ℃')
-            # 体温
-            self.body_temp = round((self.temperature_med + self.thermistor_corr), 1)
-            self.label_body_tmp.config(text='体温：' + str(self.body_temp) + '℃')
-            if self.body_temp > 38.0:
-                    self.label_msg.config(text='体温が高いです！検温してください')
-            elif self.body_temp < 35.0:
-                self.label_msg.config(text='体温が低いです！検温してください')
-            else:
-                self.label_msg.config(text='体温は正常です！問題ありません')
-
-            self.cycle_proc_state = CycleProcState.UPDATE_CSV
-   
-        # CSV更新
-        elif self.cycle_proc_state == CycleProcState.UPDATE_CSV:
-            self.csv_ctrl()
-            self.cycle_proc_state = CycleProcState.PAUSE
-
-        # 一時停止
-        elif self.cycle_proc_state == CycleProcState.PAUSE:
-            # カメラ映像の空読み
-            self.camera_clear_frame()
-            self.pause_timer += 1
-            if self.pause_timer > 20:
-                self.pause_timer = 0
-                # 計測データ ウィジット 初期化
-                self.init_param_widgets()
-                self.cycle_proc_state = CycleProcState.FACE_DETECTION
-
-        # 設計上ありえないがロバスト性に配慮
-        else:
-            print('[error] cycle_proc')
-            self.cycle_proc_state = CycleProcState.FACE_DETECTION
+##############################################################################
+# カメラ・センサの取得元(起動処理のスレッドで呼ばれる)
+##############################################################################
+def open_sources(args):
+    from sensor_source import LiveSources, RecordSources, ReplaySources
+    if args.replay:
+        return ReplaySources(args.replay)
+    if args.record:
+        return RecordSources(args.record)
 
-        # 周期処理
-        self.after(PROC_CYCLE, self.cycle_proc)
+    return LiveSources()
 
 if __name__ == '__main__':
-    root = Tk()
-    app = Application(master=root)
-    app.mainloop()
\ No newline at end of file
+    timeline = StartupTimeline()
+    parser = argparse.ArgumentParser(description='非接触体温計')
+    parser.add_argument('--record', metavar='SESSION', help='カメラ・センサのデータを記録する')
+    parser.add_argument('--replay', metavar='SESSION', help='記録したデータを実時間で再生する')
+    parser.add_argument('--unix', help='イベントをUnixソケットへも配信する')
+    parser.add_argument('--tcp', metavar='HOST:PORT', help='イベントをTCPへも配信する')
+    parser.add_argument('--debug', action='store_true', help='処理時間をカメラ映像に重ねて表示する')
+    parser.add_argument('--thermal-overlay', action='store_true', help='温度分布をカメラ映像に重ねて表示する')
+    parser.add_argument('--throughput', action='store_true', help='計測した人が立ち去ればすぐ次の人を計測する')
+    parser.add_argument('--metrics-file', help='Prometheus テキスト形式の出力先(空文字で無効)')
+    args = parser.parse_args()
+    server = None
+    if args.unix or args.tcp:
+        server = EventServer(args.unix, parse_tcp(args.tcp) if args.tcp else None)
+    with timeline.phase('tk'):
+        root = Tk()
+    app = Application(master=root, server=server,
+                      debug=args.debug, metrics_file=args.metrics_file,
+                      thermal_overlay=args.thermal_overlay, throughput=args.throughput,
+                      open_sources=lambda: open_sources(args), timeline=timeline)
+    app.mainloop()
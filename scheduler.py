@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+import time
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+JITTER_SAMPLES = 256                # 保持する開始遅れのサンプル数
+SCHEDULE_REPORT_INTERVAL = 60.0     # 統計の出力周期[sec]
+
+##############################################################################
+# クラス：DeadlineScheduler
+#   周期の開始時刻を 前回の期限 + 周期 で決め、処理時間で周期が伸びないようにする
+#   期限からの開始遅れ(ジッタ)、周期超過、段階ごとの処理時間と予算超過を集計する
+##############################################################################
+class DeadlineScheduler(object):
+    def __init__(self, report_interval=SCHEDULE_REPORT_INTERVAL, clock=time.monotonic):
+        self.report_interval = report_interval
+        self.clock = clock
+        # 次の周期の期限
+        self.deadline = None
+        self.tick_start = 0.0
+        # 開始遅れ[sec]のリングバッファ
+        self.jitter = np.zeros(JITTER_SAMPLES, dtype=np.float64)
+        self.ticks = 0
+        # 周期内に終わらなかった回数・飛ばした周期数
+        self.overruns = 0
+        self.skipped = 0
+        # 段階ごとの 回数, 合計時間[sec], 最大時間[sec], 予算超過回数
+        self.stages = {}
+        self.last_report = self.clock()
+
+    ##########################################################################
+    # 周期の開始
+    ##########################################################################
+    def begin(self):
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+        self.jitter[self.ticks % JITTER_SAMPLES] = now - self.deadline
+        self.ticks += 1
+        self.tick_start = now
+
+        return now
+
+    ##########################################################################
+    # 段階の処理時間を記録
+    ##########################################################################
+    def stage(self, name, elapsed, budget):
+        count, total, worst, over = self.stages.get(name, (0, 0.0, 0.0, 0))
+        self.stages[name] = (count + 1, total + elapsed, max(worst, elapsed),
+                             over + (1 if elapsed > budget else 0))
+
+    ##########################################################################
+    # 周期の終了
+    #   戻り値：次の期限までの待ち時間[sec]
+    ##########################################################################
+    def end(self, period):
+        self.deadline += period
+        now = self.clock()
+        if now > self.deadline:
+            # 期限を過ぎた周期は詰めて実行せず、次の期限に合わせる
+            self.overruns += 1
+            missed = int((now - self.deadline) // period) + 1
+            self.skipped += missed - 1
+            self.deadline += missed * period
+
+        return self.deadline - now
+
+    ##########################################################################
+    # 統計
+    ##########################################################################
+    def stats(self):
+        jitter = self.jitter[:min(self.ticks, JITTER_SAMPLES)] * 1000
+        result = {'ticks': self.ticks,
+                  'overruns': self.overruns,
+                  'skipped': self.skipped,
+                  'jitter_ms': {'mean': round(float(jitter.mean()), 2) if len(jitter) else 0.0,
+                                'p95': round(float(np.percentile(jitter, 95)), 2) if len(jitter) else 0.0,
+                                'max': round(float(jitter.max()), 2) if len(jitter) else 0.0},
+                  'stages': {}}
+        for name, (count, total, worst, over) in self.stages.items():
+            result['stages'][name] = {'count': count,
+                                      'mean_ms': round(total * 1000 / count, 2),
+                                      'max_ms': round(worst * 1000, 2),
+                                      'over_budget': over}
+
+        return result
+
+    ##########################################################################
+    # 一定周期で統計を返す(周期外はNone)
+    ##########################################################################
+    def report(self):
+        if self.tick_start - self.last_report < self.report_interval:
+            return None
+        self.last_report = self.tick_start
+
+        return self.stats()
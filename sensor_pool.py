@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+import time
+import argparse
+import threading
+import numpy as np
+from smbus2 import SMBus
+import VL53L0X
+import amg8833
+
+##############################################################################
+# 定数
+##############################################################################
+I2C_BUS = 1                         # I2C バス番号
+TOF_ADDR = 0x29                     # VL53L0X のI2C アドレス
+TOF_MODE = VL53L0X.VL53L0X_HIGH_SPEED_MODE     # 距離センサの計測モード
+THERMISTOR_INTERVAL = 1.0           # サーミスタ温度の読み出し周期[sec]
+ERROR_BACKOFF = 0.1                 # 読み出し失敗後の待ち時間[sec]
+IDLE_SLEEP_MAX = 0.01               # 読み出し待ちの最大スリープ[sec]
+SCHEDULE_SLACK = 0.002              # 同じ巡回で読む、読み出し時刻直前のセンサ[sec]
+
+# 通路ごとのセンサ(通路名, マルチプレクサのアドレス, チャネル)
+#   マルチプレクサを使わない場合はアドレス・チャネルをNoneにする
+LANES = [('lane0', 0x70, 0),
+         ('lane1', 0x70, 1)]
+
+# センサの種類
+KIND_TOF = 'tof'
+KIND_THERMAL = 'thermal'
+
+##############################################################################
+# クラス：Lane
+#   通路1つ分の最新の計測値(時刻付き)
+##############################################################################
+class Lane(object):
+    def __init__(self, name):
+        self.name = name
+        # 距離[cm]・計測時刻
+        self.distance = None
+        self.distance_time = 0.0
+        # 画素温度[℃]・取得時刻
+        self.pixels = np.zeros((8, 8), dtype=np.float32)
+        self.pixels_time = 0.0
+        # サーミスタ温度[℃]・取得時刻
+        self.thermistor = None
+        self.thermistor_time = 0.0
+
+##############################################################################
+# クラス：PoolDevice
+#   プールが管理するセンサ1台と、次の読み出し時刻
+##############################################################################
+class PoolDevice(object):
+    def __init__(self, kind, lane, mux, channel, sensor, period):
+        self.kind = kind
+        self.lane = lane
+        self.mux = mux
+        self.channel = channel
+        self.sensor = sensor
+        # 読み出し周期[sec]
+        self.period = period
+        self.next_time = 0.0
+        self.reads = 0
+        self.errors = 0
+
+    ##########################################################################
+    # マルチプレクサのチャネル(マルチプレクサ無しはNone)
+    ##########################################################################
+    @property
+    def route(self):
+        return None if self.mux is None else (self.mux, self.channel)
+
+##############################################################################
+# クラス：SensorPool
+#   TCA9548A の先にある距離センサ・赤外線センサをすべて1つのスレッドで読み出す
+#   読み出し時刻になったセンサを選択中のチャネルから順にチャネルごとにまとめて読み、
+#   チャネルの切り替えとバスの空き時間を減らす
+##############################################################################
+class SensorPool(object):
+    def __init__(self, bus=I2C_BUS):
+        self.bus_number = bus
+        self.bus = SMBus(bus)
+        self.lanes = {}
+        self.devices = []
+        # 接続しているマルチプレクサと選択中のチャネル
+        self.muxes = set()
+        self.selected = None
+        # 統計
+        self.switches = 0
+        self.busy_time = 0.0
+        self.start_time = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    ##########################################################################
+    # 通路(無ければ作成)
+    ##########################################################################
+    def lane(self, name):
+        if name not in self.lanes:
+            self.lanes[name] = Lane(name)
+
+        return self.lanes[name]
+
+    ##########################################################################
+    # マルチプレクサのチャネル選択(選択済みなら何もしない)
+    ##########################################################################
+    def select(self, route):
+        if route == self.selected:
+            return
+        # 同じアドレスのセンサが見えないよう、前のマルチプレクサは切り離す
+        if self.selected is not None and (route is None or route[0] != self.selected[0]):
+            self.bus.write_byte(self.selected[0], 0x00)
+        if route is not None:
+            self.bus.write_byte(route[0], 1 << route[1])
+        self.selected = route
+        self.switches += 1
+
+    ##########################################################################
+    # 全マルチプレクサの切り離し
+    ##########################################################################
+    def deselect_all(self):
+        for mux in self.muxes:
+            self.bus.write_byte(mux, 0x00)
+        self.selected = None
+
+    ##########################################################################
+    # 距離センサの追加
+    #   プールがチャネルを選択するため、ライブラリにはマルチプレクサ無しとして登録する
+    ##########################################################################
+    def add_tof(self, lane, mux=None, channel=None, address=TOF_ADDR, mode=TOF_MODE):
+        if mux is not None:
+            self.muxes.add(mux)
+        route = None if mux is None else (mux, channel)
+        self.select(route)
+        sensor = VL53L0X.VL53L0X(address=address)
+        sensor.start_ranging(mode)
+        # 計測周期 = タイミングバジェット
+        period = max(sensor.get_timing(), 1000) / 1e6
+        device = PoolDevice(KIND_TOF, self.lane(lane), mux, channel, sensor, period)
+        self.devices.append(device)
+
+        return device
+
+    ##########################################################################
+    # 赤外線センサの追加
+    ##########################################################################
+    def add_thermal(self, lane, mux=None, channel=None, address=amg8833.AMG8833_ADDR, fps=10):
+        if mux is not None:
+            self.muxes.add(mux)
+        route = None if mux is None else (mux, channel)
+        self.select(route)
+        sensor = amg8833.AMG8833(bus=self.bus_number, address=address, fps=fps)
+        device = PoolDevice(KIND_THERMAL, self.lane(lane), mux, channel, sensor, sensor.frame_period)
+        self.devices.append(device)
+
+        return device
+
+    ##########################################################################
+    # 読み出し開始
+    ##########################################################################
+    def start(self):
+        self.start_time = time.monotonic()
+        self.thread.start()
+
+    ##########################################################################
+    # 読み出しスレッド
+    ##########################################################################
+    def run(self):
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            wait = min(device.next_time for device in self.devices) - now
+            if wait > 0:
+                time.sleep(min(wait, IDLE_SLEEP_MAX))
+                continue
+            # 直前のセンサも含めて、選択中のチャネルを先頭に、チャネルごとにまとめる
+            due = [device for device in self.devices if device.next_time <= now + SCHEDULE_SLACK]
+            due.sort(key=lambda device: (device.route != self.selected, device.route or (-1, -1)))
+            for device in due:
+                self.read(device)
+            self.busy_time += time.monotonic() - now
+        for device in self.devices:
+            if device.kind == KIND_TOF:
+                self.select(device.route)
+                device.sensor.stop_ranging()
+        self.deselect_all()
+
+    ##########################################################################
+    # センサ1台の読み出し
+    ##########################################################################
+    def read(self, device):
+        lane = device.lane
+        try:
+            self.select(device.route)
+            if device.kind == KIND_TOF:
+                value = device.sensor.get_distance()
+                timestamp = time.monotonic()
+                if value <= 0:
+                    raise IOError('ranging error')
+                with self.lock:
+                    lane.distance = value / float(10)
+                    lane.distance_time = timestamp
+            else:
+                pixels = device.sensor.read_frame()
+                thermistor = None
+                if device.sensor.timestamp - lane.thermistor_time >= THERMISTOR_INTERVAL:
+                    thermistor = device.sensor.read_thermistor()
+                with self.lock:
+                    np.copyto(lane.pixels, pixels)
+                    lane.pixels_time = device.sensor.timestamp
+                    if thermistor is not None:
+                        lane.thermistor = thermistor
+                        lane.thermistor_time = device.sensor.timestamp
+            device.reads += 1
+            device.next_time = time.monotonic() + device.period
+        except IOError:
+            device.errors += 1
+            device.next_time = time.monotonic() + max(device.period, ERROR_BACKOFF)
+            # チャネルの状態が不明なため、すべて切り離して次回は選択し直す
+            try:
+                self.deselect_all()
+            except IOError:
+                self.selected = None
+
+    ##########################################################################
+    # 全通路の最新値
+    #   {通路名: (距離[cm], 距離の時刻, 画素温度(8, 8), 画素温度の時刻, サーミスタ温度)}
+    ##########################################################################
+    def readings(self):
+        with self.lock:
+            return {name: (lane.distance, lane.distance_time,
+                           lane.pixels.copy(), lane.pixels_time, lane.thermistor)
+                    for name, lane in self.lanes.items()}
+
+    ##########################################################################
+    # 統計
+    ##########################################################################
+    def report(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        for device in self.devices:
+            print('{:<8}{:<8} {} {:7.1f} reads/s  errors {}'.format(
+                device.lane.name, device.kind, device.route,
+                device.reads / elapsed, device.errors))
+        reads = sum(device.reads for device in self.devices)
+        print('channel switches {} ({:.2f} / read)'.format(self.switches, self.switches / max(reads, 1)))
+        print('bus busy {:.1f} %'.format(self.busy_time / elapsed * 100))
+
+    ##########################################################################
+    # 終了
+    ##########################################################################
+    def close(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        for device in self.devices:
+            if device.kind == KIND_THERMAL:
+                device.sensor.close()
+        self.bus.close()
+
+##############################################################################
+# 動作確認：LANESの全センサを読み出し、通路ごとの最新値と統計を表示する
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='TCA9548A 経由の複数センサの読み出し')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    pool = SensorPool()
+    for name, mux, channel in LANES:
+        pool.add_tof(name, mux, channel)
+        pool.add_thermal(name, mux, channel)
+    pool.start()
+    end = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < end:
+            time.sleep(1.0)
+            now = time.monotonic()
+            for name, (distance, distance_time, pixels, pixels_time, thermistor) in pool.readings().items():
+                print('{:<8} distance {} cm ({:.0f} ms ago)  max {:.2f} ℃ ({:.0f} ms ago)  thermistor {}'.format(
+                    name, distance, (now - distance_time) * 1000,
+                    float(pixels.max()), (now - pixels_time) * 1000, thermistor))
+    finally:
+        pool.close()
+        pool.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+import time
+import struct
+import threading
+import cv2
+import numpy as np
+import VL53L0X
+import amg8833
+from camera_grabber import CameraGrabber
+from distance_ranging import DistanceRanging, RangingFilter, OUT_OF_RANGE
+
+##############################################################################
+# 定数
+##############################################################################
+CAMERA_INDEX = 0                    # カメラ番号
+CAMERA_WIDTH = 480                  # カメラ映像の横幅
+CAMERA_HEIGHT = 480                 # カメラ映像の高さ
+TOF_ADDR = 0x29                     # VL53L0X のI2C アドレス
+THERMAL_BUS = 1                     # AMG8833 のI2C バス番号
+THERMAL_ADDR = 0x68                 # AMG8833 のI2C アドレス
+THERMAL_FPS = 10                    # AMG8833 のフレームレート
+
+# セッションファイル
+#   先頭にSESSION_MAGIC、以降はレコード(ヘッダ + データ)の並び
+#   ヘッダ：種類(1byte), 記録開始からの時刻[sec](double), データ長(uint32)
+SESSION_MAGIC = b'RTHMSES1'
+RECORD_HEADER = struct.Struct('<BdI')
+SESSION_JPEG_QUALITY = 90           # カメラ映像の圧縮品質
+
+# 模擬データ(人が周期的に来て、立ち止まり、去っていく)
+SYNTHETIC_CAMERA_FPS = 30           # カメラのフレームレート
+SYNTHETIC_RANGING_INTERVAL = 0.02   # 距離の計測間隔[sec]
+SYNTHETIC_PERSON_PERIOD = 30.0      # 人が来る周期[sec]
+SYNTHETIC_APPROACH = 2.0            # 近づく時間[sec]
+SYNTHETIC_STAY = 6.0                # 立ち止まる時間[sec]
+SYNTHETIC_LEAVE = 1.0               # 去る時間[sec]
+SYNTHETIC_FAR = 150.0               # 近づき始める・去り終える距離[cm]
+SYNTHETIC_NEAR = 50.0               # 立ち止まる距離[cm]
+SYNTHETIC_AMBIENT = 24.0            # 背景の温度[℃]
+SYNTHETIC_SKIN = 34.0               # 顔の温度[℃]
+SYNTHETIC_THERMISTOR = 28.0         # サーミスタ温度[℃]
+
+# レコードの種類
+KIND_CAMERA = 1                     # カメラ映像(JPEG)
+KIND_DISTANCE = 2                   # 距離[cm](float32)
+KIND_THERMAL = 3                    # 画素温度(int16 0.25℃単位 x64)
+KIND_THERMISTOR = 4                 # サーミスタ温度[℃](float32)
+
+##############################################################################
+# クラス：SessionWriter
+#   計測データを時刻付きでセッションファイルへ追記する(複数スレッドから呼ばれる)
+##############################################################################
+class SessionWriter(object):
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(SESSION_MAGIC)
+        # 記録開始時刻(time.monotonic)
+        self.origin = time.monotonic()
+        self.records = 0
+        self.lock = threading.Lock()
+
+    ##########################################################################
+    # レコードの追記
+    #   timestamp：time.monotonic()の時刻
+    ##########################################################################
+    def write(self, kind, timestamp, payload):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(RECORD_HEADER.pack(kind, timestamp - self.origin, len(payload)))
+            self.file.write(payload)
+            self.records += 1
+
+    ##########################################################################
+    # 終了
+    ##########################################################################
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = None
+
+##############################################################################
+# クラス：SessionReader
+#   セッションファイルを読み込み、種類ごとに時刻順の索引を作る
+##############################################################################
+class SessionReader(object):
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = file.read()
+        if self.data[:len(SESSION_MAGIC)] != SESSION_MAGIC:
+            raise ValueError(path + ' is not a session file')
+        index = {}
+        offset = len(SESSION_MAGIC)
+        while offset + RECORD_HEADER.size <= len(self.data):
+            kind, timestamp, length = RECORD_HEADER.unpack_from(self.data, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > len(self.data):
+                # 記録中に終了したファイルの末尾
+                break
+            index.setdefault(kind, []).append((timestamp, offset, length))
+            offset += length
+        # 種類ごとの時刻・データ位置(時刻順)
+        self.timestamps = {}
+        self.records = {}
+        for kind, records in index.items():
+            records.sort(key=lambda record: record[0])
+            self.timestamps[kind] = np.array([record[0] for record in records], dtype=np.float64)
+            self.records[kind] = [(offset, length) for timestamp, offset, length in records]
+        self.duration = max([ts[-1] for ts in self.timestamps.values()], default=0.0)
+
+    ##########################################################################
+    # 時刻nowまでの最新レコードの番号(無ければ-1)
+    ##########################################################################
+    def latest(self, kind, now):
+        timestamps = self.timestamps.get(kind)
+        if timestamps is None:
+            return -1
+
+        return int(np.searchsorted(timestamps, now, side='right')) - 1
+
+    ##########################################################################
+    # レコードの時刻・データ
+    ##########################################################################
+    def record(self, kind, index):
+        offset, length = self.records[kind][index]
+
+        return self.timestamps[kind][index], self.data[offset:offset + length]
+
+    ##########################################################################
+    # レコード数
+    ##########################################################################
+    def count(self, kind):
+        return len(self.records.get(kind, []))
+
+##############################################################################
+# クラス：ReplayClock
+#   再生位置(記録開始からの時刻[sec])
+#   realtime=True は実時間で進み、False は advance() で進める(最速再生)
+##############################################################################
+class ReplayClock(object):
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.origin = time.monotonic()
+        self.offset = 0.0
+
+    def now(self):
+        if self.realtime:
+            return time.monotonic() - self.origin
+
+        return self.offset
+
+    def advance(self, seconds):
+        self.offset += seconds
+
+##############################################################################
+# 記録：カメラ(読み出した新しいフレームだけを記録する)
+##############################################################################
+class RecordingCamera(object):
+    def __init__(self, camera, writer):
+        self.camera = camera
+        self.writer = writer
+        self.recorded_seq = 0
+
+    def read(self):
+        ret, frame = self.camera.read()
+        if ret and self.camera.seq != self.recorded_seq:
+            self.recorded_seq = self.camera.seq
+            ok, jpeg = cv2.imencode('.jpg', frame, (cv2.IMWRITE_JPEG_QUALITY, SESSION_JPEG_QUALITY))
+            if ok:
+                self.writer.write(KIND_CAMERA, self.camera.timestamp, jpeg.tobytes())
+
+        return ret, frame
+
+    # それ以外(seq, timestamp, pause()など)はカメラのまま
+    def __getattr__(self, name):
+        return getattr(self.camera, name)
+
+##############################################################################
+# 記録：サーマルセンサ(読み出したフレーム・サーミスタ温度を記録する)
+##############################################################################
+class RecordingThermal(object):
+    def __init__(self, sensor, writer):
+        self.sensor = sensor
+        self.writer = writer
+
+    def read_frame(self, force=True):
+        frame_count = self.sensor.frame_count
+        pixels = self.sensor.read_frame(force)
+        if self.sensor.frame_count != frame_count:
+            raw = np.round(pixels * 4).astype('<i2')
+            self.writer.write(KIND_THERMAL, self.sensor.timestamp, raw.tobytes())
+
+        return pixels
+
+    def read_thermistor(self):
+        value = self.sensor.read_thermistor()
+        self.writer.write(KIND_THERMISTOR, time.monotonic(), struct.pack('<f', value))
+
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+##############################################################################
+# 再生：カメラ(CameraGrabberと同じ読み出し)
+##############################################################################
+class ReplayCamera(object):
+    def __init__(self, session, clock):
+        self.session = session
+        self.clock = clock
+        self.front = None
+        self.timestamp = 0.0
+        self.seq = 0
+        self.active = True
+
+    def negotiated(self):
+        return 'JPEG', 0
+
+    def isOpened(self):
+        return self.session.count(KIND_CAMERA) > 0
+
+    def start(self):
+        pass
+
+    def pause(self):
+        self.active = False
+
+    def resume(self):
+        self.active = True
+
+    def read(self):
+        index = self.session.latest(KIND_CAMERA, self.clock.now())
+        # 休止中は新しいフレームを渡さない
+        if self.active and index >= 0 and index + 1 != self.seq:
+            timestamp, jpeg = self.session.record(KIND_CAMERA, index)
+            self.front = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.timestamp = timestamp
+            self.seq = index + 1
+
+        return self.front is not None, self.front
+
+    def release(self):
+        pass
+
+##############################################################################
+# 再生：距離(DistanceRangingと同じフィルタ・接近速度)
+##############################################################################
+class ReplayRanging(RangingFilter):
+    def __init__(self, session, clock):
+        RangingFilter.__init__(self)
+        self.session = session
+        self.clock = clock
+        values = [struct.unpack('<f', session.record(KIND_DISTANCE, i)[1])[0]
+                  for i in range(session.count(KIND_DISTANCE))]
+        self.samples = np.column_stack((session.timestamps.get(KIND_DISTANCE, np.empty(0)),
+                                        np.array(values, dtype=np.float64)))
+
+    # 記録した全サンプルから、再生時刻までの直近n個
+    def recent(self, n):
+        end = self.session.latest(KIND_DISTANCE, self.clock.now()) + 1
+
+        return self.samples[max(end - n, 0):end]
+
+##############################################################################
+# 再生：サーマルセンサ(AMG8833と同じ読み出し)
+##############################################################################
+class ReplayThermal(object):
+    def __init__(self, session, clock):
+        self.session = session
+        self.clock = clock
+        self.pixels = np.zeros((8, 8), dtype=np.float32)
+        self.index = -1
+        self.timestamp = 0.0
+        self.frame_count = 0
+        self.frame_period = 1.0 / THERMAL_FPS
+
+    def frame_ready(self):
+        return self.session.latest(KIND_THERMAL, self.clock.now()) > self.index
+
+    def read_frame(self, force=True):
+        index = self.session.latest(KIND_THERMAL, self.clock.now())
+        if index > self.index:
+            self.timestamp, raw = self.session.record(KIND_THERMAL, index)
+            np.multiply(np.frombuffer(raw, dtype='<i2').reshape(8, 8), amg8833.PIXEL_RESOLUTION,
+                        out=self.pixels, casting='unsafe')
+            self.index = index
+            self.frame_count += 1
+
+        return self.pixels
+
+    def read_thermistor(self):
+        if self.session.count(KIND_THERMISTOR) == 0:
+            return 0.0
+        # 記録前なら最初の値
+        index = max(self.session.latest(KIND_THERMISTOR, self.clock.now()), 0)
+
+        return struct.unpack('<f', self.session.record(KIND_THERMISTOR, index)[1])[0]
+
+    def close(self):
+        pass
+
+##############################################################################
+# 模擬：人の距離[cm](時刻の配列 -> 距離の配列。いない時は計測範囲外)
+##############################################################################
+def synthetic_distance(t):
+    phase = np.mod(t, SYNTHETIC_PERSON_PERIOD)
+    leave_start = SYNTHETIC_APPROACH + SYNTHETIC_STAY
+    leave_end = leave_start + SYNTHETIC_LEAVE
+    distance = np.interp(phase,
+                         (0.0, SYNTHETIC_APPROACH, leave_start, leave_end),
+                         (SYNTHETIC_FAR, SYNTHETIC_NEAR, SYNTHETIC_NEAR, SYNTHETIC_FAR))
+
+    return np.where(phase < leave_end, distance, OUT_OF_RANGE)
+
+# 模擬：人がいるか(距離の計測範囲内か)
+def synthetic_present(t):
+    return float(synthetic_distance(np.array([t]))[0]) < OUT_OF_RANGE
+
+##############################################################################
+# 模擬：カメラ(人がいる時は顔の代わりの楕円を描いたフレーム)
+##############################################################################
+class SyntheticCamera(object):
+    def __init__(self, clock):
+        self.clock = clock
+        self.frames = []
+        for present in (False, True):
+            frame = np.full((CAMERA_HEIGHT, CAMERA_WIDTH, 3), 96, dtype=np.uint8)
+            if present:
+                cv2.ellipse(frame, (CAMERA_WIDTH // 2, CAMERA_HEIGHT // 2), (90, 120), 0, 0, 360,
+                            (150, 170, 200), -1)
+            self.frames.append(frame)
+        self.front = None
+        self.timestamp = 0.0
+        self.seq = 0
+        self.active = True
+
+    def negotiated(self):
+        return 'SYNTHETIC', SYNTHETIC_CAMERA_FPS
+
+    def isOpened(self):
+        return True
+
+    def start(self):
+        pass
+
+    def pause(self):
+        self.active = False
+
+    def resume(self):
+        self.active = True
+
+    def read(self):
+        now = self.clock.now()
+        seq = int(now * SYNTHETIC_CAMERA_FPS) + 1
+        # 休止中は新しいフレームを渡さない
+        if self.active and seq != self.seq:
+            self.front = self.frames[synthetic_present(now)]
+            self.timestamp = now
+            self.seq = seq
+
+        return self.front is not None, self.front
+
+    def release(self):
+        pass
+
+##############################################################################
+# 模擬：距離(DistanceRangingと同じフィルタ・接近速度)
+##############################################################################
+class SyntheticRanging(RangingFilter):
+    def __init__(self, clock):
+        RangingFilter.__init__(self)
+        self.clock = clock
+
+    # 模擬の距離から、模擬時刻までの直近n個
+    def recent(self, n):
+        latest = np.floor(self.clock.now() / SYNTHETIC_RANGING_INTERVAL)
+        t = (latest - np.arange(n - 1, -1, -1)) * SYNTHETIC_RANGING_INTERVAL
+        t = t[t >= 0]
+
+        return np.column_stack((t, synthetic_distance(t)))
+
+##############################################################################
+# 模擬：サーマルセンサ(人がいる時は中央が顔の温度)
+##############################################################################
+class SyntheticThermal(object):
+    def __init__(self, clock):
+        self.clock = clock
+        self.frames = []
+        for present in (False, True):
+            frame = np.full((8, 8), SYNTHETIC_AMBIENT, dtype=np.float32)
+            if present:
+                frame[2:6, 2:6] = SYNTHETIC_SKIN
+            self.frames.append(frame)
+        self.pixels = np.zeros((8, 8), dtype=np.float32)
+        self.index = -1
+        self.timestamp = 0.0
+        self.frame_count = 0
+        self.frame_period = 1.0 / THERMAL_FPS
+
+    def frame_ready(self):
+        return int(self.clock.now() * THERMAL_FPS) > self.index
+
+    def read_frame(self, force=True):
+        now = self.clock.now()
+        index = int(now * THERMAL_FPS)
+        if index > self.index:
+            np.copyto(self.pixels, self.frames[synthetic_present(now)])
+            self.timestamp = now
+            self.index = index
+            self.frame_count += 1
+
+        return self.pixels
+
+    def read_thermistor(self):
+        return SYNTHETIC_THERMISTOR
+
+    def close(self):
+        pass
+
+##############################################################################
+# クラス：LiveSources
+#   実機のカメラ・距離センサ・サーマルセンサ
+##############################################################################
+class LiveSources(object):
+    def camera(self):
+        return CameraGrabber(CAMERA_INDEX, width=CAMERA_WIDTH, height=CAMERA_HEIGHT)
+
+    def ranging(self, lower_limit, standard):
+        sensor = VL53L0X.VL53L0X(address=TOF_ADDR)
+        # スレッドで計測し続ける(接近中は高速モード、計測範囲内は高精度モード)
+        return DistanceRanging(sensor, lower_limit, standard,
+                               accuracy_mode=VL53L0X.VL53L0X_BETTER_ACCURACY_MODE,
+                               speed_mode=VL53L0X.VL53L0X_HIGH_SPEED_MODE)
+
+    def thermal(self):
+        return amg8833.AMG8833(bus=THERMAL_BUS, address=THERMAL_ADDR, fps=THERMAL_FPS)
+
+    def close(self):
+        pass
+
+##############################################################################
+# クラス：RecordSources
+#   実機のデータをセッションファイルへ記録しながら渡す
+##############################################################################
+class RecordSources(LiveSources):
+    def __init__(self, path):
+        self.writer = SessionWriter(path)
+
+    def camera(self):
+        return RecordingCamera(LiveSources.camera(self), self.writer)
+
+    def ranging(self, lower_limit, standard):
+        ranging = LiveSources.ranging(self, lower_limit, standard)
+        ranging.on_sample = lambda timestamp, distance: self.writer.write(
+            KIND_DISTANCE, timestamp, struct.pack('<f', distance))
+
+        return ranging
+
+    def thermal(self):
+        return RecordingThermal(LiveSources.thermal(self), self.writer)
+
+    def close(self):
+        self.writer.close()
+
+##############################################################################
+# クラス：ReplaySources
+#   セッションファイルを再生する(実時間 または advance()で最速)
+##############################################################################
+class ReplaySources(object):
+    def __init__(self, path, realtime=True):
+        self.session = SessionReader(path)
+        self.clock = ReplayClock(realtime)
+
+    def camera(self):
+        return ReplayCamera(self.session, self.clock)
+
+    def ranging(self, lower_limit, standard):
+        return ReplayRanging(self.session, self.clock)
+
+    def thermal(self):
+        return ReplayThermal(self.session, self.clock)
+
+    @property
+    def finished(self):
+        return self.clock.now() > self.session.duration
+
+    def close(self):
+        pass
+
+##############################################################################
+# クラス：SyntheticSources
+#   実機・記録なしの模擬データ(長時間の試験用。advance()で最速に進められる)
+##############################################################################
+class SyntheticSources(object):
+    def __init__(self, realtime=True):
+        self.clock = ReplayClock(realtime)
+
+    def camera(self):
+        return SyntheticCamera(self.clock)
+
+    def ranging(self, lower_limit, standard):
+        return SyntheticRanging(self.clock)
+
+    def thermal(self):
+        return SyntheticThermal(self.clock)
+
+    def close(self):
+        pass
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+import gc
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+from sensor_source import SyntheticSources
+
+##############################################################################
+# 定数
+##############################################################################
+SOAK_DAYS = 1.0                     # 模擬する期間[日]
+SAMPLE_INTERVAL = 3600.0            # 計測値を記録する周期(模擬時間)[sec]
+DAY = 86400.0
+TRACE_FRAMES = 1                    # tracemallocで記録する呼び出し元の段数
+TOP_STATS = 5                       # 増加の大きいメモリ確保元の表示数
+
+# 判定の閾値(最初の周期 -> 最後の周期の増加量)
+RSS_GROWTH_MAX = 32.0               # RSS[MiB]
+HEAP_GROWTH_MAX = 8.0               # Pythonのメモリ確保(tracemalloc)[MiB]
+ITEM_GROWTH_MAX = 0                 # Tkキャンバスのアイテム数
+FD_GROWTH_MAX = 0                   # ファイルディスクリプタ数
+P99_REGRESSION_MAX = 1.5            # 周期処理時間の99%点(最初の周期との比)
+P99_FLOOR = 1.0                     # 比較する99%点の下限[ms](計測の揺らぎを除く)
+
+MIB = 1024.0 * 1024.0
+
+##############################################################################
+# RSS[byte]
+##############################################################################
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # /procが無い場合は最大RSS
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+##############################################################################
+# 開いているファイルディスクリプタ数(数えられなければ-1)
+##############################################################################
+def open_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return -1
+
+##############################################################################
+# ウィジット配下のキャンバスのアイテム数
+##############################################################################
+def canvas_items(widget):
+    if widget is None:
+        return 0
+    count = 0
+    if widget.winfo_class() == 'Canvas':
+        count += len(widget.find_all())
+    for child in widget.winfo_children():
+        count += canvas_items(child)
+
+    return count
+
+##############################################################################
+# クラス：SoakSample
+#   1周期分の資源の使用量と周期処理時間
+##############################################################################
+class SoakSample(object):
+    def __init__(self, sim_time, tick_times, widget, trace):
+        # 循環参照のゴミを回収してから測る(回収待ちを増加と誤判定しない)
+        gc.collect()
+        self.sim_time = sim_time
+        self.rss = rss_bytes()
+        self.heap = tracemalloc.get_traced_memory()[0] if trace else 0
+        self.fds = open_fds()
+        self.items = canvas_items(widget)
+        self.ticks = len(tick_times)
+        times = np.array(tick_times) * 1000
+        self.p50 = float(np.percentile(times, 50)) if len(times) else 0.0
+        self.p99 = float(np.percentile(times, 99)) if len(times) else 0.0
+
+    def format(self):
+        return '{:8.2f} h  ticks {:7d}  p50 {:6.2f} ms  p99 {:6.2f} ms  rss {:7.1f} MiB  heap {:7.2f} MiB  fds {:3d}  items {:3d}'.format(
+            self.sim_time / 3600, self.ticks, self.p50, self.p99,
+            self.rss / MIB, self.heap / MIB, self.fds, self.items)
+
+##############################################################################
+# 周期処理の駆動
+#   画面あり：Application.cycle_proc()を呼び、Tkのタイマ予約は取り消してTkのイベントだけ処理する
+#   画面なし：MeasurementRuntime.tick()
+##############################################################################
+class TkDriver(object):
+    def __init__(self, sources, log_path):
+        from tkinter import Tk
+        from rthm import Application
+        self.root = Tk()
+        self.app = Application(master=self.root, sources=sources, metrics_file='', log_path=log_path)
+        # 起動処理(スレッド)が終わり、周期処理が始まるまで待つ
+        while not self.app.started:
+            if self.app.startup_error is not None:
+                raise self.app.startup_error
+            self.root.update()
+            time.sleep(0.01)
+        self.runtime = self.app.runtime
+        self.widget = self.app
+        self.cancel()
+
+    def cancel(self):
+        if self.app.after_id is not None:
+            self.app.after_cancel(self.app.after_id)
+            self.app.after_id = None
+
+    def tick(self):
+        self.app.cycle_proc()
+        self.cancel()
+        self.root.update()
+
+    def close(self):
+        self.app.close()
+
+class HeadlessDriver(object):
+    def __init__(self, sources, log_path):
+        from measurement import MeasurementRuntime
+        self.runtime = MeasurementRuntime(sources, log_path=log_path, metrics_file='')
+        self.widget = None
+        self.runtime.start()
+
+    def tick(self):
+        self.runtime.tick()
+
+    def close(self):
+        self.runtime.close()
+
+##############################################################################
+# 判定(最初の周期を基準に、最後の周期までの増加を閾値と比べる)
+##############################################################################
+def check(samples, args):
+    first, last = samples[0], samples[-1]
+    failures = []
+    rss_growth = (last.rss - first.rss) / MIB
+    if rss_growth > args.max_rss_growth:
+        failures.append('RSS +{:.1f} MiB > {} MiB'.format(rss_growth, args.max_rss_growth))
+    heap_growth = (last.heap - first.heap) / MIB
+    if heap_growth > args.max_heap_growth:
+        failures.append('heap +{:.2f} MiB > {} MiB'.format(heap_growth, args.max_heap_growth))
+    if last.items - first.items > args.max_item_growth:
+        failures.append('canvas items {} -> {}'.format(first.items, last.items))
+    if first.fds >= 0 and last.fds - first.fds > args.max_fd_growth:
+        failures.append('open fds {} -> {}'.format(first.fds, last.fds))
+    ratio = max(last.p99, P99_FLOOR) / max(first.p99, P99_FLOOR)
+    if ratio > args.max_p99_regression:
+        failures.append('tick p99 {:.2f} -> {:.2f} ms (x{:.2f})'.format(first.p99, last.p99, ratio))
+
+    return failures
+
+##############################################################################
+# 長時間試験
+#   模擬データの再生時刻を周期処理の待ち時間だけ進め、実時間より速く回す
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='模擬データで長時間回し、メモリ・ハンドルの増加と処理時間の劣化を調べる')
+    parser.add_argument('--days', type=float, default=SOAK_DAYS, help='模擬する期間[日]')
+    parser.add_argument('--sample-interval', type=float, default=SAMPLE_INTERVAL, help='記録周期(模擬時間)[sec]')
+    parser.add_argument('--headless', action='store_true', help='画面なし(MeasurementRuntimeのみ)')
+    parser.add_argument('--no-trace', action='store_true', help='tracemallocを使わない(速いがPythonのメモリは見ない)')
+    parser.add_argument('--max-rss-growth', type=float, default=RSS_GROWTH_MAX)
+    parser.add_argument('--max-heap-growth', type=float, default=HEAP_GROWTH_MAX)
+    parser.add_argument('--max-item-growth', type=int, default=ITEM_GROWTH_MAX)
+    parser.add_argument('--max-fd-growth', type=int, default=FD_GROWTH_MAX)
+    parser.add_argument('--max-p99-regression', type=float, default=P99_REGRESSION_MAX)
+    args = parser.parse_args()
+
+    trace = not args.no_trace
+    if trace:
+        tracemalloc.start(TRACE_FRAMES)
+    sources = SyntheticSources(realtime=False)
+    # 計測ログは一時フォルダへ書き込む
+    log_path = tempfile.mkdtemp(prefix='soak_bench_')
+    if args.headless:
+        driver = HeadlessDriver(sources, log_path)
+    else:
+        from tkinter import TclError
+        try:
+            driver = TkDriver(sources, log_path)
+        except TclError as e:
+            print('[error] display', e, '(--headless で画面なしの試験ができます)')
+            sys.exit(2)
+    scheduler = driver.runtime.scheduler
+
+    end = args.days * DAY
+    next_sample = args.sample_interval
+    samples = []
+    baseline = None
+    tick_times = []
+    start = time.perf_counter()
+    try:
+        while sources.clock.now() < end:
+            tick_start = time.perf_counter()
+            driver.tick()
+            tick_times.append(time.perf_counter() - tick_start)
+            # 次の期限まで模擬時間を進める
+            sources.clock.advance(max(scheduler.deadline - sources.clock.now(), 0.0))
+            if sources.clock.now() >= next_sample:
+                next_sample += args.sample_interval
+                sample = SoakSample(sources.clock.now(), tick_times, driver.widget, trace)
+                samples.append(sample)
+                tick_times = []
+                print(sample.format(), flush=True)
+                # 最初の周期(キャッシュ等が埋まるまで)を基準にする
+                if trace and baseline is None:
+                    baseline = tracemalloc.take_snapshot()
+    finally:
+        driver.close()
+    elapsed = time.perf_counter() - start
+
+    print('simulated {:.2f} h in {:.1f} s (x{:.0f})'.format(
+        sources.clock.now() / 3600, elapsed, sources.clock.now() / max(elapsed, 1e-9)))
+    if trace and baseline is not None:
+        print('largest allocation growth since the first sample:')
+        stats = tracemalloc.take_snapshot().compare_to(baseline, 'lineno')
+        for stat in stats[:TOP_STATS]:
+            print('  ', stat)
+    if len(samples) < 2:
+        print('[error] soak too short: at least 2 samples are needed')
+        sys.exit(2)
+    failures = check(samples, args)
+    for failure in failures:
+        print('[error] soak', failure)
+    if failures:
+        sys.exit(1)
+    print('soak passed')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+import os
+import time
+import threading
+import contextlib
+
+##############################################################################
+# 定数
+##############################################################################
+PROC_STAT = '/proc/self/stat'
+PROC_UPTIME = '/proc/uptime'
+STAT_STARTTIME = 19                 # ')'以降の項目で、プロセス開始時刻(起動からのclock tick)の位置
+
+##############################################################################
+# プロセス開始からの経過時間・OS起動からの経過時間[sec](取得できなければNone)
+##############################################################################
+def process_age():
+    try:
+        with open(PROC_UPTIME) as file:
+            uptime = float(file.read().split()[0])
+        with open(PROC_STAT) as file:
+            # プロセス名に空白が含まれることがあるため、')'以降を区切る
+            fields = file.read().rsplit(')', 1)[1].split()
+        started = int(fields[STAT_STARTTIME]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None, None
+
+    return max(uptime - started, 0.0), uptime
+
+##############################################################################
+# クラス：StartupTimeline
+#   起動の段階ごとの開始・終了時刻を記録し、起動完了までの経過を表示する
+#   時刻は StartupTimeline の生成時からの経過[sec](生成前はプロセス開始からの時間のみ)
+##############################################################################
+class StartupTimeline(object):
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.origin = clock()
+        # プロセス開始から生成までの時間(Python本体の起動・それまでのimport)
+        self.process_age, _ = process_age()
+        # (段階名, 開始, 終了, スレッド名)
+        self.phases = []
+        self.lock = threading.Lock()
+        # 起動完了(最初の周期処理の終了)
+        self.ready_time = None
+        self.uptime = None
+
+    ##########################################################################
+    # 段階の記録(with文)
+    ##########################################################################
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.clock())
+
+    def add(self, name, start, end):
+        with self.lock:
+            self.phases.append((name, start - self.origin, end - self.origin,
+                                threading.current_thread().name))
+
+    ##########################################################################
+    # 複数の段階を並行に実行する
+    #   tasks：(段階名, 関数) の並び、戻り値：段階名 -> 関数の戻り値
+    #   失敗した段階があれば、すべて終わるのを待ち、成功した段階の戻り値を
+    #   cleanup(段階名, 戻り値) で後始末してから最初の例外を送出する
+    ##########################################################################
+    def parallel(self, tasks, cleanup=None):
+        results = {}
+        errors = []
+
+        def run(name, task):
+            try:
+                with self.phase(name):
+                    results[name] = task()
+            except Exception as e:
+                errors.append((name, e))
+
+        threads = [threading.Thread(target=run, args=(name, task), name='startup-' + name, daemon=True)
+                   for name, task in tasks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            name, e = errors[0]
+            print('[error] startup', name, e)
+            if cleanup is not None:
+                for done, result in results.items():
+                    try:
+                        cleanup(done, result)
+                    except Exception as cleanup_error:
+                        print('[error] startup cleanup', done, cleanup_error)
+            raise e
+
+        return results
+
+    ##########################################################################
+    # 起動完了
+    ##########################################################################
+    def ready(self):
+        self.ready_time = self.clock() - self.origin
+        _, self.uptime = process_age()
+
+    ##########################################################################
+    # 起動完了までの時間(プロセス開始から)[sec]
+    ##########################################################################
+    def total(self):
+        if self.ready_time is None:
+            return None
+
+        return self.ready_time + (self.process_age or 0.0)
+
+    ##########################################################################
+    # 表示用(開始順、1行1段階)
+    ##########################################################################
+    def report(self):
+        lines = ['startup timeline [ms]']
+        if self.process_age is not None:
+            lines.append('  {:<14}{:>8.0f}{:>8.0f}  {}'.format('python', -self.process_age * 1000,
+                                                             self.process_age * 1000, 'MainThread'))
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        for name, start, end, thread in phases:
+            lines.append('  {:<14}{:>8.0f}{:>8.0f}  {}'.format(name, start * 1000, (end - start) * 1000, thread))
+        if self.ready_time is not None:
+            lines.append('  ready {:.0f} ms after process start'.format(self.total() * 1000))
+        if self.uptime is not None:
+            lines.append('  ready {:.1f} s after power-on'.format(self.uptime))
+
+        return lines
+
+    ##########################################################################
+    # イベント用
+    ##########################################################################
+    def fields(self):
+        with self.lock:
+            phases = {name: round(end - start, 4) for name, start, end, thread in self.phases}
+
+        return {'phases': phases,
+                'ready': round(self.total(), 4) if self.ready_time is not None else None,
+                'uptime': round(self.uptime, 1) if self.uptime is not None else None}
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+import math
+import numpy as np
+
+##############################################################################
+# 定数
+##############################################################################
+FILTER_WINDOW = 9                   # 中央値を取るフレーム数
+VARIANCE_THRESHOLD = 0.005          # 計測完了とする推定値の分散[℃^2]
+MIN_FRAMES = 3                      # 計測に使う最小フレーム数
+MAX_FRAMES = 20                     # 計測に使う最大フレーム数
+MEDIAN_EFFICIENCY = math.pi / 2     # 中央値の分散 / 平均値の分散(正規分布)
+
+##############################################################################
+# クラス：TemperatureEstimator
+#   届いたフレームの温度から、移動中央値とその分散を逐次求める
+#   分散が閾値を下回るか最大フレーム数に達した時点で計測完了とする
+##############################################################################
+class TemperatureEstimator(object):
+    def __init__(self, window=FILTER_WINDOW, variance_threshold=VARIANCE_THRESHOLD,
+                 min_frames=MIN_FRAMES, max_frames=MAX_FRAMES):
+        self.variance_threshold = variance_threshold
+        self.min_frames = max(min_frames, 2)
+        self.max_frames = max_frames
+        # 直近フレームの温度(リングバッファ)
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.reset()
+
+    ##########################################################################
+    # 初期化
+    ##########################################################################
+    def reset(self):
+        # 使用したフレーム数
+        self.frames = 0
+        # 推定値[℃]・分散[℃^2]
+        self.estimate = 0.0
+        self.variance = math.inf
+
+    ##########################################################################
+    # 1フレーム分の温度を追加
+    ##########################################################################
+    def update(self, value):
+        self.samples[self.frames % len(self.samples)] = value
+        self.frames += 1
+        window = self.samples[:min(self.frames, len(self.samples))]
+        self.estimate = float(np.median(window))
+        if len(window) >= 2:
+            self.variance = float(np.var(window, ddof=1)) * MEDIAN_EFFICIENCY / len(window)
+
+        return self.estimate, self.variance
+
+    ##########################################################################
+    # 計測完了の判定
+    ##########################################################################
+    def converged(self):
+        if self.frames >= self.max_frames:
+            return True
+
+        return self.frames >= self.min_frames and self.variance <= self.variance_threshold
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+import sys
+import math
+import time
+import argparse
+import cv2
+import numpy as np
+from thermal_roi import ThermalRoi, THERMAL_GRID, DISTANCE_STEP
+
+##############################################################################
+# 定数
+##############################################################################
+OVERLAY_STEP = 8                    # 温度を補間する間隔(カメラ映像上)[px]
+OVERLAY_ALPHA = 0.4                 # 重ねる温度分布の不透明度
+OVERLAY_VMIN = 20.0                 # 色の下限温度[℃]
+OVERLAY_VMAX = 38.0                 # 色の上限温度[℃]
+OVERLAY_COLORMAP = cv2.COLORMAP_INFERNO     # カラーマップ
+BENCH_FRAMES = 500                  # 速度計測のフレーム数
+COVERAGE_TOLERANCE = 2              # 範囲の確認で許す誤差[px]
+
+##############################################################################
+# 1軸の補間重み (n, 8)
+#   coord：温度分布の画素座標(画素中心が整数)
+##############################################################################
+def axis_weights(coord):
+    coord = np.clip(coord, 0, THERMAL_GRID - 1)
+    low = np.floor(coord).astype(int)
+    high = np.minimum(low + 1, THERMAL_GRID - 1)
+    frac = (coord - low).astype(np.float32)
+    weights = np.zeros((len(coord), THERMAL_GRID), dtype=np.float32)
+    weights[np.arange(len(coord)), low] += 1 - frac
+    weights[np.arange(len(coord)), high] += frac
+
+    return weights
+
+##############################################################################
+# クラス：OverlayGeometry
+#   距離ごとの、温度分布が写る範囲(カメラ座標)・補間行列・作業領域
+##############################################################################
+class OverlayGeometry(object):
+    def __init__(self, x0, x1, y0, y1, weights_x, weights_y):
+        # カメラ映像上の範囲
+        self.x0, self.x1, self.y0, self.y1 = x0, x1, y0, y1
+        # 補間行列 (ny*nx, 64)：values = matrix @ pixels
+        self.matrix = np.kron(weights_y, weights_x)
+        self.shape = (len(weights_y), len(weights_x))
+        # 作業領域(補間後の温度・色番号・色)
+        self.values = np.empty(len(self.matrix), dtype=np.float32)
+        self.index = np.empty(len(self.matrix), dtype=np.uint8)
+        self.small = np.empty((len(self.matrix), 4), dtype=np.uint8)
+        # 範囲の大きさに拡大した温度分布(RGBA)
+        self.overlay = np.empty((y1 - y0, x1 - x0, 4), dtype=np.uint8)
+
+##############################################################################
+# クラス：ThermalOverlay
+#   8x8の温度分布を補間行列1回の積で拡大し、256色の対応表で色付けして、
+#   カメラ映像(RGBA)の温度分布が写る範囲へ重ねる
+#   温度分布の更新は温度フレームごと(10fps)、重ね合わせはカメラフレームごとに行う
+##############################################################################
+class ThermalOverlay(object):
+    def __init__(self, roi=None, alpha=OVERLAY_ALPHA,
+                 vmin=OVERLAY_VMIN, vmax=OVERLAY_VMAX, colormap=OVERLAY_COLORMAP):
+        # カメラ座標 -> 温度分布の対応付け(顔の温度と同じ幾何)
+        self.roi = roi if roi is not None else ThermalRoi()
+        self.alpha = alpha
+        self.vmin = vmin
+        self.scale = 255.0 / (vmax - vmin)
+        # 色番号 -> RGBA
+        lut = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), colormap)
+        self.colormap = np.empty((256, 4), dtype=np.uint8)
+        self.colormap[:, 0:3] = lut[:, 0, ::-1]
+        self.colormap[:, 3] = 255
+        # 距離ごとの幾何(None：温度分布が写らない)
+        self.geometries = {}
+        # 表示中の幾何
+        self.current = None
+        self.updates = 0
+
+    ##########################################################################
+    # 距離に対応する幾何(距離の刻みごとにキャッシュ)
+    ##########################################################################
+    def geometry(self, distance):
+        bucket = max(int(round(distance / DISTANCE_STEP)), 1)
+        if bucket in self.geometries:
+            return self.geometries[bucket]
+
+        spans = []
+        for axis in (0, 1):
+            # カメラの画素境界 -> 温度分布の座標(axis_lutは拡大後の0..roi.gridなので0..8へ戻す)
+            lut = self.roi.axis_lut(axis, bucket * DISTANCE_STEP) * (THERMAL_GRID / self.roi.grid)
+            inside = np.flatnonzero((lut >= 0) & (lut <= THERMAL_GRID))
+            if len(inside) < 2:
+                self.geometries[bucket] = None
+                return None
+            lo, hi = int(inside[0]), int(inside[-1])
+            n = max((hi - lo) // OVERLAY_STEP, 1)
+            # 補間する点(カメラ座標) -> 温度分布の画素座標
+            centers = lo + (np.arange(n) + 0.5) * (hi - lo) / n
+            coord = np.interp(centers, np.arange(len(lut)), lut) - 0.5
+            spans.append((lo, hi, axis_weights(coord)))
+        (x0, x1, weights_x), (y0, y1, weights_y) = spans
+        self.geometries[bucket] = OverlayGeometry(x0, x1, y0, y1, weights_x, weights_y)
+
+        return self.geometries[bucket]
+
+    ##########################################################################
+    # 温度分布の更新
+    ##########################################################################
+    def update(self, pixels, distance):
+        geometry = self.geometry(distance)
+        self.current = geometry
+        if geometry is None:
+            return
+        values = geometry.values
+        # 拡大(行列の積1回)
+        np.dot(geometry.matrix, np.asarray(pixels, dtype=np.float32).reshape(-1), out=values)
+        # 温度 -> 色番号 -> RGBA
+        np.subtract(values, self.vmin, out=values)
+        np.multiply(values, self.scale, out=values)
+        np.clip(values, 0, 255, out=values)
+        np.copyto(geometry.index, values, casting='unsafe')
+        np.take(self.colormap, geometry.index, axis=0, out=geometry.small)
+        cv2.resize(geometry.small.reshape(geometry.shape + (4,)),
+                   (geometry.x1 - geometry.x0, geometry.y1 - geometry.y0),
+                   dst=geometry.overlay, interpolation=cv2.INTER_LINEAR)
+        self.updates += 1
+
+    ##########################################################################
+    # カメラ映像(RGBA)へ重ねる
+    ##########################################################################
+    def blend(self, frame):
+        geometry = self.current
+        if geometry is None or frame.shape[0] < geometry.y1 or frame.shape[1] < geometry.x1:
+            return
+        region = frame[geometry.y0:geometry.y1, geometry.x0:geometry.x1]
+        cv2.addWeighted(region, 1 - self.alpha, geometry.overlay, self.alpha, 0, dst=region)
+
+##############################################################################
+# 温度分布が写るカメラ映像上の範囲(視野角・取り付け位置から直接求める)[px]
+##############################################################################
+def expected_span(roi, axis, distance):
+    size = roi.camera_size[axis]
+    camera_tan = math.tan(math.radians(roi.camera_fov[axis] / 2))
+    thermal_tan = math.tan(math.radians(roi.thermal_fov[axis] / 2))
+    edges = [roi.thermal_offset[axis] + sign * distance * thermal_tan for sign in (-1, 1)]
+    lo, hi = [min(max((pos / (distance * camera_tan) + 1) * size / 2, 0), size) for pos in edges]
+
+    return int(round(lo)), int(round(hi))
+
+##############################################################################
+# 速度計測・範囲の確認(実機不要)
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='温度分布の重ね合わせの速度計測')
+    parser.add_argument('--frames', type=int, default=BENCH_FRAMES)
+    parser.add_argument('--distance', type=float, default=50.0)
+    args = parser.parse_args()
+
+    overlay = ThermalOverlay()
+    frame = np.zeros((480, 480, 4), dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    pixels = (24 + 10 * rng.random((args.frames, 8, 8))).astype(np.float32)
+    overlay.update(pixels[0], args.distance)
+
+    start = time.perf_counter()
+    for i in range(args.frames):
+        overlay.update(pixels[i], args.distance)
+    update_time = (time.perf_counter() - start) / args.frames
+    start = time.perf_counter()
+    for i in range(args.frames):
+        overlay.blend(frame)
+    blend_time = (time.perf_counter() - start) / args.frames
+    geometry = overlay.current
+    print('region x {}..{} y {}..{}  grid {}'.format(geometry.x0, geometry.x1, geometry.y0, geometry.y1, geometry.shape))
+    print('update (per thermal frame) {:.3f} ms'.format(update_time * 1000))
+    print('blend  (per camera frame)  {:.3f} ms'.format(blend_time * 1000))
+
+    # 重ねる範囲が視野角から求めた範囲と一致するか
+    distance = round(args.distance / DISTANCE_STEP) * DISTANCE_STEP
+    expected = expected_span(overlay.roi, 0, distance) + expected_span(overlay.roi, 1, distance)
+    actual = (geometry.x0, geometry.x1, geometry.y0, geometry.y1)
+    print('expected x {}..{} y {}..{}'.format(*expected))
+    if any(abs(a - e) > COVERAGE_TOLERANCE for a, e in zip(actual, expected)):
+        print('[error] overlay region does not match the thermal field of view')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import math
+from collections import OrderedDict
+import numpy as np
+
+##############################################################################
+# 定数(キャリブレーション値)
+##############################################################################
+CAMERA_SIZE = (480, 480)            # カメラ映像(横幅, 縦幅)[px]
+CAMERA_FOV = (60.0, 60.0)           # カメラの画角(水平, 垂直)[deg]
+THERMAL_FOV = (60.0, 60.0)          # AMG8833の画角(水平, 垂直)[deg]
+THERMAL_OFFSET = (0.0, 3.0)         # カメラから見たAMG8833の位置(右, 下)[cm]
+THERMAL_MIRROR = (True, False)      # 表示映像(左右反転済み)に対する温度分布の反転(左右, 上下)
+THERMAL_GRID = 8                    # AMG8833の画素数(1辺)
+UPSAMPLE = 4                        # 温度分布の拡大率
+ROI_SHRINK = 0.2                    # 顔矩形の周辺(髪・背景)を除く割合
+ROI_WEIGHT_MIN = 0.5                # 採用するセルの被覆率の下限
+DISTANCE_STEP = 5.0                 # 対応表を作る距離の刻み[cm]
+ROI_QUANT = 8                       # 顔矩形の量子化[px]
+ROI_CACHE_SIZE = 64                 # 顔矩形ごとの重みのキャッシュ数
+
+##############################################################################
+# 1次元の線形補間行列 (n*scale, n)
+##############################################################################
+def interpolation_matrix(n, scale):
+    size = n * scale
+    matrix = np.zeros((size, n), dtype=np.float32)
+    # 拡大後のセル中心を元の画素座標で表す
+    pos = (np.arange(size) + 0.5) / scale - 0.5
+    pos = np.clip(pos, 0, n - 1)
+    low = np.floor(pos).astype(int)
+    high = np.minimum(low + 1, n - 1)
+    frac = (pos - low).astype(np.float32)
+    matrix[np.arange(size), low] += 1 - frac
+    matrix[np.arange(size), high] += frac
+
+    return matrix
+
+##############################################################################
+# クラス：ThermalRoi
+#   カメラ座標の顔矩形を温度分布のセルへ対応付け、顔の領域だけから温度を求める
+#   対応表は距離(視差)ごとに、重みは顔矩形ごとに一度だけ計算してキャッシュする
+##############################################################################
+class ThermalRoi(object):
+    def __init__(self, camera_size=CAMERA_SIZE, camera_fov=CAMERA_FOV,
+                 thermal_fov=THERMAL_FOV, thermal_offset=THERMAL_OFFSET,
+                 thermal_mirror=THERMAL_MIRROR, upsample=UPSAMPLE):
+        self.camera_size = camera_size
+        self.camera_fov = camera_fov
+        self.thermal_fov = thermal_fov
+        self.thermal_offset = thermal_offset
+        self.thermal_mirror = thermal_mirror
+        self.grid = THERMAL_GRID * upsample
+        # 拡大行列：up(grid*grid) = upsample_matrix @ pixels(64)
+        interp = interpolation_matrix(THERMAL_GRID, upsample)
+        self.upsample_matrix = np.kron(interp, interp)
+        # 距離ごとの対応表(カメラの列/行 -> 拡大後の温度分布の座標)
+        self.lut = {}
+        # 顔矩形ごとの重み行列
+        self.roi_cache = OrderedDict()
+
+    ##########################################################################
+    # カメラの1軸 -> 温度分布の1軸 の対応表
+    ##########################################################################
+    def axis_lut(self, axis, distance):
+        size = self.camera_size[axis]
+        camera_tan = math.tan(math.radians(self.camera_fov[axis] / 2))
+        thermal_tan = math.tan(math.radians(self.thermal_fov[axis] / 2))
+        # 画素中心の視線方向 -> 距離distanceの平面上の位置[cm]
+        pos = ((np.arange(size + 1) - size / 2) / (size / 2)) * camera_tan * distance
+        # AMG8833から見た方向 -> 温度分布の座標(0..grid)
+        coord = ((pos - self.thermal_offset[axis]) / distance / thermal_tan + 1) / 2 * self.grid
+        if self.thermal_mirror[axis]:
+            coord = self.grid - coord
+
+        return coord.astype(np.float32)
+
+    ##########################################################################
+    # 距離に対応する対応表(距離の刻みごとにキャッシュ)
+    ##########################################################################
+    def table(self, distance):
+        bucket = max(int(round(distance / DISTANCE_STEP)), 1)
+        if bucket not in self.lut:
+            d = bucket * DISTANCE_STEP
+            self.lut[bucket] = (self.axis_lut(0, d), self.axis_lut(1, d))
+
+        return bucket, self.lut[bucket]
+
+    ##########################################################################
+    # 区間[a, b]とセル[i, i+1]の重なり
+    ##########################################################################
+    def coverage(self, a, b):
+        if a > b:
+            a, b = b, a
+        edges = np.arange(self.grid + 1, dtype=np.float32)
+        return np.clip(np.minimum(edges[1:], b) - np.maximum(edges[:-1], a), 0, 1)
+
+    ##########################################################################
+    # 顔矩形の重み行列(採用セルの拡大行列)
+    ##########################################################################
+    def roi_matrix(self, rect, distance):
+        q = ROI_QUANT
+        x, y, w, h = [int(v) // q * q for v in rect]
+        bucket, (lut_x, lut_y) = self.table(distance)
+        key = (x, y, w, h, bucket)
+        if key in self.roi_cache:
+            self.roi_cache.move_to_end(key)
+            return self.roi_cache[key]
+
+        # 顔の中央部分
+        mx = int(w * ROI_SHRINK)
+        my = int(h * ROI_SHRINK)
+        x1 = min(max(x + mx, 0), self.camera_size[0])
+        x2 = min(max(x + w - mx, 0), self.camera_size[0])
+        y1 = min(max(y + my, 0), self.camera_size[1])
+        y2 = min(max(y + h - my, 0), self.camera_size[1])
+        # セルごとの被覆率
+        weight = np.outer(self.coverage(lut_y[y1], lut_y[y2]),
+                          self.coverage(lut_x[x1], lut_x[x2])).ravel()
+        cells = np.flatnonzero(weight >= ROI_WEIGHT_MIN)
+        matrix = self.upsample_matrix[cells] if len(cells) > 0 else None
+
+        self.roi_cache[key] = matrix
+        if len(self.roi_cache) > ROI_CACHE_SIZE:
+            self.roi_cache.popitem(last=False)
+
+        return matrix
+
+    ##########################################################################
+    # 顔の領域の温度(最大値)
+    #   顔矩形が温度分布の外にある場合はNone
+    ##########################################################################
+    def temperature(self, pixels, rect, distance):
+        matrix = self.roi_matrix(rect, distance)
+        if matrix is None:
+            return None
+
+        return float(np.max(matrix @ pixels.reshape(-1)))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+import os
+import json
+import platform
+from face_tracker import DETECT_INTERVAL
+
+##############################################################################
+# 定数
+##############################################################################
+TUNING_FILE = './tuning.json'       # 調整済みパラメータのファイル(autotune.pyで生成)
+PROC_CYCLE = 50                     # 処理周期[msec]
+IDLE_CYCLE = 200                    # 処理周期(待機中)[msec]
+PAUSE_CYCLES = 20                   # 計測結果を表示しておく周期数
+FACE_PAUSE_CYCLES = 50              # 顔を検出した後の一時停止の周期数(face_recognition.py)
+
+# 周期処理のパラメータ(既定値)
+CYCLE_PARAMS = {'proc_cycle': PROC_CYCLE,
+                'idle_cycle': IDLE_CYCLE,
+                'pause_cycles': PAUSE_CYCLES,
+                'face_pause_cycles': FACE_PAUSE_CYCLES,
+                'detect_interval': DETECT_INTERVAL}
+# 顔検出のパラメータと型(既定値はcascade_registry.CASCADE_PARAMS。min_sizeは正方形の1辺)
+CASCADE_TYPES = {'scale_factor': float, 'min_neighbors': int, 'min_size': int}
+
+##############################################################################
+# クラス：Tuning
+#   周期・顔検出のパラメータ(ファイルに無い項目は既定値)
+##############################################################################
+class Tuning(object):
+    def __init__(self, params=None, hardware=None):
+        # 既定値から変えた項目
+        self.params = {}
+        for name, value in (params or {}).items():
+            if name in CYCLE_PARAMS:
+                self.params[name] = type(CYCLE_PARAMS[name])(value)
+            elif name in CASCADE_TYPES:
+                self.params[name] = CASCADE_TYPES[name](value)
+            else:
+                print('[error] tuning: unknown parameter', name)
+        # 調整したハードウェア
+        self.hardware = hardware
+        for name, value in CYCLE_PARAMS.items():
+            setattr(self, name, self.params.get(name, value))
+
+    ##########################################################################
+    # 顔検出のパラメータ(cascade_registry.params()の値を上書き)
+    ##########################################################################
+    def cascade_params(self, params):
+        params = dict(params)
+        for name in CASCADE_TYPES:
+            if name in self.params:
+                params[name] = self.params[name]
+        if 'min_size' in self.params:
+            params['min_size'] = (self.params['min_size'], self.params['min_size'])
+
+        return params
+
+##############################################################################
+# 実行中のハードウェア
+##############################################################################
+def hardware():
+    info = {'machine': platform.machine(), 'python': platform.python_version()}
+    try:
+        with open('/proc/device-tree/model') as file:
+            info['model'] = file.read().strip('\x00\n')
+    except OSError:
+        pass
+
+    return info
+
+##############################################################################
+# 調整済みパラメータの読み込み(無ければ既定値)
+##############################################################################
+def load(path=TUNING_FILE):
+    if not path or not os.path.isfile(path):
+        return Tuning()
+    try:
+        with open(path) as file:
+            data = json.load(file)
+        tuning = Tuning(data['params'], data.get('hardware'))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print('[error] tuning', path, e)
+        return Tuning()
+    # 別のハードウェアで調整した値は使うが、知らせる
+    model = hardware().get('model')
+    if tuning.hardware and model and tuning.hardware.get('model') not in (None, model):
+        print('[error] tuning: tuned on', tuning.hardware.get('model'), 'but running on', model)
+
+    return tuning
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+##############################################################################
+# 定数
+##############################################################################
+FORMAT_CACHE_SIZE = 64              # 項目ごとに保持する書式化済み文字列の数
+
+##############################################################################
+# クラス：ViewField
+#   表示項目1つ分(値・書式・表示済みの文字列)
+##############################################################################
+class ViewField(object):
+    def __init__(self, widget, template, placeholder, resettable):
+        self.widget = widget
+        # 書式('{}'に値が入る。値がtupleの場合は順に入る)
+        self.template = template
+        # 値が無い(None)時の表示
+        self.placeholder = placeholder
+        # reset()で値を消すか
+        self.resettable = resettable
+        self.value = None
+        # 表示済みの文字列(未表示はNone)
+        self.text = None
+        # 値 -> 文字列
+        self.cache = {}
+
+    ##########################################################################
+    # 表示する文字列
+    ##########################################################################
+    def format(self):
+        if self.value is None:
+            return self.placeholder
+        text = self.cache.get(self.value)
+        if text is None:
+            if isinstance(self.value, tuple):
+                text = self.template.format(*self.value)
+            else:
+                text = self.template.format(self.value)
+            if len(self.cache) >= FORMAT_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[self.value] = text
+
+        return text
+
+##############################################################################
+# クラス：ViewModel
+#   表示する値を保持し、render()で前回の表示から変わった項目だけをTkへ反映する
+#   値の更新(set)は何度呼んでも、Tkの操作は表示周期ごとに1回にまとまる
+##############################################################################
+class ViewModel(object):
+    def __init__(self):
+        self.fields = {}
+        # 値が変わった項目
+        self.dirty = set()
+        # Tkへの反映回数・変化が無く反映しなかった回数
+        self.updates = 0
+        self.skipped = 0
+
+    ##########################################################################
+    # 項目の登録
+    ##########################################################################
+    def bind(self, name, widget, template='{}', placeholder='', resettable=True):
+        self.fields[name] = ViewField(widget, template, placeholder, resettable)
+        self.dirty.add(name)
+
+    ##########################################################################
+    # 値の更新(表示はrender()まで行わない)
+    ##########################################################################
+    def set(self, name, value):
+        field = self.fields[name]
+        if value != field.value:
+            field.value = value
+            self.dirty.add(name)
+
+    ##########################################################################
+    # 値の初期化(未計測の表示に戻す)
+    ##########################################################################
+    def reset(self, **values):
+        for name, field in self.fields.items():
+            if field.resettable:
+                self.set(name, values.get(name))
+
+    ##########################################################################
+    # 表示(変わった項目だけ)
+    #   戻り値：Tkへ反映した項目数
+    ##########################################################################
+    def render(self):
+        updates = 0
+        for name in self.dirty:
+            field = self.fields[name]
+            text = field.format()
+            if text == field.text:
+                self.skipped += 1
+                continue
+            field.widget.config(text=text)
+            field.text = text
+            updates += 1
+        self.dirty.clear()
+        self.updates += updates
+
+        return updates
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+import time
+import argparse
+from ctypes import POINTER, c_ubyte, cast
+import smbus2
+import smbus2.smbus2
+import numpy as np
+import VL53L0X
+
+##############################################################################
+# 定数
+##############################################################################
+BENCH_LENGTHS = (1, 2, 4, 6, 12, 32)    # 1回の転送バイト数
+BENCH_REPEAT = 20000                # 転送バイト数ごとの呼び出し回数
+DEVICE_ADDR = 0x29                  # VL53L0X のI2C アドレス
+
+# 連続計測モード 1回分のコールバック呼び出し(読み出し/書き込み, バイト数)
+#   データ準備完了のポーリング → 計測結果(12byte)の読み出し → 割り込みクリア
+RANGING_TRACE = ([('r', 1)] * 4 +
+                 [('r', 12), ('r', 2), ('w', 1), ('r', 1), ('w', 1)])
+
+##############################################################################
+# 実機の代わりのioctl
+#   smbus2の処理(構造体の生成・結果の変換)はそのまま実行し、
+#   カーネルへの転送(システムコール)だけを省く
+##############################################################################
+transfers = 0
+
+def fake_ioctl(fd, request, arg):
+    global transfers
+    transfers += 1
+
+    return 0
+
+##############################################################################
+# 旧コールバック(比較用：1byteずつコピー)
+##############################################################################
+def legacy_i2c_read(address, reg, data_p, length):
+    ret_val = 0;
+    result = []
+
+    try:
+        result = VL53L0X.i2cbus.read_i2c_block_data(address, reg, length)
+    except IOError:
+        ret_val = -1;
+
+    if (ret_val == 0):
+        for index in range(length):
+            data_p[index] = result[index]
+
+    return ret_val
+
+def legacy_i2c_write(address, reg, data_p, length):
+    ret_val = 0;
+    data = []
+
+    for index in range(length):
+        data.append(data_p[index])
+    try:
+        VL53L0X.i2cbus.write_i2c_block_data(address, reg, data)
+    except IOError:
+        ret_val = -1;
+
+    return ret_val
+
+##############################################################################
+# 1回の呼び出し時間[usec]
+##############################################################################
+def time_callback(callback, data_p, length, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        callback(DEVICE_ADDR, 0x14, data_p, length)
+
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+##############################################################################
+# ベンチマーク
+##############################################################################
+def main():
+    parser = argparse.ArgumentParser(description='VL53L0X I2Cコールバックの速度比較(実機不要)')
+    parser.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    args = parser.parse_args()
+
+    # 転送はすべてfake_ioctlで処理する(fdは使われない)
+    smbus2.smbus2.ioctl = fake_ioctl
+    VL53L0X.ioctl = fake_ioctl
+    VL53L0X.i2cbus = smbus2.SMBus()
+    buf = (c_ubyte * 256)()
+    data_p = cast(buf, POINTER(c_ubyte))
+    variants = [('before', legacy_i2c_read, legacy_i2c_write),
+                ('after', VL53L0X.i2c_read, VL53L0X.i2c_write)]
+
+    results = {}
+    for name, read, write in variants:
+        read_us = [time_callback(read, data_p, n, args.repeat) for n in BENCH_LENGTHS]
+        write_us = [time_callback(write, data_p, n, args.repeat) for n in BENCH_LENGTHS]
+        # 呼び出し時間 = 固定分 + バイト数 * 1byteあたり
+        read_slope, read_base = np.polyfit(BENCH_LENGTHS, read_us, 1)
+        write_slope, write_base = np.polyfit(BENCH_LENGTHS, write_us, 1)
+        # 計測1回分
+        start = time.perf_counter()
+        for i in range(args.repeat // 10):
+            for kind, n in RANGING_TRACE:
+                (read if kind == 'r' else write)(DEVICE_ADDR, 0x14, data_p, n)
+        ranging_us = (time.perf_counter() - start) * 1e6 / (args.repeat // 10)
+        results[name] = ranging_us
+        print('{}:'.format(name))
+        print('  read  {:.2f} us/call + {:.3f} us/byte'.format(read_base, read_slope))
+        print('  write {:.2f} us/call + {:.3f} us/byte'.format(write_base, write_slope))
+        print('  ranging measurement ({} callbacks) {:.1f} us'.format(len(RANGING_TRACE), ranging_us))
+    print('transfers', transfers)
+    print('speedup per ranging measurement: x{:.2f}'.format(results['before'] / results['after']))
+
+if __name__ == '__main__':
+    main()